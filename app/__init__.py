@@ -1,100 +1,144 @@
 # app/__init__.py
+import time
+_IMPORT_T0 = time.perf_counter()
+
 import sqlite3
-import firebase_admin
-from firebase_admin import credentials, db
-from flask import Flask
+import json
+from flask import Flask, g, jsonify
 from flask_cors import CORS
 from config import Config
-import json
-import os
+from app.metrics import InstrumentedRef
+from app.container import container, DependencyUnavailable
 
-# Global Firebase References (Agar bisa diimport file lain)
-auth_db_ref = None
-vault_db_ref = None
+# ==============================================================================
+# LAZY DEPENDENCIES (lihat app/container.py)
+# ==============================================================================
+# firebase_admin (dan google-auth di belakangnya) baru di-import & connect saat
+# DB pertama kali dipakai. Modul lain import proxy ini: tidak pernah None, dan
+# init yang gagal dicoba lagi otomatis.
 
 def init_sqlite():
-    """Inisialisasi SQLite dengan Schema Lengkap (Termasuk TTL)"""
+    """Inisialisasi SQLite + migrasi schema berversi (lihat app/migrations.py)"""
+    from app.migrations import migrate
     try:
-        with sqlite3.connect(Config.DB_FILE) as conn:
+        conn = sqlite3.connect(Config.DB_FILE, timeout=30, isolation_level=None)
+        try:
             conn.execute("PRAGMA journal_mode=WAL;")
-            
-            # Tabel Session (Login & Interview)
-            conn.execute('''CREATE TABLE IF NOT EXISTS sessions 
-                         (token TEXT PRIMARY KEY, 
-                          device_id TEXT, 
-                          ip TEXT, 
-                          status TEXT, 
-                          type TEXT, 
-                          created_at REAL, 
-                          expires_at REAL)''')
-            
-            # Tabel Rate Limit
-            conn.execute('''CREATE TABLE IF NOT EXISTS ratelimit 
-                         (client_hash TEXT, hits INTEGER, window_start REAL)''')
-            
-            # Tabel Audit Log
-            conn.execute('''CREATE TABLE IF NOT EXISTS audit_log
-                         (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL, 
-                          event TEXT, detail TEXT, anon_ip TEXT)''')
-        print("✅ SQLite Initialized (WAL Mode)")
+            version = migrate(conn)
+        finally:
+            conn.close()
+        print(f"✅ SQLite Initialized (WAL Mode, schema v{version})")
     except Exception as e:
         print(f"❌ SQLite Init Error: {e}")
 
+def _firebase_ref(app_name, cred_json, db_url, dependency):
+    """Factory 1 Firebase app + root reference (dipanggil container, bukan langsung)"""
+    import firebase_admin
+    from firebase_admin import credentials, db
+
+    # App dengan nama yang sama = sisa init sebelumnya (proses induk / sebelum reset)
+    if app_name in firebase_admin._apps:
+        firebase_admin.delete_app(firebase_admin.get_app(app_name))
+    cred = credentials.Certificate(json.loads(cred_json))
+    fb_app = firebase_admin.initialize_app(cred, {'databaseURL': db_url}, name=app_name)
+    print(f"✅ Firebase {app_name} Connected")
+    return InstrumentedRef(db.reference('/', app=fb_app), dependency)
+
+# DB 1: Identity (Auth) / DB 2: Vault (Inbox)
+container.register("firebase_auth", lambda: _firebase_ref('auth_app', Config.AUTH_JSON, Config.AUTH_DB_URL, "firebase_auth"))
+container.register("firebase_vault", lambda: _firebase_ref('vault_app', Config.VAULT_JSON, Config.VAULT_DB_URL, "firebase_vault"))
+
+# Global Firebase References (Agar bisa diimport file lain)
+auth_db_ref = container.proxy("firebase_auth")
+vault_db_ref = container.proxy("firebase_vault")
+
 def init_firebase():
-    """Inisialisasi Dual Database Firebase"""
-    global auth_db_ref, vault_db_ref
-    
-    # Cek apakah sudah ter-init sebelumnya (Mencegah error double init saat reload)
-    if firebase_admin._apps:
-        auth_app = firebase_admin.get_app('auth_app')
-        vault_app = firebase_admin.get_app('vault_app')
-        auth_db_ref = db.reference('/', app=auth_app)
-        vault_db_ref = db.reference('/', app=vault_app)
-        return
+    """Hubungkan Dual Database Firebase sekarang (mode eager / LAZY_INIT=0)"""
+    container.warm(["firebase_auth", "firebase_vault"])
 
-    try:
-        # DB 1: Identity (Auth)
-        c_auth = credentials.Certificate(json.loads(Config.AUTH_JSON))
-        app_auth = firebase_admin.initialize_app(c_auth, {
-            'databaseURL': Config.AUTH_DB_URL
-        }, name='auth_app')
-        auth_db_ref = db.reference('/', app=app_auth)
-
-        # DB 2: Vault (Inbox)
-        c_vault = credentials.Certificate(json.loads(Config.VAULT_JSON))
-        app_vault = firebase_admin.initialize_app(c_vault, {
-            'databaseURL': Config.VAULT_DB_URL
-        }, name='vault_app')
-        vault_db_ref = db.reference('/', app=app_vault)
-        
-        print("✅ Firebase Dual-Core Connected")
-    except Exception as e:
-        print(f"❌ Firebase Connection Failed: {e}")
-        # Jangan raise error agar aplikasi tidak crash total, cukup log saja
-        pass
+def _dependency_unavailable(e):
+    # Firebase / cipher belum bisa dibuat: bukan bug, client cukup coba lagi
+    resp = jsonify({"error": "Service Warming Up, Retry Shortly"})
+    resp.headers['Retry-After'] = str(int(container.retry_after))
+    return resp, 503
+
+_first_request_pending = True
+
+def _first_request_timer():
+    # Sekali per worker: kapan request pertama datang & berapa lama selesainya
+    global _first_request_pending
+    if _first_request_pending:
+        _first_request_pending = False
+        g._boot_first_request = time.perf_counter()
+        container.mark("first_request_at_ms", container.since_boot())
+
+def _first_request_done(response):
+    started = g.pop('_boot_first_request', None)
+    if started is not None:
+        container.mark("first_request_ms", time.perf_counter() - started)
+    return response
 
 def create_app():
-    app = Flask(__name__)
+    started = time.perf_counter()
+    # ENV wajib dicek di sini (bukan saat import config) supaya import tetap murah
+    Config.check_health()
+
+    # static_folder=None: /static dilayani bp_frontend dari asset store di memori
+    app = Flask(__name__, static_folder=None)
     
     # Konfigurasi CORS
     CORS(app, resources={r"/api/*": {"origins": "*"}})
     
-    # Inisialisasi Database
+    # Metrics Prometheus (hook request + endpoint /metrics)
+    from app import metrics
+    metrics.init_app(app)
+
+    # Admission control: sesudah metrics supaya 503 hasil shed ikut tercatat
+    from app import admission
+    admission.init_app(app)
+
+    # Profiling (on-demand cProfile + slow request sampler), sesudah admission: request yang di-shed tidak diprofile
+    from app import profiling
+    profiling.init_app(app)
+    
+    # Inisialisasi Database (Firebase lazy kecuali LAZY_INIT=0)
     init_sqlite()
-    init_firebase()
+    if not Config.LAZY_INIT:
+        init_firebase()
     
     # Import Blueprints (Logic Modular)
     from app.routes_auth import bp_auth
     from app.routes_ai import bp_ai
     from app.routes_mail import bp_mail
     from app.routes_frontend import bp_frontend # <-- INI YANG BARU DITAMBAHKAN
+    from app.routes_admin import bp_admin
     
     # Daftarkan Blueprints ke Aplikasi Utama
     app.register_blueprint(bp_auth, url_prefix='/api')
     app.register_blueprint(bp_ai, url_prefix='/api')
     app.register_blueprint(bp_mail, url_prefix='/api')
+    app.register_blueprint(bp_admin, url_prefix='/api')
     
     # Frontend di root URL (Tanpa prefix /api)
     app.register_blueprint(bp_frontend)
     
+    # Worker background untuk spool inbound (drain sisa antrean dari run sebelumnya)
+    from app.inbound import inbound_spool
+    from app.delivery import delivery
+    from app import retention, sweeper
+    from app.routing import mail_router
+    inbound_spool.start()
+    delivery.start()
+    retention.start_sweeper()
+    sweeper.start_sweeper()
+    mail_router.start()
+    profiling.profiler.start()
+
+    app.register_error_handler(DependencyUnavailable, _dependency_unavailable)
+    app.before_request(_first_request_timer)
+    app.after_request(_first_request_done)
+    container.mark("create_app_ms", time.perf_counter() - started)
     return app
+
+
+container.mark("import_ms", time.perf_counter() - _IMPORT_T0)
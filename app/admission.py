@@ -0,0 +1,187 @@
+# app/admission.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: ADMISSION CONTROL & LOAD SHEDDING (PER ROUTE CLASS, AIMD)
+#
+# Tanpa ini, dependency yang lambat (pollinations, SMTP, Firebase) membuat semua
+# thread worker tertahan dan request baru antre di backlog gunicorn sampai timeout.
+# Middleware ini (hook before/teardown request, per worker) memutuskan di depan:
+# - Tiap route masuk 1 kelas (ADMISSION_ROUTES). Kelas punya `share`: request kelas
+#   itu hanya diterima selama total in-flight worker < share x kapasitas. Sisanya
+#   jadi cadangan untuk kelas yang lebih penting (/webhook-inbound, /login).
+# - Tiap kelas punya limit in-flight adaptif (AIMD): selesai di bawah target latency
+#   -> limit naik +1 per ~limit request, di atas target -> limit x ADMISSION_DECREASE.
+# - Kelas penuh -> tunggu sebentar (max_wait, dikurangi waktu antre di proxy kalau
+#   header-nya ada), lalu 503 + Retry-After. Thread tidak pernah ditahan lama.
+# Kapasitas = thread gunicorn dikurangi stream SSE yang sedang hidup di worker ini.
+
+import math
+import time
+import threading
+from flask import request, g, jsonify
+from config import Config
+from app import metrics
+from app.notify import hub
+
+EXEMPT = None # Tidak dihitung & tidak pernah ditolak (admin, /metrics, SSE, frontend)
+
+
+def parse_request_start(value, now):
+    """Header antre proxy ("t=<epoch>" detik/ms/us, gaya nginx & Heroku) -> detik antre, atau None"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.startswith("t="):
+        value = value[2:]
+    try:
+        started = float(value)
+    except ValueError:
+        return None
+    # Satuan ditebak dari besarnya angka
+    while started > now * 10:
+        started /= 1000.0
+    return max(0.0, now - started)
+
+
+class RouteClass:
+
+    def __init__(self, name, share, max_wait, target, capacity):
+        self.name = name
+        self.share = share
+        self.max_wait = max_wait
+        self.target = target
+        self.max_limit = max(1.0, capacity * share)
+        self.limit = self.max_limit
+        self.inflight = 0
+        self.latency_ewma = 0.0
+        self.last_decrease = 0.0
+        self.stats = {"admitted": 0, "queued": 0, "shed_limit": 0, "shed_capacity": 0,
+                      "increases": 0, "decreases": 0, "queue_ms_max": 0.0, "queue_ms_sum": 0.0}
+
+
+class AdmissionController:
+
+    def __init__(self, capacity, classes, routes):
+        """
+        classes = {nama: {"share", "max_wait", "target"}} urut prioritas (tertinggi dulu).
+        routes = [(prefix path, nama kelas / None)], match pertama menang.
+        """
+        self.capacity = capacity
+        self.classes = {name: RouteClass(name, c["share"], c["max_wait"], c["target"], capacity)
+                        for name, c in classes.items()}
+        self.routes = routes
+        self._total = 0
+        self._cond = threading.Condition()
+
+    def classify(self, path):
+        for prefix, name in self.routes:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return name
+        return Config.ADMISSION_DEFAULT_CLASS if path.startswith("/api/") else EXEMPT
+
+    def _available(self):
+        # Thread yang dipegang stream SSE tidak bisa dipakai request lain
+        return max(1, self.capacity - hub.active())
+
+    def _admissible(self, rc):
+        return rc.inflight < rc.limit and self._total < self._available() * rc.share
+
+    # --------------------------------------------------------------------------
+    # ACQUIRE / RELEASE
+    # --------------------------------------------------------------------------
+    def acquire(self, rc, upstream_wait=0.0):
+        """True = boleh jalan (wajib release), False = shed"""
+        started = time.perf_counter()
+        with self._cond:
+            if not self._admissible(rc):
+                rc.stats["queued"] += 1
+                deadline = started + max(0.0, rc.max_wait - upstream_wait)
+                while not self._admissible(rc):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        reason = "limit" if rc.inflight >= rc.limit else "capacity"
+                        rc.stats["shed_" + reason] += 1
+                        metrics.admission_shed(rc.name, reason)
+                        return False
+                    self._cond.wait(remaining)
+            rc.inflight += 1
+            self._total += 1
+            waited = time.perf_counter() - started + upstream_wait
+            rc.stats["admitted"] += 1
+            rc.stats["queue_ms_sum"] += waited * 1000.0
+            rc.stats["queue_ms_max"] = max(rc.stats["queue_ms_max"], waited * 1000.0)
+        metrics.admission_queued(rc.name, waited)
+        return True
+
+    def release(self, rc, latency):
+        now = time.time()
+        with self._cond:
+            rc.inflight -= 1
+            self._total -= 1
+            rc.latency_ewma = latency if not rc.latency_ewma else rc.latency_ewma * 0.9 + latency * 0.1
+            if latency <= rc.target:
+                # Additive increase: kira-kira +1 setiap `limit` request yang sehat
+                if rc.limit < rc.max_limit:
+                    rc.limit = min(rc.max_limit, rc.limit + 1.0 / rc.limit)
+                    rc.stats["increases"] += 1
+            elif now - rc.last_decrease >= Config.ADMISSION_DECREASE_INTERVAL:
+                # Multiplicative decrease, maksimal 1x per interval (1 lonjakan = 1 turun)
+                rc.limit = max(Config.ADMISSION_MIN_LIMIT, rc.limit * Config.ADMISSION_DECREASE)
+                rc.last_decrease = now
+                rc.stats["decreases"] += 1
+            self._cond.notify_all()
+
+    def retry_after(self, rc):
+        """Detik untuk header Retry-After: kira-kira 1 putaran latency kelas ini"""
+        return int(min(Config.ADMISSION_RETRY_AFTER_MAX, max(1, math.ceil(rc.latency_ewma))))
+
+    def stats(self):
+        with self._cond:
+            snap = {"capacity": self.capacity, "available": self._available(), "inflight": self._total,
+                    "classes": {}}
+            for name, rc in self.classes.items():
+                s = dict(rc.stats)
+                queue_sum = s.pop("queue_ms_sum")
+                s["queue_ms_avg"] = round(queue_sum / s["admitted"], 3) if s["admitted"] else 0.0
+                s["queue_ms_max"] = round(s["queue_ms_max"], 3)
+                s.update(inflight=rc.inflight, limit=round(rc.limit, 2), max_limit=round(rc.max_limit, 2),
+                         share=rc.share, target_ms=rc.target * 1000.0,
+                         latency_ms_ewma=round(rc.latency_ewma * 1000.0, 3))
+                snap["classes"][name] = s
+        return snap
+
+
+# ==============================================================================
+# FLASK HOOKS
+# ==============================================================================
+def _before_request():
+    rc = admission.classes.get(admission.classify(request.path))
+    if rc is None:
+        return None
+    upstream = 0.0
+    if Config.ADMISSION_QUEUE_HEADER:
+        upstream = parse_request_start(request.headers.get(Config.ADMISSION_QUEUE_HEADER), time.time()) or 0.0
+    if not admission.acquire(rc, upstream):
+        resp = jsonify({"error": "Server Busy, Retry Shortly"})
+        resp.headers['Retry-After'] = str(admission.retry_after(rc))
+        return resp, 503
+    g._admission = (rc, time.perf_counter())
+    return None
+
+
+def _teardown_request(exc):
+    # Selalu jalan (termasuk saat exception): pasangan acquire() di before_request
+    entry = g.pop('_admission', None)
+    if entry is not None:
+        rc, started = entry
+        admission.release(rc, time.perf_counter() - started)
+
+
+def init_app(app):
+    if not Config.ADMISSION_ENABLED:
+        return
+    app.before_request(_before_request)
+    app.teardown_request(_teardown_request)
+
+
+# Instance global per worker (thread gunicorn = kapasitas per worker)
+admission = AdmissionController(Config.ADMISSION_CAPACITY, Config.ADMISSION_CLASSES, Config.ADMISSION_ROUTES)
@@ -0,0 +1,93 @@
+# app/ai_client.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: AI INTERVIEW CLIENT (POOLED SESSION + BULKHEAD + CIRCUIT BREAKER)
+#
+# Wawancara AI tidak boleh menyandera worker: jumlah call upstream yang berjalan
+# bersamaan dibatasi lintas semua worker (bulkhead). Kalau penuh langsung ditolak,
+# dan kalau upstream gagal beruntun circuit dibuka supaya request berikutnya
+# gagal cepat tanpa menunggu timeout.
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from app.circuit import CircuitBreaker, ProcessBulkhead
+from app.metrics import timed
+
+
+class AIBusy(Exception):
+    """Bulkhead penuh / circuit terbuka: jangan tunggu, suruh client coba lagi"""
+
+
+class AIUnavailable(Exception):
+    """Upstream error / timeout / jawaban tidak valid"""
+
+
+class AIClient:
+
+    def __init__(self):
+        self._pid = None
+        self._session = None
+        self._lock = threading.Lock()
+        self.breaker = CircuitBreaker(Config.AI_BREAKER_THRESHOLD, Config.AI_BREAKER_RESET)
+        self.bulkhead = ProcessBulkhead(f"{Config.DB_FILE}.ai-bulkhead.lock", Config.AI_MAX_CONCURRENCY)
+        self._stats = {"calls": 0, "ok": 0, "errors": 0, "rejected_busy": 0, "rejected_open": 0}
+
+    def _get_session(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    sess = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.AI_MAX_CONCURRENCY, max_retries=0)
+                    sess.mount("http://", adapter)
+                    sess.mount("https://", adapter)
+                    self._session, self._pid = sess, os.getpid()
+        return self._session
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def complete(self, messages):
+        """Kirim percakapan ke backend AI. Return teks mentah jawaban."""
+        slot = self.bulkhead.acquire()
+        if slot is None:
+            self._bump("rejected_busy")
+            raise AIBusy("bulkhead full")
+        try:
+            # Dicek setelah dapat slot: probe HALF_OPEN tidak boleh hilang tanpa hasil
+            if not self.breaker.allow():
+                self._bump("rejected_open")
+                raise AIBusy("circuit open")
+
+            self._bump("calls")
+            try:
+                with timed("http", "ai_backend"):
+                    res = self._get_session().post(
+                        Config.AI_BACKEND_URL,
+                        json={"messages": messages, "model": Config.AI_MODEL, "jsonMode": True},
+                        timeout=(Config.AI_CONNECT_TIMEOUT, Config.AI_TIMEOUT))
+                    res.raise_for_status()
+            except Exception as e:
+                self.breaker.record_failure()
+                self._bump("errors")
+                raise AIUnavailable(str(e))
+
+            self.breaker.record_success()
+            self._bump("ok")
+            return res.text
+        finally:
+            self.bulkhead.release(slot)
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+        snap["breaker"] = self.breaker.snapshot()
+        snap["in_flight_local"] = self.bulkhead.in_use_local()
+        snap["backend"] = Config.AI_BACKEND_URL
+        return snap
+
+
+# Instance global per worker (bulkhead-nya dibagi lintas worker)
+ai_client = AIClient()
@@ -0,0 +1,137 @@
+# app/assets.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: STATIC ASSET PIPELINE (PRECOMPRESS + FINGERPRINT, IN-MEMORY)
+#
+# Saat worker start semua file di app/static dibaca sekali, dikompres (gzip,
+# brotli kalau modulnya ada) dan diberi nama ber-hash: js/builder.<hash>.js.
+# index.html ditulis ulang supaya menunjuk ke nama ber-hash, jadi asset bisa
+# di-cache browser selamanya (immutable) dan index.html cukup revalidasi ETag.
+
+import os
+import gzip
+import hashlib
+import mimetypes
+from flask import request, Response
+from config import Config
+
+try:
+    import brotli # Opsional: tanpa modul ini hanya gzip
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_PREFIX = '/static/'
+REWRITE_TYPES = ('text/html',)
+
+
+class Asset:
+
+    def __init__(self, rel_path, data, content_type):
+        self.rel_path = rel_path
+        self.content_type = content_type
+        self.digest = None
+        self.variants = {} # encoding -> bytes
+        self.set_data(data)
+        root, ext = os.path.splitext(rel_path)
+        self.fingerprinted = f"{root}.{self.digest[:10]}{ext}"
+
+    def set_data(self, data):
+        self.digest = hashlib.sha256(data).hexdigest()[:16]
+        self.variants = {"identity": data}
+        if len(data) >= Config.ASSET_MIN_COMPRESS:
+            gz = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(gz) < len(data):
+                self.variants["gzip"] = gz
+            if brotli is not None:
+                br = brotli.compress(data, quality=11)
+                if len(br) < len(data):
+                    self.variants["br"] = br
+
+    def etag(self, encoding):
+        # ETag kuat harus beda per representasi (Content-Encoding)
+        return f"{self.digest}-{encoding}"
+
+
+class AssetStore:
+
+    def __init__(self, root):
+        self.root = root
+        self.by_path = {} # path relatif (asli & ber-fingerprint) -> (Asset, immutable?)
+        self.assets = []
+
+    def load(self):
+        assets = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in sorted(filenames):
+                full = os.path.join(dirpath, name)
+                rel = os.path.relpath(full, self.root).replace(os.sep, '/')
+                with open(full, 'rb') as f:
+                    data = f.read()
+                content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+                if content_type.startswith('text/') or content_type in ('application/javascript', 'text/javascript'):
+                    content_type += '; charset=utf-8'
+                assets.append(Asset(rel, data, content_type))
+
+        # HTML menunjuk ke nama ber-fingerprint (asset lain sudah final, HTML diproses terakhir)
+        rewrites = {STATIC_PREFIX + a.rel_path: STATIC_PREFIX + a.fingerprinted
+                    for a in assets if not a.content_type.startswith(REWRITE_TYPES)}
+        for asset in assets:
+            if asset.content_type.startswith(REWRITE_TYPES):
+                html = asset.variants["identity"].decode('utf-8')
+                for old, new in rewrites.items():
+                    html = html.replace(f'"{old}"', f'"{new}"')
+                asset.set_data(html.encode('utf-8'))
+
+        by_path = {}
+        for asset in assets:
+            by_path[asset.rel_path] = (asset, False)
+            if not asset.content_type.startswith(REWRITE_TYPES):
+                by_path[asset.fingerprinted] = (asset, True)
+        self.assets, self.by_path = assets, by_path
+        return self
+
+    def url_for(self, rel_path):
+        entry = self.by_path.get(rel_path)
+        return STATIC_PREFIX + (entry[0].fingerprinted if entry else rel_path)
+
+    def serve(self, rel_path):
+        """Response untuk asset, atau None kalau tidak ada"""
+        entry = self.by_path.get(rel_path)
+        if entry is None:
+            return None
+        asset, immutable = entry
+
+        encoding = "identity"
+        for candidate in ("br", "gzip"):
+            if candidate in asset.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+
+        if immutable:
+            cache_control = f"public, max-age={Config.ASSET_IMMUTABLE_MAX_AGE}, immutable"
+        elif asset.content_type.startswith('text/html'):
+            cache_control = f"public, max-age={Config.ASSET_INDEX_MAX_AGE}, must-revalidate"
+        else:
+            # URL tanpa fingerprint (link lama): selalu revalidasi, 304 kalau sama
+            cache_control = "no-cache"
+
+        etag = asset.etag(encoding)
+        if request.if_none_match.contains(etag):
+            resp = Response(status=304)
+        else:
+            resp = Response(asset.variants[encoding], mimetype=None, content_type=asset.content_type)
+            if encoding != "identity":
+                resp.headers['Content-Encoding'] = encoding
+        resp.set_etag(etag)
+        resp.headers['Cache-Control'] = cache_control
+        resp.headers['Vary'] = 'Accept-Encoding'
+        return resp
+
+    def stats(self):
+        return {a.rel_path: {"fingerprinted": a.fingerprinted,
+                             "bytes": {enc: len(data) for enc, data in a.variants.items()}}
+                for a in self.assets}
+
+
+# Instance global per worker (dibaca sekali saat import)
+assets = AssetStore(STATIC_DIR).load()
@@ -0,0 +1,177 @@
+# app/audit.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: BUFFERED AUDIT LOG WRITER (GROUP COMMIT) + READ API
+#
+# log_audit() cukup memasukkan event ke ring buffer di memori. Thread background
+# menulis semuanya dengan executemany dalam 1 transaksi saat buffer mencapai
+# AUDIT_FLUSH_SIZE atau tiap AUDIT_FLUSH_INTERVAL detik. Buffer dibatasi
+# AUDIT_BUFFER_MAX; kalau penuh (serangan besar) event baru dibuang dan dihitung.
+#
+# AuditReader (endpoint /admin/audit*) membaca lewat koneksi read-only dengan
+# keyset pagination (timestamp, id): tiap halaman / chunk export = 1 query
+# pendek, jadi tidak ada snapshot WAL panjang yang menahan checkpoint.
+
+import json
+import time
+import threading
+from collections import deque
+from config import Config
+from app.database import pool, ro_pool
+from app.background import PeriodicTask
+
+
+class AuditWriter:
+
+    def __init__(self, capacity, flush_size, flush_interval):
+        self.capacity = capacity
+        self.flush_size = flush_size
+        self._buf = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._task = PeriodicTask("audit-flush", flush_interval, self.flush, run_on_exit=True)
+        self._stats = {"queued": 0, "written": 0, "dropped": 0, "flushes": 0, "errors": 0}
+
+    def write(self, row):
+        """row = (timestamp, event, detail, anon_ip). Tidak pernah blocking ke SQLite."""
+        self._task.start()
+        with self._lock:
+            if len(self._buf) >= self.capacity:
+                self._stats["dropped"] += 1
+                return False
+            self._buf.append(row)
+            self._stats["queued"] += 1
+            full = len(self._buf) >= self.flush_size
+        if full:
+            self._task.wake()
+        return True
+
+    def flush(self):
+        # 1 flusher dalam satu waktu (thread background vs flush saat exit)
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buf:
+                        return
+                    batch = [self._buf.popleft() for _ in range(min(len(self._buf), Config.AUDIT_BATCH_MAX))]
+                try:
+                    pool.executemany("INSERT INTO audit_log (timestamp, event, detail, anon_ip) VALUES (?, ?, ?, ?)", batch)
+                except Exception as e:
+                    with self._lock:
+                        self._stats["errors"] += 1
+                        # Kembalikan ke depan buffer kalau masih muat, sisanya dihitung drop
+                        room = self.capacity - len(self._buf)
+                        self._buf.extendleft(reversed(batch[:room]))
+                        self._stats["dropped"] += max(0, len(batch) - room)
+                    print(f"❌ Audit flush failed: {e}", flush=True)
+                    return
+                with self._lock:
+                    self._stats["written"] += len(batch)
+                    self._stats["flushes"] += 1
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["buffered"] = len(self._buf)
+        return snap
+
+
+class AuditQueryError(ValueError):
+    """Parameter query audit tidak valid (-> HTTP 400)"""
+
+
+class AuditReader:
+    """
+    Event yang masih di buffer AuditWriter (worker mana pun) belum terlihat,
+    paling lama AUDIT_FLUSH_INTERVAL detik.
+    """
+
+    COLUMNS = ("id", "timestamp", "event", "detail", "anon_ip")
+
+    def __init__(self, db):
+        self.db = db
+
+    @staticmethod
+    def parse_cursor(cursor):
+        """Cursor = '<timestamp>:<id>' dari row terakhir halaman sebelumnya"""
+        try:
+            ts, _, row_id = cursor.rpartition(":")
+            return float(ts), int(row_id)
+        except (AttributeError, ValueError):
+            raise AuditQueryError("invalid cursor")
+
+    @staticmethod
+    def make_cursor(row):
+        return f"{row[1]!r}:{row[0]}"
+
+    def _where(self, events, since, until, after, descending):
+        clauses, args = [], []
+        if len(events or ()) == 1:
+            clauses.append("event = ?") # idx_audit_event_time, urutan (timestamp, id) langsung dari index
+            args.extend(events)
+        elif events:
+            # Beberapa event: '+event' = jangan pakai index event, jalan urut di idx_audit_time.
+            # Kalau tidak, SQLite menyortir semua match di temp B-tree untuk tiap halaman/chunk.
+            clauses.append(f"+event IN ({','.join('?' * len(events))})")
+            args.extend(events)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("timestamp < ?")
+            args.append(until)
+        if after is not None:
+            clauses.append("(timestamp, id) < (?, ?)" if descending else "(timestamp, id) > (?, ?)")
+            args.extend(after)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", args
+
+    def _fetch(self, events, since, until, after, limit, descending):
+        where, args = self._where(events, since, until, after, descending)
+        order = "DESC" if descending else "ASC"
+        return self.db.query(f"SELECT id, timestamp, event, detail, anon_ip FROM audit_log{where} "
+                             f"ORDER BY timestamp {order}, id {order} LIMIT ?", args + [limit])
+
+    def page(self, events=None, since=None, until=None, cursor=None, limit=100, descending=True):
+        limit = max(1, min(int(limit), Config.AUDIT_QUERY_MAX_LIMIT))
+        after = self.parse_cursor(cursor) if cursor else None
+        rows = self._fetch(events, since, until, after, limit + 1, descending)
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "events": [dict(zip(self.COLUMNS, row)) for row in rows],
+            "next_cursor": self.make_cursor(rows[-1]) if more else None,
+        }
+
+    def export_ndjson(self, events=None, since=None, until=None, descending=False):
+        """Generator NDJSON: memori tetap kecil (1 chunk) berapa pun ukuran tabel"""
+        # Batas atas dikunci di awal export supaya event baru tidak membuatnya tak pernah selesai
+        until = time.time() if until is None else until
+        after = None
+        while True:
+            rows = self._fetch(events, since, until, after, Config.AUDIT_EXPORT_CHUNK, descending)
+            if not rows:
+                return
+            yield "".join(json.dumps(dict(zip(self.COLUMNS, row))) + "\n" for row in rows)
+            if len(rows) < Config.AUDIT_EXPORT_CHUNK:
+                return
+            after = (rows[-1][1], rows[-1][0])
+
+    def counts(self, bucket, events=None, since=None, until=None):
+        """Jumlah event per (bucket waktu, event). bucket dalam detik."""
+        if since is None:
+            since = (until or time.time()) - Config.AUDIT_COUNTS_DEFAULT_RANGE
+        where, args = self._where(events, since, until, None, False)
+        rows = self.db.query(f"SELECT CAST(timestamp / ? AS INTEGER) * ? AS bucket_start, event, COUNT(*) "
+                             f"FROM audit_log{where} GROUP BY bucket_start, event ORDER BY bucket_start, event LIMIT ?",
+                             [bucket, bucket] + args + [Config.AUDIT_COUNTS_MAX_ROWS + 1])
+        return {
+            "bucket": bucket,
+            "since": since,
+            "until": until,
+            "counts": [{"bucket_start": b, "event": e, "count": c} for b, e, c in rows[:Config.AUDIT_COUNTS_MAX_ROWS]],
+            "truncated": len(rows) > Config.AUDIT_COUNTS_MAX_ROWS,
+        }
+
+
+# Instance global per worker (flush otomatis saat worker exit)
+audit_writer = AuditWriter(Config.AUDIT_BUFFER_MAX, Config.AUDIT_FLUSH_SIZE, Config.AUDIT_FLUSH_INTERVAL)
+audit_reader = AuditReader(ro_pool)
@@ -0,0 +1,89 @@
+# app/background.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: BACKGROUND TASK HELPER (PER-WORKER DAEMON THREADS)
+
+import os
+import fcntl
+import atexit
+import threading
+
+
+class PeriodicTask:
+    """
+    Jalankan fn() tiap `interval` detik di daemon thread.
+    Fork-aware: start() di worker gunicorn membuat thread baru walau parent sudah start.
+    leader_lock: path file lock; kalau di-set hanya 1 proses (pemegang flock) yang
+    menjalankan fn(), worker lain skip sampai pemegang lock mati.
+    """
+
+    def __init__(self, name, interval, fn, run_on_exit=False, leader_lock=None):
+        self.name = name
+        self.interval = interval
+        self.fn = fn
+        self.run_on_exit = run_on_exit
+        self.leader_lock = leader_lock
+        self._leader_fd = None
+        self._leader_pid = None
+        self._pid = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._atexit = False
+
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._wake = threading.Event()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            # Handler atexit ikut ter-copy saat fork, cukup daftar sekali
+            if not self._atexit:
+                atexit.register(self.stop)
+                self._atexit = True
+
+    def wake(self):
+        """Jalankan tick berikutnya sekarang, tanpa menunggu interval"""
+        self._wake.set()
+
+    def stop(self):
+        if self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        if self.run_on_exit:
+            self._tick()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            self._tick()
+
+    def is_leader(self):
+        if not self.leader_lock:
+            return True
+        if self._leader_pid == os.getpid():
+            return True
+        fd = os.open(self.leader_lock, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        # Lock ditahan selama proses hidup (dilepas otomatis oleh OS saat worker mati)
+        self._leader_fd, self._leader_pid = fd, os.getpid()
+        return True
+
+    def _tick(self):
+        try:
+            if not self.is_leader():
+                return
+            self.fn()
+        except Exception as e:
+            print(f"❌ Background task '{self.name}' error: {e}", flush=True)
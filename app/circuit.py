@@ -0,0 +1,107 @@
+# app/circuit.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: CIRCUIT BREAKER & BULKHEAD (PER DEPENDENCY / DESTINATION)
+
+import os
+import time
+import fcntl
+import threading
+
+CLOSED = "CLOSED"
+OPEN = "OPEN"
+HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """
+    CLOSED: semua call jalan. Gagal beruntun >= threshold -> OPEN.
+    OPEN: call langsung ditolak sampai reset_timeout lewat -> HALF_OPEN.
+    HALF_OPEN: 1 call percobaan; sukses -> CLOSED, gagal -> OPEN lagi.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+                self._probe = False
+            if self.state == HALF_OPEN and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def retry_at(self):
+        """Kapan breaker boleh dicoba lagi (epoch detik)"""
+        return self.opened_at + self.reset_timeout
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._probe = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.threshold:
+                self.state = OPEN
+                self.opened_at = time.time()
+                self._probe = False
+
+    def snapshot(self):
+        return {"state": self.state, "failures": self.failures}
+
+
+class ProcessBulkhead:
+    """
+    Batas concurrency lintas SEMUA worker gunicorn (bukan cuma per proses).
+    Slot = byte di file lock; acquire() non-blocking: ambil slot kosong atau langsung gagal.
+    """
+
+    def __init__(self, path, slots):
+        self.path = path
+        self.slots = slots
+        self._pid = None
+        self._fd = None
+        self._held = set()
+        self._lock = threading.Lock()
+
+    def _ensure_open(self):
+        if self._pid != os.getpid():
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._held = set()
+            self._pid = os.getpid()
+
+    def acquire(self):
+        """Return nomor slot, atau None kalau semua slot terpakai"""
+        with self._lock:
+            self._ensure_open()
+            for slot in range(self.slots):
+                # Lock fcntl milik proses, jadi slot yang dipegang thread lain di proses ini dicek manual
+                if slot in self._held:
+                    continue
+                try:
+                    fcntl.lockf(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, slot)
+                except OSError:
+                    continue
+                self._held.add(slot)
+                return slot
+            return None
+
+    def release(self, slot):
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, slot)
+            self._held.discard(slot)
+
+    def in_use_local(self):
+        return len(self._held)
@@ -0,0 +1,158 @@
+# app/container.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: LAZY DEPENDENCY CONTAINER (FIREBASE, CIPHER) + BOOT TIMINGS
+#
+# Dependency mahal (Firebase app + DB reference, Fernet) baru dibuat saat
+# pertama dipakai, bukan saat import / create_app. Modul lain memegang
+# LazyProxy, bukan objeknya langsung, jadi:
+# - `from app import auth_db_ref` di route tidak pernah "membeku" jadi None
+# - init yang gagal (Firebase sedang error) dicoba lagi setelah jeda singkat
+# - reset() mengganti objek di belakang proxy (reconnect) tanpa restart worker
+# Worker gunicorn bisa memanaskan semuanya di background lewat post_worker_init.
+
+import os
+import time
+import threading
+from app.metrics import timed, observe
+
+_BOOT_T0 = time.perf_counter() # ~ awal import app di worker ini
+
+
+class DependencyUnavailable(Exception):
+    """Init dependency gagal (atau masih dalam jeda retry)"""
+
+
+class Provider:
+
+    def __init__(self, name, factory, retry_after):
+        self.name = name
+        self.factory = factory
+        self.retry_after = retry_after
+        self._value = None
+        self._pid = None
+        self._failed_at = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"inits": 0, "failures": 0, "init_ms": None, "last_error": None}
+
+    def get(self):
+        value = self._value
+        if value is not None and self._pid == os.getpid():
+            return value
+        with self._lock:
+            # Objek dari proses induk (preload) tidak dipakai ulang setelah fork
+            if self._value is not None and self._pid == os.getpid():
+                return self._value
+            if time.time() - self._failed_at < self.retry_after:
+                raise DependencyUnavailable(f"{self.name}: {self._stats['last_error']}")
+            started = time.perf_counter()
+            try:
+                with timed("init", self.name):
+                    value = self.factory()
+            except Exception as e:
+                self._failed_at = time.time()
+                self._stats["failures"] += 1
+                self._stats["last_error"] = str(e)
+                print(f"❌ {self.name} init failed: {e}", flush=True)
+                raise DependencyUnavailable(f"{self.name}: {e}") from e
+            self._value, self._pid = value, os.getpid()
+            self._failed_at = 0.0
+            self._stats["inits"] += 1
+            self._stats["init_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+            return value
+
+    def reset(self):
+        """Buang objek sekarang: pemakaian berikutnya membuat ulang (reconnect)"""
+        with self._lock:
+            self._value = None
+            self._failed_at = 0.0
+
+    def ready(self):
+        return self._value is not None and self._pid == os.getpid()
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+        snap["ready"] = self.ready()
+        return snap
+
+
+class LazyProxy:
+    """Berperilaku seperti objek aslinya; objek dibuat/diambil dari provider tiap akses atribut"""
+
+    __slots__ = ("_provider",)
+
+    def __init__(self, provider):
+        object.__setattr__(self, "_provider", provider)
+
+    def __getattr__(self, name):
+        return getattr(self._provider.get(), name)
+
+    def __repr__(self):
+        state = "ready" if self._provider.ready() else "lazy"
+        return f"<LazyProxy {self._provider.name} ({state})>"
+
+
+class Container:
+
+    def __init__(self, retry_after=5.0):
+        self.retry_after = retry_after
+        self._providers = {}
+        self._boot = {}
+        self._lock = threading.Lock()
+
+    def register(self, name, factory, retry_after=None):
+        provider = Provider(name, factory, self.retry_after if retry_after is None else retry_after)
+        self._providers[name] = provider
+        return provider
+
+    def proxy(self, name):
+        return LazyProxy(self._providers[name])
+
+    def get(self, name):
+        return self._providers[name].get()
+
+    def reset(self, name=None):
+        for provider_name, provider in self._providers.items():
+            if name is None or provider_name == name:
+                provider.reset()
+
+    def warm(self, names=None):
+        """Buat semua dependency sekarang. Gagal tidak fatal (dicoba lagi saat dipakai)."""
+        started = time.perf_counter()
+        for name, provider in list(self._providers.items()):
+            if names is not None and name not in names:
+                continue
+            try:
+                provider.get()
+            except DependencyUnavailable:
+                pass
+        self.mark("warm_ms", time.perf_counter() - started)
+
+    def warm_async(self, names=None):
+        thread = threading.Thread(target=self.warm, args=(names,), name="dependency-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    # --------------------------------------------------------------------------
+    # BOOT TIMINGS (import, create_app, request pertama)
+    # --------------------------------------------------------------------------
+    def mark(self, phase, seconds):
+        """Catat durasi fase boot (sekali per worker) + histogram dependency 'boot'"""
+        with self._lock:
+            if phase in self._boot:
+                return
+            self._boot[phase] = round(seconds * 1000.0, 3)
+        observe("boot", phase.removesuffix("_ms"), seconds)
+
+    def since_boot(self):
+        return time.perf_counter() - _BOOT_T0
+
+    def stats(self):
+        with self._lock:
+            boot = dict(self._boot)
+        return {"pid": os.getpid(), "boot": boot,
+                "dependencies": {name: p.stats() for name, p in self._providers.items()}}
+
+
+# Instance global per worker
+container = Container()
@@ -0,0 +1,151 @@
+# app/database.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: SQLITE CONNECTION MANAGER (PER-WORKER, PER-THREAD)
+
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from config import Config
+from app.metrics import timed, observe
+
+
+class ConnectionManager:
+    """
+    Satu koneksi SQLite per thread, hidup selama worker hidup.
+    Pragma dipasang sekali saat koneksi dibuat, statement di-cache oleh sqlite3
+    (cached_statements) sehingga query yang sama tidak di-prepare ulang.
+    """
+
+    def __init__(self, path, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        self._pid = os.getpid()
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "connects": 0,
+            "reuses": 0,
+            "transactions": 0,
+            "lock_waits": 0,
+            "lock_wait_ms": 0.0,
+            "busy_errors": 0,
+        }
+
+    # --------------------------------------------------------------------------
+    # CONNECTION LIFECYCLE
+    # --------------------------------------------------------------------------
+    def _connect(self):
+        # readonly: mode=ro + query_only, cuma bisa membaca snapshot WAL (tidak pernah ambil write lock)
+        target = f"file:{self.path}?mode=ro" if self.readonly else self.path
+        conn = sqlite3.connect(
+            target,
+            timeout=Config.DB_BUSY_TIMEOUT_MS / 1000.0,
+            isolation_level=None, # Autocommit, transaksi diatur manual (BEGIN IMMEDIATE)
+            cached_statements=Config.DB_STATEMENT_CACHE,
+            uri=self.readonly,
+        )
+        if self.readonly:
+            conn.execute("PRAGMA query_only=1;")
+        conn.execute(f"PRAGMA busy_timeout={int(Config.DB_BUSY_TIMEOUT_MS)};")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute(f"PRAGMA mmap_size={int(Config.DB_MMAP_SIZE)};")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        return conn
+
+    def connection(self):
+        # Setelah fork (gunicorn), koneksi milik parent tidak boleh dipakai ulang
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._local = threading.local()
+
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._bump("connects")
+        else:
+            self._bump("reuses")
+        return conn
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # --------------------------------------------------------------------------
+    # TRANSACTIONS
+    # --------------------------------------------------------------------------
+    @contextmanager
+    def transaction(self):
+        """
+        Transaksi tulis eksplisit (BEGIN IMMEDIATE).
+        Nested call ikut transaksi luar. Waktu tunggu lock dihitung dari BEGIN.
+        """
+        conn = self.connection()
+        if conn.in_transaction:
+            yield conn
+            return
+
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+        except sqlite3.OperationalError:
+            self._bump("busy_errors")
+            raise
+        waited_ms = (time.perf_counter() - started) * 1000.0
+        observe("sqlite", "begin_immediate", waited_ms / 1000.0)
+        with self._stats_lock:
+            self._stats["transactions"] += 1
+            if waited_ms >= Config.DB_LOCK_WAIT_THRESHOLD_MS:
+                self._stats["lock_waits"] += 1
+                self._stats["lock_wait_ms"] += waited_ms
+
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        else:
+            conn.commit()
+
+    # --------------------------------------------------------------------------
+    # QUERY HELPERS
+    # --------------------------------------------------------------------------
+    def execute(self, query, args=()):
+        with timed("sqlite", "execute"), self.transaction() as conn:
+            return conn.execute(query, args)
+
+    def executemany(self, query, seq):
+        with timed("sqlite", "executemany"), self.transaction() as conn:
+            return conn.executemany(query, seq)
+
+    def query(self, query, args=(), one=False):
+        with timed("sqlite", "query"):
+            cur = self.connection().execute(query, args)
+            rv = cur.fetchall()
+        return (rv[0] if rv else None) if one else rv
+
+    # --------------------------------------------------------------------------
+    # STATS
+    # --------------------------------------------------------------------------
+    def _bump(self, key, n=1):
+        with self._stats_lock:
+            self._stats[key] += n
+
+    def stats(self):
+        with self._stats_lock:
+            snap = dict(self._stats)
+        opened = snap["connects"] + snap["reuses"]
+        snap["reuse_ratio"] = round(snap["reuses"] / opened, 4) if opened else 0.0
+        snap["lock_wait_ms"] = round(snap["lock_wait_ms"], 3)
+        snap["pid"] = self._pid
+        return snap
+
+
+# Instance global per worker
+pool = ConnectionManager(Config.DB_FILE)
+# Koneksi baca saja (admin / export): query panjang tidak bisa menahan writer
+ro_pool = ConnectionManager(Config.DB_FILE, readonly=True)
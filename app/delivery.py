@@ -0,0 +1,234 @@
+# app/delivery.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: WEBHOOK FORWARDING DELIVERY ENGINE
+#
+# Forward email ke settings.forward_url user:
+# - requests.Session per host (koneksi TCP/TLS dipakai ulang)
+# - Thread pool terbatas + batas concurrency per tujuan
+# - Retry exponential backoff + jitter, circuit breaker per tujuan
+# - Status tiap pengiriman dicatat di tabel deliveries (bisa di-replay)
+# - Host di-resolve + divalidasi ulang saat kirim, koneksi di-pin ke IP tersebut
+
+import os
+import json
+import time
+import uuid
+import random
+import threading
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from app.database import pool
+from app.circuit import CircuitBreaker
+from app.resolver import resolver, pin_url, SAFE, UNSAFE
+from app.background import PeriodicTask
+from app.metrics import timed
+
+
+def destination_of(url):
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.scheme}://{parsed.hostname}:{port}"
+
+
+class PinnedHostAdapter(HTTPAdapter):
+    """
+    URL request berisi IP yang sudah divalidasi, tapi TLS tetap memakai hostname asli
+    (SNI + verifikasi sertifikat), jadi pin IP tidak melemahkan HTTPS.
+    """
+
+    def __init__(self, hostname, **kwargs):
+        self.hostname = hostname
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs["server_hostname"] = self.hostname
+        kwargs["assert_hostname"] = self.hostname
+        super().init_poolmanager(*args, **kwargs)
+
+
+class DeliveryEngine:
+
+    def __init__(self):
+        self._pid = None
+        self._owner = None # "<pid>-<acak>": pid bisa dipakai ulang setelah restart
+        self._executor = None
+        self._sessions = {}
+        self._breakers = {}
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._pump = PeriodicTask("delivery-retry", Config.FORWARD_RETRY_POLL, self.pump)
+        self._stats = {"submitted": 0, "delivered": 0, "retried": 0, "failed": 0,
+                       "breaker_skips": 0, "busy_skips": 0, "blocked": 0}
+
+    # --------------------------------------------------------------------------
+    # PER-WORKER RESOURCES (dibuat ulang setelah fork)
+    # --------------------------------------------------------------------------
+    def start(self):
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=Config.FORWARD_CONCURRENCY,
+                                                thread_name_prefix="delivery")
+            self._sessions, self._breakers, self._slots = {}, {}, {}
+            self._owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._pid = os.getpid()
+        self._pump.start()
+
+    def _session(self, dest):
+        with self._lock:
+            sess = self._sessions.get(dest)
+            if sess is None:
+                sess = requests.Session()
+                sess.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=Config.FORWARD_PER_HOST_CONCURRENCY,
+                                                  max_retries=0))
+                sess.mount("https://", PinnedHostAdapter(urlparse(dest).hostname, pool_connections=1,
+                                                         pool_maxsize=Config.FORWARD_PER_HOST_CONCURRENCY, max_retries=0))
+                self._sessions[dest] = sess
+            return sess
+
+    def _breaker(self, dest):
+        with self._lock:
+            if dest not in self._breakers:
+                self._breakers[dest] = CircuitBreaker(Config.FORWARD_BREAKER_THRESHOLD, Config.FORWARD_BREAKER_RESET)
+                self._slots[dest] = threading.BoundedSemaphore(Config.FORWARD_PER_HOST_CONCURRENCY)
+            return self._breakers[dest], self._slots[dest]
+
+    # --------------------------------------------------------------------------
+    # SUBMIT & ATTEMPT
+    # --------------------------------------------------------------------------
+    def submit(self, url, payload):
+        """Catat pengiriman lalu kirim di background. Return id delivery."""
+        self._ensure_started()
+        now = time.time()
+        cur = pool.execute('''INSERT INTO deliveries (url, payload, status, attempts, next_attempt_at, created_at, updated_at,
+                                                       claimed_by)
+                              VALUES (?, ?, 'INFLIGHT', 0, ?, ?, ?, ?)''',
+                           (url, json.dumps(payload), now, now, now, self._owner))
+        self._bump("submitted")
+        self._executor.submit(self._attempt, cur.lastrowid, url, payload, 0)
+        return cur.lastrowid
+
+    def _attempt(self, delivery_id, url, payload, attempts):
+        dest = destination_of(url)
+        breaker, slot = self._breaker(dest)
+
+        # Validasi ulang saat kirim: DNS bisa sudah diarahkan ke IP internal (rebinding)
+        verdict, ips = resolver.check_url(url)
+        if verdict == UNSAFE:
+            pool.execute("UPDATE deliveries SET status='FAILED', attempts=?, last_error=?, updated_at=? WHERE id=?",
+                         (attempts, "blocked: destination resolves to a non-public address", time.time(), delivery_id))
+            self._bump("blocked")
+            return
+
+        # Tujuan sudah memakai jatah concurrency-nya: coba lagi sebentar lagi
+        if not slot.acquire(blocking=False):
+            self._bump("busy_skips")
+            self._reschedule(delivery_id, attempts, time.time() + 1, "destination busy")
+            return
+        # Tujuan sedang mati: jangan habiskan thread, jadwalkan ulang setelah breaker reset
+        if not breaker.allow():
+            slot.release()
+            self._bump("breaker_skips")
+            self._reschedule(delivery_id, attempts, breaker.retry_at(), "circuit open")
+            return
+
+        try:
+            if verdict != SAFE:
+                raise OSError(f"cannot resolve {urlparse(url).hostname}")
+            # Konek ke IP yang tadi divalidasi, bukan resolve ulang oleh requests
+            # Redirect tidak diikuti: tujuan redirect belum tentu lolos cek SSRF
+            pinned_url, host_header = pin_url(url, ips[0])
+            with timed("http", "webhook"):
+                res = self._session(dest).post(pinned_url, json=payload, headers={"Host": host_header},
+                                               timeout=Config.FORWARD_TIMEOUT, allow_redirects=False)
+            ok, error = 200 <= res.status_code < 300, f"HTTP {res.status_code}"
+        except Exception as e:
+            ok, error = False, str(e)
+        finally:
+            slot.release()
+
+        attempts += 1
+        if ok:
+            breaker.record_success()
+            pool.execute("UPDATE deliveries SET status='DELIVERED', attempts=?, last_error=NULL, updated_at=? WHERE id=?",
+                         (attempts, time.time(), delivery_id))
+            self._bump("delivered")
+            return
+
+        breaker.record_failure()
+        if attempts >= Config.FORWARD_MAX_ATTEMPTS:
+            pool.execute("UPDATE deliveries SET status='FAILED', attempts=?, last_error=?, updated_at=? WHERE id=?",
+                         (attempts, error, time.time(), delivery_id))
+            self._bump("failed")
+            print(f"DEBUG: Webhook Forward Failed permanently (#{delivery_id}): {error}", flush=True)
+            return
+
+        # Exponential backoff + full jitter
+        cap = min(Config.FORWARD_BACKOFF_MAX, Config.FORWARD_BACKOFF_BASE * (2 ** (attempts - 1)))
+        self._reschedule(delivery_id, attempts, time.time() + random.uniform(0, cap), error)
+        self._bump("retried")
+
+    def _reschedule(self, delivery_id, attempts, when, error):
+        pool.execute("UPDATE deliveries SET status='RETRY', attempts=?, next_attempt_at=?, last_error=?, updated_at=? WHERE id=?",
+                     (attempts, when, error, time.time(), delivery_id))
+
+    # --------------------------------------------------------------------------
+    # RETRY PUMP (claim row RETRY yang jatuh tempo, juga INFLIGHT milik worker mati)
+    # --------------------------------------------------------------------------
+    def pump(self):
+        now = time.time()
+        stale = now - Config.FORWARD_STALE_AFTER
+        with pool.transaction() as conn:
+            # Heartbeat: INFLIGHT milik worker ini (termasuk yang masih antre di executor)
+            # tidak pernah jadi stale selama worker hidup, jadi tidak di-dispatch 2x
+            conn.execute("UPDATE deliveries SET updated_at=? WHERE status='INFLIGHT' AND claimed_by=?",
+                         (now, self._owner))
+            rows = conn.execute('''SELECT id, url, payload, attempts FROM deliveries
+                                   WHERE (status='RETRY' AND next_attempt_at <= ?)
+                                      OR (status='INFLIGHT' AND updated_at < ?)
+                                   ORDER BY next_attempt_at LIMIT ?''',
+                                (now, stale, Config.FORWARD_CONCURRENCY * 4)).fetchall()
+            conn.executemany("UPDATE deliveries SET status='INFLIGHT', updated_at=?, claimed_by=? WHERE id=?",
+                             [(now, self._owner, r[0]) for r in rows])
+        for delivery_id, url, payload, attempts in rows:
+            self._executor.submit(self._attempt, delivery_id, url, json.loads(payload), attempts)
+
+    def replay(self, ids=None):
+        """Jadwalkan ulang delivery FAILED (semua, atau id tertentu)"""
+        self._ensure_started()
+        where, args = ("", ()) if not ids else (f" AND id IN ({','.join('?' * len(ids))})", tuple(ids))
+        cur = pool.execute(f"UPDATE deliveries SET status='RETRY', attempts=0, next_attempt_at=? WHERE status='FAILED'{where}",
+                           (time.time(),) + args)
+        self._pump.wake()
+        return cur.rowcount
+
+    def failed(self, limit=50):
+        rows = pool.query("SELECT id, url, attempts, last_error, created_at, updated_at FROM deliveries "
+                          "WHERE status='FAILED' ORDER BY id DESC LIMIT ?", (limit,))
+        return [dict(zip(("id", "url", "attempts", "last_error", "created_at", "updated_at"), r)) for r in rows]
+
+    # --------------------------------------------------------------------------
+    # STATS
+    # --------------------------------------------------------------------------
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["breakers"] = {dest: b.snapshot() for dest, b in self._breakers.items()}
+        snap["states"] = dict(pool.query("SELECT status, COUNT(*) FROM deliveries GROUP BY status"))
+        return snap
+
+
+# Instance global per worker
+delivery = DeliveryEngine()
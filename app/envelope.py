@@ -0,0 +1,175 @@
+# app/envelope.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: VERSIONED ENCRYPTION ENVELOPE (COMPRESS + AES-GCM, KEY ID)
+#
+# Format v2 (string, aman disimpan di Firebase):
+#   "E2." + base64url( flags(1) | key_id(1) | nonce(12) | ciphertext + tag(16) )
+# - flags = algoritma kompresi (0 none, 1 zlib, 2 zstd). Kompresi hanya dipakai
+#   kalau plaintext >= ENVELOPE_COMPRESS_MIN dan hasilnya memang lebih kecil.
+# - "E2" + flags + key_id ikut diautentikasi (AAD), jadi header tidak bisa diutak-atik.
+# - Key per key_id diturunkan dengan HKDF dari Config.ENCRYPTION_KEY (env DATA_ENCRYPTION_KEY), atau diambil
+#   dari ENVELOPE_KEYS untuk rotasi. Data lama tetap terbaca selama key-nya ada.
+# Record Fernet lama (tanpa prefix "E2.") tetap dibuka transparan. Payload webhook user
+# tetap Fernet (utils.to_fernet): format v2 hanya dipakai di Vault.
+
+import os
+import json
+import zlib
+import base64
+import threading
+from cryptography.fernet import Fernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from config import Config
+from app.container import container
+
+try:
+    import zstandard # Opsional: ENVELOPE_COMPRESSION=zstd
+except ImportError:
+    zstandard = None
+
+PREFIX = "E2."
+NONCE_SIZE = 12
+
+COMPRESS_NONE = 0
+COMPRESS_ZLIB = 1
+COMPRESS_ZSTD = 2
+
+
+class EnvelopeError(ValueError):
+    """Token rusak / key_id tidak dikenal / autentikasi gagal"""
+
+
+def derive_key(secret, key_id):
+    """Key AES-256 untuk key_id dari secret utama (HKDF-SHA256)"""
+    return HKDF(algorithm=hashes.SHA256(), length=32, salt=None,
+                info=f"dface-envelope-v2:{key_id}".encode()).derive(secret.encode())
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class Envelope:
+
+    def __init__(self, keys, key_id, legacy=None, compression="zlib", compress_min=128, secret=None):
+        """
+        keys = {key_id: bytes 32}. legacy = Fernet untuk record lama (boleh None).
+        secret: key_id yang tidak ada di `keys` diturunkan dari sini saat dibutuhkan.
+        """
+        if secret is not None and key_id not in keys:
+            keys = {**keys, key_id: derive_key(secret, key_id)}
+        if key_id not in keys:
+            raise EnvelopeError(f"no key for ENVELOPE_KEY_ID {key_id}")
+        if compression == "zstd" and zstandard is None:
+            raise EnvelopeError("ENVELOPE_COMPRESSION=zstd needs the 'zstandard' package")
+        self.key_id = key_id
+        self.legacy = legacy
+        self.secret = secret
+        self.compress_min = compress_min
+        self.compression = {"none": COMPRESS_NONE, "zlib": COMPRESS_ZLIB, "zstd": COMPRESS_ZSTD}[compression]
+        self._aead = {kid: AESGCM(key) for kid, key in keys.items()}
+        self._lock = threading.Lock()
+        self._stats = {"sealed": 0, "opened": 0, "opened_legacy": 0, "compressed": 0,
+                       "plain_bytes": 0, "sealed_bytes": 0}
+
+    # --------------------------------------------------------------------------
+    # COMPRESSION
+    # --------------------------------------------------------------------------
+    def _compress(self, data):
+        if self.compression == COMPRESS_NONE or len(data) < self.compress_min:
+            return COMPRESS_NONE, data
+        if self.compression == COMPRESS_ZSTD:
+            packed = zstandard.ZstdCompressor(level=6).compress(data)
+        else:
+            packed = zlib.compress(data, 6)
+        if len(packed) >= len(data):
+            return COMPRESS_NONE, data
+        return self.compression, packed
+
+    @staticmethod
+    def _decompress(flags, data):
+        if flags == COMPRESS_NONE:
+            return data
+        if flags == COMPRESS_ZLIB:
+            return zlib.decompress(data)
+        if flags == COMPRESS_ZSTD:
+            if zstandard is None:
+                raise EnvelopeError("record is zstd-compressed but 'zstandard' is not installed")
+            return zstandard.ZstdDecompressor().decompress(data)
+        raise EnvelopeError(f"unknown compression flag {flags}")
+
+    # --------------------------------------------------------------------------
+    # SEAL / OPEN
+    # --------------------------------------------------------------------------
+    def seal(self, data):
+        """bytes -> token string v2"""
+        flags, body = self._compress(data)
+        header = bytes((flags, self.key_id))
+        nonce = os.urandom(NONCE_SIZE)
+        sealed = self._aead[self.key_id].encrypt(nonce, body, b"E2" + header)
+        token = PREFIX + base64.urlsafe_b64encode(header + nonce + sealed).rstrip(b"=").decode()
+        with self._lock:
+            self._stats["sealed"] += 1
+            self._stats["compressed"] += flags != COMPRESS_NONE
+            self._stats["plain_bytes"] += len(data)
+            self._stats["sealed_bytes"] += len(token)
+        return token
+
+    def open(self, token):
+        """token string (v2 atau Fernet lama) -> bytes"""
+        if not token.startswith(PREFIX):
+            if self.legacy is None:
+                raise EnvelopeError("legacy record but no Fernet key configured")
+            data = self.legacy.decrypt(token.encode())
+            self._bump("opened_legacy")
+            return data
+        try:
+            raw = _b64decode(token[len(PREFIX):])
+        except ValueError:
+            raise EnvelopeError("bad base64")
+        if len(raw) < 2 + NONCE_SIZE + 16:
+            raise EnvelopeError("token too short")
+        flags, key_id = raw[0], raw[1]
+        aead = self._aead.get(key_id)
+        if aead is None:
+            if self.secret is None:
+                raise EnvelopeError(f"unknown key id {key_id}")
+            # Record dari key_id lama (sebelum ENVELOPE_KEY_ID dinaikkan)
+            aead = self._aead[key_id] = AESGCM(derive_key(self.secret, key_id))
+        body = aead.decrypt(raw[2:2 + NONCE_SIZE], raw[2 + NONCE_SIZE:], b"E2" + raw[:2])
+        data = self._decompress(flags, body)
+        self._bump("opened")
+        return data
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+        snap["key_id"] = self.key_id
+        snap["key_ids"] = sorted(self._aead)
+        snap["ratio"] = round(snap["sealed_bytes"] / snap["plain_bytes"], 4) if snap["plain_bytes"] else None
+        return snap
+
+
+def build_envelope():
+    """Factory container: key eksplisit dari ENVELOPE_KEYS, sisanya HKDF dari Config.ENCRYPTION_KEY"""
+    keys = {}
+    if Config.ENVELOPE_KEYS:
+        # {"<key_id>": "<base64 32 byte>"}: key independen dari Config.ENCRYPTION_KEY
+        for kid, key in json.loads(Config.ENVELOPE_KEYS).items():
+            keys[int(kid)] = _b64decode(key)
+    return Envelope(keys, Config.ENVELOPE_KEY_ID, legacy=container.get("cipher"),
+                    compression=Config.ENVELOPE_COMPRESSION, compress_min=Config.ENVELOPE_COMPRESS_MIN,
+                    secret=Config.ENCRYPTION_KEY)
+
+
+# Dibuat saat pertama dipakai (lihat app/container.py)
+container.register("cipher", lambda: Fernet(Config.ENCRYPTION_KEY.encode()))
+container.register("envelope", build_envelope)
+cipher_suite = container.proxy("cipher") # Fernet: record lama + ENVELOPE_FORMAT=fernet
+envelope = container.proxy("envelope")
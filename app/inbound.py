@@ -0,0 +1,141 @@
+# app/inbound.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: INBOUND MAIL PROCESSING (DIJALANKAN OLEH SPOOL WORKER)
+
+import os
+import time
+from app.utils import encrypt_content, to_fernet
+from app.spool import InboundSpool
+from app.retention import trim_mailbox, clamp_cap
+from app.delivery import delivery
+from app.notify import hub
+from app.routing import mail_router
+from app import vault_db_ref # Import Global DB Ref
+from config import Config
+
+# Alphabet push-id Firebase (urut secara leksikografis = urut waktu)
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def push_key(ts_ms=None):
+    """
+    Generate key ala Firebase push() secara lokal: 8 char timestamp + 12 char acak.
+    Key dibuat saat email masuk spool, jadi retry menulis ke key yang sama (idempotent).
+    """
+    ts = int(ts_ms if ts_ms is not None else time.time() * 1000)
+    stamp = []
+    for _ in range(8):
+        stamp.append(PUSH_CHARS[ts % 64])
+        ts //= 64
+    rand = "".join(PUSH_CHARS[b % 64] for b in os.urandom(12))
+    return "".join(reversed(stamp)) + rand
+
+
+def parse_payload(data):
+    """
+    Ambil field penting dari payload ForwardEmail / Cloudflare (masih plaintext).
+    Return None kalau format recipient tidak bisa dibaca.
+    """
+    # ForwardEmail kadang pakai 'sender', Cloudflare pakai 'from'
+    sender = data.get('from') or data.get('sender') or 'Unknown Sender'
+    recipient = data.get('to') or data.get('recipient') or ''
+    subject = data.get('subject') or '(No Subject)'
+
+    # Ambil body (Text priority, fallback ke HTML)
+    body = data.get('text') or data.get('html') or ''
+
+    # Parsing Username dari Recipient
+    # Contoh: "admin@defacer.dedyn.io" -> ambil "admin"
+    try:
+        # Handle format ribet: "Nama User <admin@domain.com>"
+        if '<' in recipient:
+            raw_email = recipient.split('<')[1].split('>')[0]
+            username = raw_email.split('@')[0]
+        else:
+            username = recipient.split('@')[0]
+    except:
+        return None
+    if not username:
+        return None
+
+    return {"from": sender, "to": recipient, "username": username, "subject": subject, "body": body}
+
+
+def normalize_payload(data):
+    """
+    Normalisasi payload jadi dict siap spool.
+    Return None kalau format recipient tidak bisa dibaca.
+    """
+    parsed = parse_payload(data)
+    if not parsed:
+        return None
+
+    # Konten langsung dienkripsi: plaintext tidak pernah menyentuh disk (spool)
+    return {"from": parsed['from'], "to": parsed['to'], "username": parsed['username'],
+            "subject_enc": encrypt_content(parsed['subject']), "body_enc": encrypt_content(parsed['body'])}
+
+
+def forward_payload(msg):
+    """Payload webhook user (konten tetap terenkripsi demi keamanan)"""
+    # Vault menyimpan envelope v2, tapi kontrak webhook tetap Fernet (consumer lama harus bisa decrypt)
+    return {
+        "event": "INCOMING_MAIL",
+        "to": msg['to'],
+        "from": msg['from'],
+        "subject_enc": to_fernet(msg['subject_enc']),
+        "body_enc": to_fernet(msg['body_enc']),
+        "note": "Content encrypted. Use your Fernet Key to decrypt."
+    }
+
+
+def process_message(msg):
+    """
+    Simpan 1 email ke Vault + purge + forward.
+    Return status akhir ("STORED" / "REJECTED"). Exception = gagal, spool akan retry.
+    """
+    username = msg['username']
+
+    # 1. Cek User Exist (index routing lokal, lihat app/routing.py)
+    # Kita hanya terima email untuk user yang terdaftar di sistem kita
+    route = mail_router.lookup(username)
+    if not route:
+        print(f"DEBUG: Rejected. User '{username}' not found.")
+        return "REJECTED"
+
+    mailbox_id = route['mailbox_id']
+
+    # 2. Konten sudah dienkripsi saat masuk spool (Zeabur Encrypts -> Firebase Stores)
+    enc_sub = msg['subject_enc']
+    enc_body = msg['body_enc']
+
+    # 3. Simpan ke Vault (Secure Storage)
+    # Pakai key dari spool (bukan push()) supaya retry tidak menggandakan email
+    vault_ref = vault_db_ref.child(f'inboxes/{mailbox_id}')
+    vault_ref.child(msg['key']).set({
+        "from": msg['from'],
+        "subject": enc_sub,
+        "body": enc_body,
+        "timestamp": {".sv": "timestamp"}
+    })
+
+    # Push ke stream SSE user (worker mana pun yang memegang stream-nya)
+    hub.publish(mailbox_id, msg['key'])
+
+    # 4. Retensi (Jaga Inbox tetap Ephemeral, default 5 Email, bisa diatur per user)
+    # Cukup baca daftar key (shallow) lalu hapus kelebihan dalam 1 update multi-path
+    if Config.RETENTION_INLINE:
+        trim_mailbox(mailbox_id, clamp_cap(route['retention']))
+
+    # 5. Forwarding (User Webhook)
+    # Jika user punya setting webhook sendiri, kita lempar datanya (tetap terenkripsi)
+    fwd_url = route['forward_url']
+
+    if fwd_url:
+        # Non-blocking: delivery engine yang kirim, retry & catat statusnya
+        delivery.submit(fwd_url, forward_payload(msg))
+
+    return "STORED"
+
+
+# Instance global: spool + worker background untuk /webhook-inbound
+inbound_spool = InboundSpool(process_message, Config.INBOUND_WORKERS, Config.INBOUND_BATCH_SIZE)
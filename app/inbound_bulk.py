@@ -0,0 +1,270 @@
+# app/inbound_bulk.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: BULK INBOUND INGESTION (/webhook-inbound/bulk)
+#
+# Untuk provider yang me-replay backlog setelah outage. Body NDJSON atau JSON
+# array dibaca bertahap dari stream (tidak di-buffer utuh), email dikelompokkan
+# per penerima, lalu per user:
+#   1 lookup routing -> enkripsi semua email -> 1 baca key (retensi) -> 1 update multi-path
+# alih-alih lookup + set + purge untuk tiap email. Hasil dilaporkan per email.
+
+import os
+import json
+import time
+import codecs
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from app.utils import encrypt_content
+from app.inbound import parse_payload, push_key, forward_payload
+from app.retention import clamp_cap, excess_keys
+from app.delivery import delivery
+from app.notify import hub
+from app.routing import mail_router
+from app import vault_db_ref # Import Global DB Ref
+
+STORED = "STORED" # Tersimpan di Vault
+TRIMMED = "TRIMMED" # Diterima (forward jalan) tapi langsung tergeser retensi, tidak ditulis
+REJECTED = "REJECTED" # User tidak terdaftar
+INVALID = "INVALID" # Bukan JSON object / recipient tidak terbaca
+FAILED = "FAILED" # Firebase error, provider boleh kirim ulang email ini
+
+_READ_CHUNK = 64 * 1024
+_NUMBER_CHARS = "0123456789.eE+-"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class BulkParseError(ValueError):
+    """Body tidak bisa dibaca (-> HTTP 400, belum ada yang ditulis)"""
+
+
+class BulkTooLarge(BulkParseError):
+    """Lebih dari INBOUND_BULK_MAX email / 1 email lebih dari INBOUND_BULK_ITEM_MAX byte (-> HTTP 413)"""
+
+
+# ==============================================================================
+# STREAMING PARSER (NDJSON / JSON ARRAY)
+# ==============================================================================
+def iter_ndjson(stream, max_item):
+    """1 JSON per baris. Baris rusak -> None (dilaporkan INVALID, tidak menggagalkan batch)."""
+    while True:
+        line = stream.readline(max_item + 1)
+        if not line:
+            return
+        if len(line) > max_item and not line.endswith(b"\n"):
+            raise BulkTooLarge(f"item larger than {max_item} bytes")
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def iter_json_array(stream, max_item):
+    """Elemen JSON array satu per satu, buffer hanya sebesar 1 elemen + 1 chunk"""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        chunk = stream.read(_READ_CHUNK)
+        eof = not chunk
+        buf = buf[pos:] + utf8.decode(chunk, final=eof)
+        pos = 0
+
+    def next_char():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if eof:
+                return None
+            fill()
+
+    if next_char() != "[":
+        raise BulkParseError("expected JSON array or NDJSON")
+    pos += 1
+    if next_char() == "]":
+        return
+    while True:
+        next_char() # Lewati whitespace sebelum elemen
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+                # Angka yang terpotong batas chunk ("12" | "345", "3" | ".5") ter-decode sebagai angka
+                # yang lebih pendek: terima hanya kalau karakter sesudahnya jelas bukan lanjutan angka
+                if eof or (end < len(buf) and not (_is_number(item) and buf[end] in _NUMBER_CHARS)):
+                    break
+            except ValueError:
+                if eof:
+                    raise BulkParseError("truncated or malformed JSON array")
+            if len(buf) - pos > max_item:
+                raise BulkTooLarge(f"item larger than {max_item} bytes")
+            fill()
+        pos = end
+        yield item
+        sep = next_char()
+        if sep == "]":
+            return
+        if sep != ",":
+            raise BulkParseError("malformed JSON array")
+        pos += 1
+
+
+class LimitedStream:
+    """Bungkus stream body: lebih dari `limit` byte dibaca -> BulkTooLarge (body chunked tanpa Content-Length)"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.consumed = 0
+
+    def _count(self, data):
+        self.consumed += len(data)
+        if self.consumed > self.limit:
+            raise BulkTooLarge(f"body larger than {self.limit} bytes")
+        return data
+
+    def read(self, size=-1):
+        return self._count(self.stream.read(size))
+
+    def readline(self, size=-1):
+        return self._count(self.stream.readline(size))
+
+
+def read_items(stream, content_type, content_length=None):
+    """
+    Semua elemen body (maks INBOUND_BULK_MAX email, maks INBOUND_BULK_BODY_MAX byte total).
+    NDJSON kalau content-type-nya ndjson / jsonlines.
+    """
+    max_item = Config.INBOUND_BULK_ITEM_MAX
+    if content_length is not None and content_length > Config.INBOUND_BULK_BODY_MAX:
+        raise BulkTooLarge(f"body larger than {Config.INBOUND_BULK_BODY_MAX} bytes")
+    stream = LimitedStream(stream, Config.INBOUND_BULK_BODY_MAX)
+    ndjson = any(t in (content_type or "") for t in ("ndjson", "jsonlines", "x-json-stream"))
+    items = []
+    for item in (iter_ndjson if ndjson else iter_json_array)(stream, max_item):
+        if len(items) >= Config.INBOUND_BULK_MAX:
+            raise BulkTooLarge(f"batch limit is {Config.INBOUND_BULK_MAX} messages")
+        items.append(item)
+    return items
+
+
+# ==============================================================================
+# INGESTOR
+# ==============================================================================
+class BulkIngestor:
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._pid = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {"batches": 0, "messages": 0, "mailboxes": 0, "firebase_writes": 0,
+                       STORED: 0, TRIMMED: 0, REJECTED: 0, INVALID: 0, FAILED: 0}
+
+    def _get_executor(self):
+        # Thread pool milik parent tidak ikut hidup setelah fork
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inbound-bulk")
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def ingest(self, items):
+        """items = payload mentah (dict). Return list hasil, urut sesuai input."""
+        results = [None] * len(items)
+        groups = {} # username -> [(index, parsed, key)]
+        base_ms = int(time.time() * 1000)
+        for i, data in enumerate(items):
+            parsed = parse_payload(data) if isinstance(data, dict) else None
+            if not parsed:
+                results[i] = {"index": i, "status": INVALID}
+                continue
+            # Key naik per email (+1 ms): urutan di mailbox = urutan di batch
+            groups.setdefault(parsed['username'], []).append((i, parsed, push_key(base_ms + i)))
+
+        executor = self._get_executor()
+        for group_results in executor.map(lambda entry: self._ingest_user(*entry), groups.items()):
+            for result in group_results:
+                results[result["index"]] = result
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["messages"] += len(items)
+            for result in results:
+                self._stats[result["status"]] += 1
+        return results
+
+    def _ingest_user(self, username, entries):
+        try:
+            route = mail_router.lookup(username)
+        except Exception as e:
+            return [{"index": i, "status": FAILED, "error": str(e)} for i, _, _ in entries]
+        if not route:
+            return [{"index": i, "status": REJECTED} for i, _, _ in entries]
+
+        mailbox_id = route['mailbox_id']
+
+        # Enkripsi sekali jalan untuk seluruh email user ini (di luar round trip Firebase)
+        messages = {}
+        for i, parsed, key in entries:
+            messages[key] = {"index": i, "from": parsed['from'], "to": parsed['to'],
+                             "subject_enc": encrypt_content(parsed['subject']),
+                             "body_enc": encrypt_content(parsed['body'])}
+
+        update = {key: {"from": m['from'], "subject": m['subject_enc'], "body": m['body_enc'],
+                        "timestamp": {".sv": "timestamp"}} for key, m in messages.items()}
+        trimmed = set()
+        mailbox_ref = vault_db_ref.child(f'inboxes/{mailbox_id}')
+        try:
+            # Retensi digabung ke update yang sama: email lama dihapus (null), email baru
+            # yang langsung tergeser cap tidak perlu ditulis sama sekali
+            if Config.RETENTION_INLINE:
+                existing = list(mailbox_ref.get(shallow=True) or {})
+                cap = clamp_cap(route['retention'])
+                for key in excess_keys(existing + list(update), cap):
+                    if key in update:
+                        del update[key]
+                        trimmed.add(key)
+                    else:
+                        update[key] = None
+            if update:
+                mailbox_ref.update(update)
+                self._bump("firebase_writes")
+        except Exception as e:
+            return [{"index": m["index"], "status": FAILED, "error": str(e)} for m in messages.values()]
+        self._bump("mailboxes")
+
+        fwd_url = route['forward_url']
+        results = []
+        for key, m in messages.items():
+            if key in trimmed:
+                results.append({"index": m["index"], "status": TRIMMED, "id": key})
+            else:
+                hub.publish(mailbox_id, key)
+                results.append({"index": m["index"], "status": STORED, "id": key})
+            if fwd_url:
+                delivery.submit(fwd_url, forward_payload(m))
+        return results
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+# Instance global per worker
+bulk_ingestor = BulkIngestor(Config.INBOUND_BULK_WORKERS)
@@ -0,0 +1,233 @@
+# app/metrics.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: PROMETHEUS METRICS (PER ROUTE + PER DEPENDENCY)
+#
+# - Hook before/after request: latency + jumlah request per route (rule Flask,
+#   bukan URL mentah, supaya label tidak meledak)
+# - timed(dependency, operation): timer untuk SQLite, Firebase, HTTP keluar,
+#   SMTP, Fernet, hashing password
+# - Di gunicorn, PROMETHEUS_MULTIPROC_DIR di-set oleh gunicorn.conf.py sehingga
+#   angka semua worker digabung saat /metrics di-scrape
+
+import os
+import hmac
+import time
+import threading
+from contextlib import contextmanager
+from flask import request, g, Response
+from prometheus_client import Counter, Histogram, Gauge, CollectorRegistry, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import REGISTRY, multiprocess
+from config import Config
+
+ENABLED = Config.METRICS_ENABLED
+
+DEPENDENCY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = Counter("dface_http_requests_total", "HTTP requests", ["route", "method", "status"])
+HTTP_LATENCY = Histogram("dface_http_request_duration_seconds", "HTTP request latency", ["route", "method"])
+HTTP_IN_PROGRESS = Gauge("dface_http_requests_in_progress", "HTTP requests being served",
+                         multiprocess_mode="livesum")
+DEP_LATENCY = Histogram("dface_dependency_duration_seconds", "Latency of calls to dependencies",
+                        ["dependency", "operation"], buckets=DEPENDENCY_BUCKETS)
+DEP_ERRORS = Counter("dface_dependency_errors_total", "Failed calls to dependencies", ["dependency", "operation"])
+ADMISSION_SHED = Counter("dface_admission_shed_total", "Requests rejected by admission control (503)",
+                         ["route_class", "reason"])
+ADMISSION_QUEUE = Histogram("dface_admission_queue_seconds", "Queue time before admission (proxy + in-app wait)",
+                            ["route_class"], buckets=DEPENDENCY_BUCKETS)
+
+# labels() cukup mahal untuk hot path: simpan child per kombinasi label
+_children = {}
+
+
+def _child(metric, *labels):
+    key = (metric, labels)
+    child = _children.get(key)
+    if child is None:
+        child = _children[key] = metric.labels(*labels)
+    return child
+
+
+# Rincian waktu dependency per request (dipakai app/profiling.py), per thread
+_breakdown = threading.local()
+
+
+def start_breakdown():
+    _breakdown.deps = {}
+
+
+def stop_breakdown():
+    """Return {"dependency.operation": [jumlah call, detik]} sejak start_breakdown() di thread ini"""
+    deps = getattr(_breakdown, "deps", None)
+    _breakdown.deps = None
+    return deps or {}
+
+
+def _account(dependency, operation, seconds):
+    deps = getattr(_breakdown, "deps", None)
+    if deps is not None:
+        entry = deps.setdefault(f"{dependency}.{operation}", [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+
+def observe(dependency, operation, seconds):
+    if ENABLED:
+        _child(DEP_LATENCY, dependency, operation).observe(seconds)
+    _account(dependency, operation, seconds)
+
+
+def admission_shed(route_class, reason):
+    if ENABLED:
+        _child(ADMISSION_SHED, route_class, reason).inc()
+
+
+def admission_queued(route_class, seconds):
+    if ENABLED:
+        _child(ADMISSION_QUEUE, route_class).observe(seconds)
+
+
+@contextmanager
+def timed(dependency, operation):
+    if not ENABLED and getattr(_breakdown, "deps", None) is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        if ENABLED:
+            _child(DEP_ERRORS, dependency, operation).inc()
+        raise
+    finally:
+        observe(dependency, operation, time.perf_counter() - started)
+
+
+# ==============================================================================
+# FIREBASE PROXY (ref.get / set / update / push / delete + query)
+# ==============================================================================
+class InstrumentedRef:
+    """Bungkus firebase_admin db.Reference: semua call jaringan diukur, sisanya diteruskan"""
+
+    def __init__(self, ref, dependency):
+        self._ref = ref
+        self._dependency = dependency
+
+    def child(self, path):
+        return InstrumentedRef(self._ref.child(path), self._dependency)
+
+    def get(self, *args, **kwargs):
+        operation = "get_shallow" if kwargs.get("shallow") else "get"
+        with timed(self._dependency, operation):
+            return self._ref.get(*args, **kwargs)
+
+    def set(self, value):
+        with timed(self._dependency, "set"):
+            return self._ref.set(value)
+
+    def update(self, value):
+        with timed(self._dependency, "update"):
+            return self._ref.update(value)
+
+    def push(self, value=''):
+        with timed(self._dependency, "push"):
+            return InstrumentedRef(self._ref.push(value), self._dependency)
+
+    def delete(self):
+        with timed(self._dependency, "delete"):
+            return self._ref.delete()
+
+    def order_by_key(self):
+        return InstrumentedQuery(self._ref.order_by_key(), self._dependency)
+
+    def order_by_child(self, path):
+        return InstrumentedQuery(self._ref.order_by_child(path), self._dependency)
+
+    def __getattr__(self, name):
+        return getattr(self._ref, name)
+
+
+class InstrumentedQuery:
+
+    def __init__(self, query, dependency):
+        self._query = query
+        self._dependency = dependency
+
+    def _wrap(self, query):
+        self._query = query
+        return self
+
+    def start_at(self, start):
+        return self._wrap(self._query.start_at(start))
+
+    def end_at(self, end):
+        return self._wrap(self._query.end_at(end))
+
+    def equal_to(self, value):
+        return self._wrap(self._query.equal_to(value))
+
+    def limit_to_first(self, limit):
+        return self._wrap(self._query.limit_to_first(limit))
+
+    def limit_to_last(self, limit):
+        return self._wrap(self._query.limit_to_last(limit))
+
+    def get(self):
+        with timed(self._dependency, "query"):
+            return self._query.get()
+
+
+# ==============================================================================
+# FLASK HOOKS + /metrics
+# ==============================================================================
+def _before_request():
+    g._metrics_started = time.perf_counter()
+    g._metrics_in_progress = True
+    HTTP_IN_PROGRESS.inc()
+
+
+def _after_request(response):
+    started = g.pop('_metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else "unmatched"
+        _child(HTTP_LATENCY, route, request.method).observe(time.perf_counter() - started)
+        _child(HTTP_REQUESTS, route, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _teardown_request(exc):
+    # Selalu jalan (termasuk saat exception), pasangan inc() di before_request
+    if g.pop('_metrics_in_progress', False):
+        HTTP_IN_PROGRESS.dec()
+
+
+def _authorized():
+    if Config.METRICS_PUBLIC:
+        return True
+    if not Config.ADMIN_KEY:
+        return False
+    supplied = request.headers.get('X-Admin-Key', '')
+    auth = request.headers.get('Authorization', '')
+    if auth.startswith('Bearer '):
+        supplied = supplied or auth[7:]
+    return hmac.compare_digest(supplied.encode(), Config.ADMIN_KEY.encode())
+
+
+def metrics_view():
+    if not _authorized():
+        # Sama seperti endpoint admin: tanpa izin = tidak ada
+        return Response("Not Found", status=404)
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    if not ENABLED:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
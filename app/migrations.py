@@ -0,0 +1,179 @@
+# app/migrations.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: VERSIONED SQLITE SCHEMA MIGRATIONS (PRAGMA user_version)
+#
+# Tiap migrasi jalan sekali, dalam transaksinya sendiri, urut berdasarkan versi.
+# Aman dijalankan paralel oleh beberapa worker gunicorn: versi dicek ulang
+# setelah BEGIN IMMEDIATE, jadi yang kalah balapan cukup skip.
+
+import os
+import fcntl
+
+def ensure_columns(conn, table, columns):
+    """Tambah kolom yang belum ada (ALTER TABLE ADD COLUMN, idempotent)"""
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
+
+
+def m001_baseline(conn):
+    """Schema awal (idempotent, DB lama sebelum versioning ikut tersentuh di sini)"""
+    # Tabel Session (Login & Interview)
+    conn.execute('''CREATE TABLE IF NOT EXISTS sessions
+                 (token TEXT PRIMARY KEY,
+                  device_id TEXT,
+                  ip TEXT,
+                  status TEXT,
+                  type TEXT,
+                  created_at REAL,
+                  expires_at REAL,
+                  username TEXT,
+                  device_hash TEXT,
+                  mailbox_id TEXT)''')
+
+    # DB lama belum punya kolom binding user di sessions
+    ensure_columns(conn, "sessions", {
+        "username": "TEXT",
+        "device_hash": "TEXT",
+        "mailbox_id": "TEXT",
+    })
+
+    # Tabel Rate Limit
+    conn.execute('''CREATE TABLE IF NOT EXISTS ratelimit
+                 (client_hash TEXT, hits INTEGER, window_start REAL)''')
+
+    # Tabel Audit Log
+    conn.execute('''CREATE TABLE IF NOT EXISTS audit_log
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp REAL,
+                  event TEXT, detail TEXT, anon_ip TEXT)''')
+
+    # Tabel Inbound Spool (Antrean /webhook-inbound) + Dead Letter
+    conn.execute('''CREATE TABLE IF NOT EXISTS inbound_spool
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT, enqueued_at REAL,
+                  attempts INTEGER, next_attempt_at REAL, claimed_by TEXT, claimed_at REAL,
+                  last_error TEXT)''')
+    conn.execute('''CREATE TABLE IF NOT EXISTS inbound_dead
+                 (id INTEGER PRIMARY KEY, payload TEXT, enqueued_at REAL, failed_at REAL,
+                  attempts INTEGER, last_error TEXT)''')
+
+    # Tabel Deliveries (Status forward ke webhook user)
+    conn.execute('''CREATE TABLE IF NOT EXISTS deliveries
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, url TEXT, payload TEXT, status TEXT,
+                  attempts INTEGER, next_attempt_at REAL, last_error TEXT,
+                  created_at REAL, updated_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_due ON deliveries (status, next_attempt_at)")
+
+    # Tabel Revocation (Signed Token yang sudah dicabut)
+    conn.execute('''CREATE TABLE IF NOT EXISTS revoked_tokens
+                 (jti TEXT PRIMARY KEY, expires_at REAL)''')
+
+
+def m002_expiry_indexes(conn):
+    """Index untuk lookup + sweeper, primary key di ratelimit.client_hash"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_time ON audit_log (timestamp)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_revoked_expires ON revoked_tokens (expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_deliveries_updated ON deliveries (updated_at)")
+
+    # ratelimit lama tanpa key (bisa ada duplikat) -> rebuild dengan PRIMARY KEY
+    conn.execute('''CREATE TABLE ratelimit_v2
+                 (client_hash TEXT PRIMARY KEY, hits INTEGER, window_start REAL)''')
+    conn.execute('''INSERT INTO ratelimit_v2 (client_hash, hits, window_start)
+                    SELECT client_hash, MAX(hits), MAX(window_start) FROM ratelimit
+                    WHERE client_hash IS NOT NULL GROUP BY client_hash''')
+    conn.execute("DROP TABLE ratelimit")
+    conn.execute("ALTER TABLE ratelimit_v2 RENAME TO ratelimit")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_ratelimit_window ON ratelimit (window_start)")
+
+
+def m003_smtp_jobs(conn):
+    """Status job async SMTP bridge (tanpa kredensial)"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS smtp_jobs
+                 (id TEXT PRIMARY KEY, owner TEXT, host TEXT, status TEXT,
+                  total INTEGER, sent INTEGER, failed INTEGER, results TEXT, error TEXT,
+                  created_at REAL, updated_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_smtp_jobs_updated ON smtp_jobs (updated_at)")
+
+
+def m004_login_penalty(conn):
+    """Penalty box login gagal (pengganti time.sleep di worker)"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS login_penalty
+                 (key TEXT PRIMARY KEY, failures INTEGER, blocked_until REAL, updated_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_login_penalty_updated ON login_penalty (updated_at)")
+
+
+def m005_audit_event_index(conn):
+    """Filter audit log per event + rentang waktu (API /admin/audit)"""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_audit_event_time ON audit_log (event, timestamp)")
+
+
+def m006_mail_routes(conn):
+    """Replika lokal username -> mailbox (field routing saja, lihat app/routing.py)"""
+    conn.execute('''CREATE TABLE IF NOT EXISTS mail_routes
+                 (username TEXT PRIMARY KEY, mailbox_id TEXT, forward_url TEXT, retention INTEGER,
+                  updated_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mail_routes_updated ON mail_routes (updated_at)")
+    conn.execute('''CREATE TABLE IF NOT EXISTS sync_state
+                 (name TEXT PRIMARY KEY, value REAL)''')
+
+
+def m007_delivery_owner(conn):
+    """Worker pemilik delivery INFLIGHT (lihat DeliveryEngine.pump)"""
+    ensure_columns(conn, "deliveries", {"claimed_by": "TEXT"})
+
+
+def m008_smtp_job_worker(conn):
+    """Worker yang menjalankan job async SMTP (lihat SMTPBridge.expire_orphans)"""
+    ensure_columns(conn, "smtp_jobs", {"worker": "TEXT"})
+
+
+def enable_incremental_vacuum(conn):
+    """auto_vacuum INCREMENTAL baru aktif setelah VACUUM penuh (sekali saja, 1 worker)"""
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    # VACUUM tidak bisa di dalam BEGIN IMMEDIATE: pakai file lock di samping DB,
+    # worker lain menunggu lalu melihat auto_vacuum sudah 2 dan skip
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    fd = os.open(f"{path}.vacuum.lock", os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            print("✅ SQLite auto_vacuum=INCREMENTAL enabled")
+    finally:
+        os.close(fd)
+
+
+MIGRATIONS = [
+    (1, m001_baseline),
+    (2, m002_expiry_indexes),
+    (3, m003_smtp_jobs),
+    (4, m004_login_penalty),
+    (5, m005_audit_event_index),
+    (6, m006_mail_routes),
+    (7, m007_delivery_owner),
+    (8, m008_smtp_job_worker),
+]
+
+
+def migrate(conn):
+    """Jalankan migrasi yang belum diterapkan. conn harus isolation_level=None. Return versi akhir."""
+    for version, fn in MIGRATIONS:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            current = conn.execute("PRAGMA user_version").fetchone()[0]
+            if current >= version:
+                conn.execute("ROLLBACK")
+                continue
+            fn(conn)
+            conn.execute(f"PRAGMA user_version={version}")
+            conn.execute("COMMIT")
+            print(f"✅ SQLite migration {version:03d} ({fn.__name__}) applied")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    enable_incremental_vacuum(conn)
+    return conn.execute("PRAGMA user_version").fetchone()[0]
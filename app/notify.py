@@ -0,0 +1,139 @@
+# app/notify.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: NEW-MAIL NOTIFY HUB (SSE FAN-OUT LINTAS WORKER)
+#
+# Email bisa disimpan oleh worker A sementara stream user terbuka di worker B.
+# Tiap worker yang punya stream membuka 1 unix datagram socket di STREAM_SOCKET_DIR;
+# publish() mengirim 1 datagram kecil ke semua socket di sana, dan tiap worker
+# hanya meneruskan ke stream milik mailbox yang bersangkutan.
+
+import os
+import json
+import glob
+import queue
+import socket
+import threading
+from config import Config
+
+
+class NotifyHub:
+
+    def __init__(self, sock_dir, max_streams, queue_size):
+        self.sock_dir = sock_dir
+        self.max_streams = max_streams
+        self.queue_size = queue_size
+        self._pid = None
+        self._sock = None
+        self._sender = None
+        self._subs = {} # mailbox_id -> set(queue)
+        self._count = 0
+        self._lock = threading.Lock()
+        self._stats = {"published": 0, "sent": 0, "received": 0, "delivered": 0,
+                       "dropped": 0, "rejected": 0, "stale_sockets": 0}
+
+    def _path(self, pid):
+        return os.path.join(self.sock_dir, f"{pid}.sock")
+
+    def _ensure_listener(self):
+        """Bind socket worker ini + thread penerima (sekali per proses, lazy)"""
+        if self._pid == os.getpid():
+            return
+        os.makedirs(self.sock_dir, mode=0o700, exist_ok=True)
+        path = self._path(os.getpid())
+        # Sisa socket dari proses lama dengan pid sama
+        if os.path.exists(path):
+            os.unlink(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(path)
+        self._sock, self._pid = sock, os.getpid()
+        self._subs, self._count = {}, 0
+        threading.Thread(target=self._listen, args=(sock,), name="notify-listener", daemon=True).start()
+
+    def _listen(self, sock):
+        while True:
+            try:
+                data = sock.recv(4096)
+                event = json.loads(data)
+            except OSError:
+                return
+            except ValueError:
+                continue
+            self._bump("received")
+            self._dispatch(event)
+
+    def _dispatch(self, event):
+        with self._lock:
+            targets = list(self._subs.get(event.get("mbx"), ()))
+        for q in targets:
+            try:
+                q.put_nowait(event)
+                self._bump("delivered")
+            except queue.Full:
+                # Client lambat: cukup drop, client tetap sinkron lewat cursor inbox
+                self._bump("dropped")
+
+    def subscribe(self, mailbox_id):
+        """Return queue event untuk 1 stream, atau None kalau kuota worker ini penuh"""
+        with self._lock:
+            self._ensure_listener()
+            if self._count >= self.max_streams:
+                self._stats["rejected"] += 1
+                return None
+            q = queue.Queue(maxsize=self.queue_size)
+            self._subs.setdefault(mailbox_id, set()).add(q)
+            self._count += 1
+            return q
+
+    def unsubscribe(self, mailbox_id, q):
+        with self._lock:
+            subs = self._subs.get(mailbox_id)
+            if subs and q in subs:
+                subs.discard(q)
+                self._count -= 1
+                if not subs:
+                    del self._subs[mailbox_id]
+
+    def publish(self, mailbox_id, msg_id):
+        """Kabari semua worker (termasuk diri sendiri) bahwa ada email baru. Tidak pernah blocking."""
+        self._bump("published")
+        data = json.dumps({"mbx": mailbox_id, "id": msg_id}).encode()
+        with self._lock:
+            if self._sender is None or self._sender[0] != os.getpid():
+                sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+                sender.setblocking(False)
+                self._sender = (os.getpid(), sender)
+            sender = self._sender[1]
+        for path in glob.glob(os.path.join(self.sock_dir, "*.sock")):
+            try:
+                sender.sendto(data, path)
+                self._bump("sent")
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker pemilik socket sudah mati
+                self._bump("stale_sockets")
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError:
+                # Buffer penerima penuh (BlockingIOError) dll: notifikasi best-effort
+                self._bump("dropped")
+
+    def active(self):
+        """Stream yang sedang hidup di worker ini (masing-masing memegang 1 thread)"""
+        return self._count if self._pid == os.getpid() else 0
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["streams"] = self._count if self._pid == os.getpid() else 0
+            snap["mailboxes"] = len(self._subs) if self._pid == os.getpid() else 0
+        snap["max_streams"] = self.max_streams
+        return snap
+
+
+# Instance global per worker
+hub = NotifyHub(Config.STREAM_SOCKET_DIR, Config.STREAM_MAX_PER_WORKER, Config.STREAM_QUEUE_SIZE)
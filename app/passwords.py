@@ -0,0 +1,203 @@
+# app/passwords.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: PASSWORD HASHING SERVICE (PROCESS POOL) + LOGIN PENALTY BOX
+#
+# Hash password (scrypt/pbkdf2) = CPU berat. Dikerjakan di process pool kecil per
+# worker supaya thread request & GIL tidak ikut tersandera. Antrean dibatasi:
+# kalau penuh langsung ditolak (503), bukan ditumpuk.
+# Delay login gagal tidak lagi pakai time.sleep: percobaan berikutnya dari
+# (username, IP) yang sama ditolak cepat sampai masa blokirnya habis.
+
+import os
+import time
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+from config import Config
+from app.database import pool
+from app.metrics import timed
+
+
+class HasherBusy(Exception):
+    """Pool hashing penuh / timeout: suruh client coba lagi"""
+
+
+def canonical_method(method):
+    """Lengkapi parameter default werkzeug ("scrypt" -> "scrypt:32768:8:1") supaya bisa dibandingkan"""
+    parts = method.split(":")
+    if parts[0] == "scrypt":
+        defaults = ["scrypt", "32768", "8", "1"]
+    elif parts[0] == "pbkdf2":
+        defaults = ["pbkdf2", "sha256", str(DEFAULT_PBKDF2_ITERATIONS)]
+    else:
+        return method
+    return ":".join(parts + defaults[len(parts):])
+
+
+class PasswordHasher:
+
+    def __init__(self, workers, queue_max):
+        self.workers = workers
+        self.queue_max = queue_max
+        self.method = canonical_method(Config.PASSWORD_HASH_METHOD)
+        self._pid = None
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._dummy_hash = None
+        self._stats = {"hashed": 0, "verified": 0, "rejected_busy": 0, "timeouts": 0,
+                       "rehashed": 0, "pool_restarts": 0}
+
+    def _get_executor(self):
+        with self._lock:
+            if self._pid != os.getpid() or self._executor is None:
+                # spawn: proses hashing tidak mewarisi thread/socket/koneksi DB worker.
+                # Yang dikirim ke sana cuma fungsi werkzeug, jadi tidak ikut import app.
+                ctx = multiprocessing.get_context("spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+                if self._pid != os.getpid():
+                    # Future milik proses induk tidak pernah selesai di sini
+                    self._pending = 0
+                self._pid = os.getpid()
+            return self._executor
+
+    def _submit(self, fn, *args):
+        """Return (executor, future), future None kalau antrean penuh"""
+        executor = self._get_executor()
+        with self._lock:
+            if self._pending >= self.queue_max:
+                return executor, None
+            self._pending += 1
+        try:
+            future = executor.submit(fn, *args)
+        except BrokenProcessPool:
+            self._release(None)
+            self._restart(executor)
+            raise HasherBusy("hash pool restarted")
+        # Dilepas saat hash benar-benar selesai (bukan saat pemanggil berhenti menunggu),
+        # jadi hash yang timeout tetap dihitung selama masih jalan di pool
+        future.add_done_callback(self._release)
+        return executor, future
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending = max(0, self._pending - 1)
+
+    def _restart(self, broken):
+        # Proses hashing mati (OOM / kill): buat pool baru untuk request berikutnya.
+        # Future di pool lama selesai dengan error -> _pending turun lewat callback
+        with self._lock:
+            if self._executor is broken: # Thread lain mungkin sudah membuat pool baru
+                self._executor = None
+                self._stats["pool_restarts"] += 1
+
+    def _run(self, fn, *args):
+        executor, future = self._submit(fn, *args)
+        if future is None:
+            self._bump("rejected_busy")
+            raise HasherBusy("hash queue full")
+        try:
+            with timed("password_pool", fn.__name__):
+                return future.result(timeout=Config.PASSWORD_HASH_TIMEOUT)
+        except FutureTimeout:
+            self._bump("timeouts")
+            raise HasherBusy("hash timeout")
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise HasherBusy("hash pool restarted")
+
+    def hash(self, password):
+        digest = self._run(generate_password_hash, password, self.method)
+        self._bump("hashed")
+        return digest
+
+    def verify(self, stored_hash, password):
+        """
+        stored_hash None (user tidak ada) tetap diverifikasi ke hash dummy,
+        supaya waktu respon tidak membocorkan username mana yang terdaftar.
+        """
+        if stored_hash is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = self.hash(os.urandom(16).hex())
+            self._run(check_password_hash, self._dummy_hash, password or "")
+            return False
+        ok = self._run(check_password_hash, stored_hash, password or "")
+        self._bump("verified")
+        return ok
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split("$", 1)[0] != self.method
+
+    def rehash_async(self, password, on_done):
+        """Hash ulang dengan parameter baru tanpa menahan request. Dilewati kalau pool sibuk."""
+        try:
+            _, future = self._submit(generate_password_hash, password, self.method)
+        except HasherBusy:
+            return False
+        if future is None:
+            return False
+
+        def _done(f):
+            try:
+                on_done(f.result())
+                self._bump("rehashed")
+            except Exception as e:
+                print(f"❌ Password rehash failed: {e}", flush=True)
+        future.add_done_callback(_done)
+        return True
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["pending"] = self._pending if self._pid == os.getpid() else 0
+        snap["method"] = self.method
+        return snap
+
+
+# ==============================================================================
+# LOGIN PENALTY BOX (lintas worker, di SQLite)
+# ==============================================================================
+def penalty_key(username, anon_ip):
+    # Per (username, IP): penyerang tidak bisa mengunci akun orang lain dari IP-nya sendiri
+    return hashlib.sha256(f"{username}|{anon_ip}".encode()).hexdigest()
+
+
+def penalty_remaining(key):
+    """Detik sisa blokir (0 = boleh coba), dan jumlah gagal tercatat"""
+    row = pool.query("SELECT failures, blocked_until, updated_at FROM login_penalty WHERE key=?", (key,), one=True)
+    if not row:
+        return 0, 0
+    failures, blocked_until, updated_at = row
+    now = time.time()
+    if now - updated_at > Config.LOGIN_PENALTY_RESET:
+        return 0, 0
+    return max(0, blocked_until - now), failures
+
+
+def penalty_fail(key):
+    """Catat gagal login, return lama blokir (detik)"""
+    now = time.time()
+    with pool.transaction() as conn:
+        row = conn.execute("SELECT failures, updated_at FROM login_penalty WHERE key=?", (key,)).fetchone()
+        failures = 1 if not row or now - row[1] > Config.LOGIN_PENALTY_RESET else row[0] + 1
+        delay = min(Config.LOGIN_PENALTY_MAX, Config.LOGIN_PENALTY_BASE * (2 ** (failures - 1)))
+        conn.execute('''INSERT INTO login_penalty (key, failures, blocked_until, updated_at) VALUES (?, ?, ?, ?)
+                        ON CONFLICT(key) DO UPDATE SET failures=excluded.failures,
+                        blocked_until=excluded.blocked_until, updated_at=excluded.updated_at''',
+                     (key, failures, now + delay, now))
+    return delay
+
+
+def penalty_clear(key):
+    pool.execute("DELETE FROM login_penalty WHERE key=?", (key,))
+
+
+# Instance global per worker (process pool dibuat saat hash pertama)
+hasher = PasswordHasher(Config.PASSWORD_HASH_WORKERS, Config.PASSWORD_QUEUE_MAX)
@@ -0,0 +1,302 @@
+# app/profiling.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: REQUEST PROFILING (ON-DEMAND cProfile + SLOW REQUEST SAMPLER)
+#
+# Dua cara melihat ke mana waktu habis di dalam 1 request, hasil ditulis ke
+# PROFILE_DIR (dipakai bareng semua worker, file terlama dibuang lewat PROFILE_MAX_FILES):
+# - On-demand: request dengan header PROFILE_HEADER = token dari
+#   POST /api/admin/profiles/token (HMAC ADMIN_KEY, terikat path + kedaluwarsa)
+#   dijalankan di bawah cProfile -> "req-*.prof" (pstats). Header X-Profile-Id di response.
+# - Slow sampler (selalu hidup, murah): thread per worker mengambil stack thread yang
+#   sedang melayani request tiap PROFILE_SAMPLE_INTERVAL. Request yang selesai lebih
+#   lama dari PROFILE_SLOW_THRESHOLD disimpan -> "slow-*.json": stack (format collapsed,
+#   siap untuk flamegraph) + rincian waktu per dependency (app/metrics.py).
+# Query string tidak pernah ikut disimpan (bisa berisi token).
+
+import io
+import os
+import re
+import sys
+import hmac
+import json
+import time
+import pstats
+import hashlib
+import cProfile
+import threading
+from collections import Counter
+from flask import request, g
+from config import Config
+from app import metrics
+from app.background import PeriodicTask
+
+# <kind>-<epoch ms>-<pid>-<durasi ms>-<route>.<ext>
+_NAME_RE = re.compile(r'^(req|slow)-(\d+)-(\d+)-(\d+)-([A-Za-z0-9_]+)\.(prof|json)$')
+
+
+def sign_profile_token(path, expires):
+    """Nilai header PROFILE_HEADER untuk `path` (tanpa query) yang berlaku sampai epoch `expires`"""
+    sig = hmac.new(Config.ADMIN_KEY.encode(), f"profile:{int(expires)}:{path}".encode(), hashlib.sha256).hexdigest()
+    return f"{int(expires)}.{sig}"
+
+
+def verify_profile_token(token, path, now=None):
+    if not Config.ADMIN_KEY or not token or "." not in token:
+        return False
+    expires, _, _ = token.partition(".")
+    if not expires.isdigit():
+        return False
+    now = time.time() if now is None else now
+    if not now <= int(expires) <= now + Config.PROFILE_TOKEN_MAX_TTL:
+        return False
+    # Bytes, bukan str: header bebas diisi client (non-ASCII -> TypeError di compare_digest str)
+    return hmac.compare_digest(token.encode(), sign_profile_token(path, int(expires)).encode())
+
+
+class _Capture:
+    """State slow sampler untuk 1 request yang sedang berjalan"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.samples = Counter()
+
+
+class RequestProfiler:
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._active = {} # thread ident -> _Capture
+        self._cprofile_lock = threading.Lock() # 1 cProfile per worker sekaligus
+        self._lock = threading.Lock()
+        self._window = (0, 0) # (menit, jumlah capture slow di menit itu)
+        self._sampler = PeriodicTask("profile-sampler", Config.PROFILE_SAMPLE_INTERVAL, self._sample)
+        self._stats = {"profiled": 0, "profile_busy": 0, "slow_captured": 0, "slow_skipped": 0,
+                       "samples": 0, "write_errors": 0}
+
+    def start(self):
+        if Config.PROFILE_SLOW_ENABLED:
+            os.makedirs(self.directory, exist_ok=True)
+            self._sampler.start()
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    # --------------------------------------------------------------------------
+    # SAMPLER (THREAD BACKGROUND)
+    # --------------------------------------------------------------------------
+    def _sample(self):
+        if not self._active:
+            return
+        frames = sys._current_frames()
+        taken = 0
+        for ident, capture in list(self._active.items()):
+            frame = frames.get(ident)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < Config.PROFILE_STACK_DEPTH:
+                code = frame.f_code
+                stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            capture.samples[";".join(reversed(stack))] += 1
+            taken += 1
+        del frames
+        self._bump("samples", taken)
+
+    def begin(self):
+        capture = _Capture()
+        self._active[threading.get_ident()] = capture
+        metrics.start_breakdown()
+        return capture
+
+    def finish(self, capture, status):
+        self._active.pop(threading.get_ident(), None)
+        deps = metrics.stop_breakdown()
+        duration = time.perf_counter() - capture.started
+        if duration < Config.PROFILE_SLOW_THRESHOLD:
+            return None
+        # Semua request lambat (dependency mati) tidak boleh membanjiri disk
+        minute = int(time.time() // 60)
+        with self._lock:
+            current, count = self._window
+            if current != minute:
+                current, count = minute, 0
+            if count >= Config.PROFILE_SLOW_MAX_PER_MINUTE:
+                self._stats["slow_skipped"] += 1
+                return None
+            self._window = (current, count + 1)
+
+        stacks = [{"stack": stack, "count": n} for stack, n in capture.samples.most_common(Config.PROFILE_STACKS_MAX)]
+        record = {
+            "route": _route(), "method": request.method, "path": request.path, "status": status,
+            "duration_ms": round(duration * 1000.0, 3), "started_at": capture.started_at, "pid": os.getpid(),
+            "deps": {name: {"count": n, "ms": round(sec * 1000.0, 3)} for name, (n, sec) in sorted(deps.items())},
+            "deps_ms": round(sum(sec for _, sec in deps.values()) * 1000.0, 3),
+            "sample_interval_ms": Config.PROFILE_SAMPLE_INTERVAL * 1000.0,
+            "samples": sum(capture.samples.values()), "stacks": stacks,
+        }
+        name = self._write("slow", duration, json.dumps(record, indent=1).encode(), "json")
+        if name:
+            self._bump("slow_captured")
+        return name
+
+    # --------------------------------------------------------------------------
+    # ON-DEMAND cProfile
+    # --------------------------------------------------------------------------
+    def start_cprofile(self):
+        """Profile request ini (thread ini). None kalau worker sedang memprofile request lain."""
+        if not self._cprofile_lock.acquire(blocking=False):
+            self._bump("profile_busy")
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Profiler lain sudah aktif di proses ini
+            self._cprofile_lock.release()
+            self._bump("profile_busy")
+            return None
+        return (profile, time.perf_counter())
+
+    def stop_cprofile(self, handle):
+        profile, started = handle
+        try:
+            profile.disable()
+            duration = time.perf_counter() - started
+            # dump_stats butuh path: tulis ke tmp lalu rename (pembaca tidak pernah melihat file setengah jadi)
+            name = self._name("req", duration, "prof")
+            tmp = os.path.join(self.directory, f".{name}.tmp")
+            os.makedirs(self.directory, exist_ok=True)
+            profile.dump_stats(tmp)
+            os.replace(tmp, os.path.join(self.directory, name))
+            self._rotate()
+            self._bump("profiled")
+            return name
+        except OSError as e:
+            print(f"❌ Profile write error: {e}", flush=True)
+            self._bump("write_errors")
+            return None
+        finally:
+            self._cprofile_lock.release()
+
+    # --------------------------------------------------------------------------
+    # STORE (FILE DI PROFILE_DIR, ROTASI)
+    # --------------------------------------------------------------------------
+    def _name(self, kind, duration, ext):
+        return f"{kind}-{int(time.time() * 1000)}-{os.getpid()}-{int(duration * 1000)}-{_route_slug()}.{ext}"
+
+    def _write(self, kind, duration, data, ext):
+        name = self._name(kind, duration, ext)
+        tmp = os.path.join(self.directory, f".{name}.tmp")
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(self.directory, name))
+        except OSError as e:
+            print(f"❌ Profile write error: {e}", flush=True)
+            self._bump("write_errors")
+            return None
+        self._rotate()
+        return name
+
+    def _rotate(self):
+        entries = self.list()
+        for entry in entries[Config.PROFILE_MAX_FILES:]:
+            try:
+                os.unlink(os.path.join(self.directory, entry["id"]))
+            except FileNotFoundError:
+                pass # Sudah dihapus worker lain
+
+    def list(self, kind=None):
+        """Profile tersimpan (semua worker), terbaru dulu"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        entries = []
+        for name in names:
+            m = _NAME_RE.match(name)
+            if not m or (kind and m.group(1) != kind):
+                continue
+            try:
+                size = os.path.getsize(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            entries.append({"id": name, "kind": m.group(1), "created_at": int(m.group(2)) / 1000.0,
+                            "pid": int(m.group(3)), "duration_ms": int(m.group(4)), "route": m.group(5),
+                            "size": size})
+        entries.sort(key=lambda e: e["created_at"], reverse=True)
+        return entries
+
+    def path(self, profile_id):
+        """Path file untuk id dari list(), None kalau id tidak valid / sudah dirotasi"""
+        if not _NAME_RE.match(profile_id or ""):
+            return None
+        path = os.path.join(self.directory, profile_id)
+        return path if os.path.isfile(path) else None
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+        snap["active"] = len(self._active)
+        snap["slow_threshold_ms"] = Config.PROFILE_SLOW_THRESHOLD * 1000.0
+        return snap
+
+
+def render_text(path, limit=50):
+    """Ringkasan pstats (urut cumulative) untuk file .prof"""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats("cumulative").print_stats(limit)
+    return out.getvalue()
+
+
+def _route():
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def _route_slug():
+    return re.sub(r'[^A-Za-z0-9]+', '_', _route()).strip('_')[:60] or "root"
+
+
+# ==============================================================================
+# FLASK HOOKS
+# ==============================================================================
+def _before_request():
+    if Config.PROFILE_SLOW_ENABLED:
+        g._profile_capture = profiler.begin()
+    token = request.headers.get(Config.PROFILE_HEADER)
+    if token and verify_profile_token(token, request.path):
+        g._profile_cprofile = profiler.start_cprofile()
+
+
+def _after_request(response):
+    g._profile_status = response.status_code
+    handle = g.pop('_profile_cprofile', None)
+    if handle is not None:
+        name = profiler.stop_cprofile(handle)
+        if name:
+            response.headers['X-Profile-Id'] = name
+    return response
+
+
+def _teardown_request(exc):
+    # Exception tanpa response: after_request tidak jalan, profiler tetap harus ditutup
+    handle = g.pop('_profile_cprofile', None)
+    if handle is not None:
+        profiler.stop_cprofile(handle)
+    capture = g.pop('_profile_capture', None)
+    if capture is not None:
+        profiler.finish(capture, g.pop('_profile_status', 500))
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+
+
+# Instance global per worker (direktori dipakai bareng semua worker)
+profiler = RequestProfiler(Config.PROFILE_DIR)
@@ -0,0 +1,219 @@
+# app/ratelimit.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: SHARED-MEMORY SLIDING WINDOW RATE LIMITER
+#
+# Counter disimpan di file mmap (default /dev/shm) yang dipakai bareng oleh
+# semua worker gunicorn. Key = (route, client_hash). Tabel dibagi jadi bucket
+# 8 slot, tiap bucket dijaga 1 stripe lock (threading.Lock + fcntl byte-range),
+# jadi request dari client berbeda hampir tidak pernah saling tunggu.
+
+import os
+import time
+import mmap
+import fcntl
+import struct
+import hashlib
+import tempfile
+import threading
+from config import Config
+from app.database import pool
+from app.background import PeriodicTask
+
+# Slot: key fingerprint, window_start, prev_hits, curr_hits, rejected, (pad)
+SLOT = struct.Struct("<QdIIII")
+BUCKET_SLOTS = 8
+
+
+def default_shm_path():
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, "dface-ratelimit.bin")
+
+
+class SharedLimiter:
+
+    def __init__(self, path, slots, stripes):
+        self.path = path
+        self.buckets = max(1, slots // BUCKET_SLOTS)
+        self.stripes = stripes
+        self.size = self.buckets * BUCKET_SLOTS * SLOT.size
+        self._pid = None
+        self._fd = None
+        self._mm = None
+        self._locks = []
+        self._open_lock = threading.Lock()
+
+        # Key yang disentuh worker ini sejak persist terakhir (fp -> "route:client")
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
+        self._persister = PeriodicTask("ratelimit-persist", Config.RATE_LIMIT_PERSIST_INTERVAL, self.persist)
+        self._stats = {"allowed": 0, "rejected": 0, "audited": 0, "evictions": 0}
+
+    # --------------------------------------------------------------------------
+    # MMAP LIFECYCLE (fork-aware)
+    # --------------------------------------------------------------------------
+    def _ensure_open(self):
+        if self._pid == os.getpid():
+            return
+        with self._open_lock:
+            if self._pid == os.getpid():
+                return
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            # Init lock: hanya 1 worker yang membuat + restore tabel
+            init_byte = self.size + self.stripes
+            fcntl.lockf(fd, fcntl.LOCK_EX, 1, init_byte)
+            try:
+                fresh = os.fstat(fd).st_size < self.size
+                if fresh:
+                    os.ftruncate(fd, self.size)
+                self._fd = fd
+                self._mm = mmap.mmap(fd, self.size)
+                self._locks = [threading.Lock() for _ in range(self.stripes)]
+                if fresh and Config.RATE_LIMIT_PERSIST:
+                    self.restore()
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN, 1, init_byte)
+            self._pid = os.getpid()
+            if Config.RATE_LIMIT_PERSIST:
+                self._persister.start()
+
+    def _lock_stripe(self, stripe):
+        self._locks[stripe].acquire()
+        # Byte lock di luar area data: antar proses
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self.size + stripe)
+
+    def _unlock_stripe(self, stripe):
+        fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self.size + stripe)
+        self._locks[stripe].release()
+
+    # --------------------------------------------------------------------------
+    # CORE
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def fingerprint(key):
+        fp = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little")
+        return fp or 1 # 0 = slot kosong
+
+    def _find_slot(self, bucket, fp):
+        """Cari slot milik fp di bucket; kalau tidak ada, ambil slot kosong / paling basi."""
+        base = bucket * BUCKET_SLOTS
+        victim, victim_start = None, None
+        for i in range(base, base + BUCKET_SLOTS):
+            key_fp, start, _, _, _, _ = SLOT.unpack_from(self._mm, i * SLOT.size)
+            if key_fp == fp:
+                return i, True
+            if key_fp == 0:
+                return i, False
+            if victim is None or start < victim_start:
+                victim, victim_start = i, start
+        self._stats["evictions"] += 1
+        return victim, False
+
+    def hit(self, route, client_hash, limit, window, cost=1):
+        """
+        Catat `cost` hit (default 1 per request). Return (allowed, audit_note).
+        audit_note hanya terisi untuk penolakan pertama dalam 1 window, atau ringkasan
+        penolakan window sebelumnya -> banjir 429 tidak jadi banjir INSERT audit.
+        """
+        self._ensure_open()
+        key = f"{route}:{client_hash}"
+        fp = self.fingerprint(key)
+        bucket = fp % self.buckets
+        stripe = bucket % self.stripes
+        now = time.time()
+        window_start = float((int(now) // window) * window)
+        note = None
+
+        self._lock_stripe(stripe)
+        try:
+            idx, found = self._find_slot(bucket, fp)
+            off = idx * SLOT.size
+            if found:
+                _, start, prev, curr, rejected, _ = SLOT.unpack_from(self._mm, off)
+            else:
+                start, prev, curr, rejected = window_start, 0, 0, 0
+
+            # Geser window
+            if start != window_start:
+                if rejected > 1:
+                    note = f"Coalesced {rejected} rejections ({limit}/{window}s)"
+                prev = curr if window_start - start == window else 0
+                curr, rejected, start = 0, 0, window_start
+
+            # Estimasi sliding window (weighted prev + curr)
+            elapsed = (now - start) / window
+            estimate = prev * (1.0 - elapsed) + curr
+
+            if estimate + cost > limit:
+                allowed = False
+                rejected += 1
+                if rejected == 1:
+                    note = f"Exceeded {limit}/{window}s"
+            else:
+                allowed = True
+                curr += cost
+
+            SLOT.pack_into(self._mm, off, fp, start, prev, curr, rejected, 0)
+        finally:
+            self._unlock_stripe(stripe)
+
+        self._stats["allowed" if allowed else "rejected"] += 1
+        if note:
+            self._stats["audited"] += 1
+        if Config.RATE_LIMIT_PERSIST:
+            with self._dirty_lock:
+                self._dirty[fp] = key
+        return allowed, note
+
+    # --------------------------------------------------------------------------
+    # OPTIONAL PERSISTENCE (SQLite snapshot, periodik)
+    # --------------------------------------------------------------------------
+    def _read(self, key):
+        fp = self.fingerprint(key)
+        bucket = fp % self.buckets
+        stripe = bucket % self.stripes
+        self._lock_stripe(stripe)
+        try:
+            base = bucket * BUCKET_SLOTS
+            for i in range(base, base + BUCKET_SLOTS):
+                row = SLOT.unpack_from(self._mm, i * SLOT.size)
+                if row[0] == fp:
+                    return row
+        finally:
+            self._unlock_stripe(stripe)
+        return None
+
+    def persist(self):
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, {}
+        if not dirty:
+            return
+        rows = []
+        for key in dirty.values():
+            row = self._read(key)
+            if row:
+                rows.append((key, row[3], row[1]))
+        pool.executemany('''INSERT INTO ratelimit (client_hash, hits, window_start) VALUES (?, ?, ?)
+                            ON CONFLICT(client_hash) DO UPDATE SET hits=excluded.hits, window_start=excluded.window_start''',
+                         rows)
+
+    def restore(self):
+        """Isi ulang tabel mmap yang baru dibuat dari snapshot SQLite (window yang masih hidup)."""
+        horizon = time.time() - Config.RATE_LIMIT_RESTORE_HORIZON
+        rows = pool.query("SELECT client_hash, hits, window_start FROM ratelimit WHERE window_start > ? AND client_hash LIKE '%:%'",
+                          (horizon,))
+        for key, hits, start in rows:
+            fp = self.fingerprint(key)
+            bucket = fp % self.buckets
+            idx, _ = self._find_slot(bucket, fp)
+            SLOT.pack_into(self._mm, idx * SLOT.size, fp, start, 0, hits, 0, 0)
+
+    def stats(self):
+        snap = dict(self._stats)
+        snap["path"] = self.path
+        snap["slots"] = self.buckets * BUCKET_SLOTS
+        return snap
+
+
+# Instance global (file mmap dibagi antar worker)
+limiter = SharedLimiter(Config.RATE_LIMIT_SHM_PATH or default_shm_path(),
+                        Config.RATE_LIMIT_SLOTS, Config.RATE_LIMIT_STRIPES)
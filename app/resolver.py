@@ -0,0 +1,209 @@
+# app/resolver.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: SSRF RESOLVER (CACHED, IPv4 + IPv6, IP PINNING)
+#
+# Semua record A/AAAA di-resolve dan dicek ke tabel network terlarang (ipaddress).
+# Hostname hanya aman kalau SEMUA alamatnya publik. Forwarder memakai IP yang sama
+# persis dengan yang divalidasi, jadi DNS rebinding tidak bisa menyelipkan IP lain.
+# Cache mengikuti TTL record DNS (maksimal RESOLVER_TTL) kalau dnspython terpasang.
+# Tanpa dnspython: getaddrinfo tidak memberi TTL, jadi semua jawaban disimpan
+# RESOLVER_TTL tetap. Gagal resolve selalu disimpan RESOLVER_NEGATIVE_TTL.
+
+import time
+import socket
+import ipaddress
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+from config import Config
+
+try:
+    import dns.resolver # Opsional: dnspython -> cache mengikuti TTL record
+    import dns.exception
+except ImportError:
+    dns = None
+
+SAFE = "SAFE"
+UNSAFE = "UNSAFE"
+UNRESOLVED = "UNRESOLVED"
+
+# Range yang tidak boleh jadi tujuan request keluar
+BLOCKED_NETWORKS = tuple(ipaddress.ip_network(n) for n in (
+    # IPv4
+    "0.0.0.0/8",          # "this network"
+    "10.0.0.0/8",         # private
+    "100.64.0.0/10",      # CGNAT
+    "127.0.0.0/8",        # loopback
+    "169.254.0.0/16",     # link-local (metadata cloud!)
+    "172.16.0.0/12",      # private
+    "192.0.0.0/24",       # IETF protocol assignments
+    "192.0.2.0/24",       # TEST-NET-1
+    "192.88.99.0/24",     # 6to4 relay anycast
+    "192.168.0.0/16",     # private
+    "198.18.0.0/15",      # benchmarking
+    "198.51.100.0/24",    # TEST-NET-2
+    "203.0.113.0/24",     # TEST-NET-3
+    "224.0.0.0/4",        # multicast
+    "240.0.0.0/4",        # reserved + broadcast
+    # IPv6
+    "::/128",             # unspecified
+    "::1/128",            # loopback
+    "64:ff9b:1::/48",     # NAT64 lokal
+    "100::/64",           # discard
+    "2001:db8::/32",      # dokumentasi
+    "fc00::/7",           # unique local
+    "fe80::/10",          # link-local
+    "fec0::/10",          # site-local (deprecated)
+    "ff00::/8",           # multicast
+))
+
+
+def embedded_ipv4(ip):
+    """IPv4 yang 'dibungkus' alamat IPv6 (mapped, 6to4, teredo, NAT64) juga harus dicek"""
+    if ip.version != 6:
+        return None
+    if ip.ipv4_mapped:
+        return ip.ipv4_mapped
+    if ip.sixtofour:
+        return ip.sixtofour
+    if ip.teredo:
+        return ip.teredo[1]
+    if ip in ipaddress.ip_network("64:ff9b::/96"):
+        return ipaddress.ip_address(int(ip) & 0xFFFFFFFF)
+    return None
+
+
+def is_public_ip(ip):
+    if isinstance(ip, str):
+        ip = ipaddress.ip_address(ip.split('%', 1)[0])
+    if any(ip in net for net in BLOCKED_NETWORKS if net.version == ip.version):
+        return False
+    inner = embedded_ipv4(ip)
+    if inner is not None:
+        return is_public_ip(inner)
+    return True
+
+
+class CachedResolver:
+
+    def __init__(self, ttl, negative_ttl, max_entries):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self._cache = OrderedDict() # host -> (expires_at, verdict, ips)
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "errors": 0, "blocked": 0,
+                       "resolve_ms_total": 0.0, "resolve_ms_max": 0.0}
+
+    def _classify(self, ips):
+        if Config.SSRF_ALLOW_PRIVATE:
+            return SAFE
+        return SAFE if all(is_public_ip(ip) for ip in ips) else UNSAFE
+
+    def lookup(self, host):
+        """Return (verdict, ips). ips = alamat yang sudah divalidasi, urut sesuai getaddrinfo."""
+        host = (host or "").strip().lower().rstrip('.')
+        if not host:
+            return UNRESOLVED, []
+
+        # IP literal: tidak perlu DNS
+        try:
+            ip = ipaddress.ip_address(host.strip('[]'))
+        except ValueError:
+            pass
+        else:
+            verdict = self._classify([str(ip)])
+            if verdict == UNSAFE:
+                self._bump("blocked")
+            return verdict, [str(ip)]
+
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(host)
+            if entry and entry[0] > now:
+                self._cache.move_to_end(host)
+                self._stats["hits" if entry[1] != UNRESOLVED else "negative_hits"] += 1
+                return entry[1], entry[2]
+            self._stats["misses"] += 1
+
+        started = time.perf_counter()
+        ips, record_ttl = self._resolve(host)
+        verdict = self._classify(ips) if ips else UNRESOLVED
+        elapsed = (time.perf_counter() - started) * 1000.0
+
+        if verdict == UNRESOLVED:
+            ttl = self.negative_ttl
+        else:
+            ttl = self.ttl if record_ttl is None else min(self.ttl, record_ttl)
+        with self._lock:
+            self._stats["resolve_ms_total"] += elapsed
+            self._stats["resolve_ms_max"] = max(self._stats["resolve_ms_max"], elapsed)
+            if verdict == UNRESOLVED:
+                self._stats["errors"] += 1
+            elif verdict == UNSAFE:
+                self._stats["blocked"] += 1
+            self._cache[host] = (now + ttl, verdict, ips)
+            self._cache.move_to_end(host)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return verdict, ips
+
+    def _resolve(self, host):
+        """Return (ips, ttl record DNS atau None kalau tidak diketahui)"""
+        if dns is not None:
+            ips, ttls = [], []
+            try:
+                for rdtype in ("A", "AAAA"):
+                    answer = dns.resolver.resolve(host, rdtype, raise_on_no_answer=False)
+                    if answer.rrset is not None:
+                        ips.extend(rdata.address for rdata in answer.rrset)
+                        ttls.append(answer.rrset.ttl)
+            except (dns.exception.DNSException, UnicodeError, ValueError):
+                ips = []
+            if ips:
+                return list(dict.fromkeys(ips)), min(ttls)
+            # Nama lokal (/etc/hosts, search domain) tidak ada di DNS: lanjut ke getaddrinfo
+        try:
+            infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+            return list(dict.fromkeys(info[4][0] for info in infos)), None
+        except (socket.gaierror, UnicodeError, ValueError):
+            return [], None
+
+    def check_url(self, url):
+        """Return (verdict, ips) untuk URL http/https"""
+        try:
+            parsed = urlparse(url)
+            if parsed.scheme not in ('http', 'https') or not parsed.hostname:
+                return UNSAFE, []
+            parsed.port # port invalid -> ValueError
+        except ValueError:
+            return UNSAFE, []
+        return self.lookup(parsed.hostname)
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["cached_hosts"] = len(self._cache)
+        lookups = snap["hits"] + snap["negative_hits"] + snap["misses"]
+        snap["hit_rate"] = round((snap["hits"] + snap["negative_hits"]) / lookups, 4) if lookups else 0.0
+        snap["resolve_ms_avg"] = round(snap["resolve_ms_total"] / snap["misses"], 3) if snap["misses"] else 0.0
+        snap["resolve_ms_total"] = round(snap["resolve_ms_total"], 3)
+        snap["resolve_ms_max"] = round(snap["resolve_ms_max"], 3)
+        return snap
+
+
+def pin_url(url, ip):
+    """Ganti host di URL dengan IP yang sudah divalidasi. Return (url_baru, header Host)."""
+    parsed = urlparse(url)
+    host_ip = f"[{ip}]" if ':' in ip else ip
+    netloc = f"{host_ip}:{parsed.port}" if parsed.port else host_ip
+    host_header = parsed.netloc.rsplit('@', 1)[-1]
+    return parsed._replace(netloc=netloc).geturl(), host_header
+
+
+# Instance global per worker
+resolver = CachedResolver(Config.RESOLVER_TTL, Config.RESOLVER_NEGATIVE_TTL, Config.RESOLVER_CACHE_MAX)
@@ -0,0 +1,96 @@
+# app/retention.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: MAILBOX RETENTION ENGINE (SHALLOW KEYS + MULTI-PATH DELETE)
+#
+# Inbox dijaga tetap ephemeral: hanya N email terbaru yang disimpan.
+# Yang dibaca cuma daftar key (get(shallow=True)), body email tidak ikut terunduh,
+# dan kelebihannya dihapus dengan 1 update multi-path bernilai null.
+
+import threading
+from config import Config
+from app.background import PeriodicTask
+from app import vault_db_ref # Import Global DB Ref
+
+_stats = {"trimmed": 0, "sweeps": 0, "swept_mailboxes": 0}
+_stats_lock = threading.Lock()
+
+
+def _bump(key, n=1):
+    with _stats_lock:
+        _stats[key] += n
+
+
+def clamp_cap(value):
+    """Cap retensi per user (settings.retention), dibatasi 1..MAILBOX_RETENTION_MAX"""
+    try:
+        cap = int(value)
+    except (TypeError, ValueError):
+        return Config.MAILBOX_RETENTION_DEFAULT
+    return max(1, min(cap, Config.MAILBOX_RETENTION_MAX))
+
+
+def excess_keys(keys, cap):
+    """Push-key urut waktu -> key paling lama ada di depan"""
+    if not keys or len(keys) <= cap:
+        return []
+    return sorted(keys)[:len(keys) - cap]
+
+
+def trim_mailbox(mailbox_id, cap):
+    """Buang email terlama di 1 mailbox sampai tersisa `cap`. Return jumlah yang dihapus."""
+    mailbox_ref = vault_db_ref.child(f'inboxes/{mailbox_id}')
+    old = excess_keys(mailbox_ref.get(shallow=True), cap)
+    if old:
+        mailbox_ref.update({k: None for k in old})
+        _bump("trimmed", len(old))
+    return len(old)
+
+
+def set_mailbox_cap(mailbox_id, cap):
+    """Simpan cap non-default di Vault (retention/{mailbox_id}) supaya sweeper tahu tanpa baca data user"""
+    ref = vault_db_ref.child(f'retention/{mailbox_id}')
+    if cap == Config.MAILBOX_RETENTION_DEFAULT:
+        ref.delete()
+    else:
+        ref.set(cap)
+
+
+# ==============================================================================
+# BULK SWEEPER (Opsional, di luar jalur tulis)
+# ==============================================================================
+def sweep_all():
+    """Trim semua mailbox. Update digabung per RETENTION_SWEEP_BATCH path."""
+    mailboxes = vault_db_ref.child('inboxes').get(shallow=True) or {}
+    caps = vault_db_ref.child('retention').get() or {}
+    inboxes_ref = vault_db_ref.child('inboxes')
+
+    pending = {}
+    for mailbox_id in mailboxes:
+        cap = clamp_cap(caps.get(mailbox_id, Config.MAILBOX_RETENTION_DEFAULT))
+        keys = vault_db_ref.child(f'inboxes/{mailbox_id}').get(shallow=True)
+        for k in excess_keys(keys, cap):
+            pending[f"{mailbox_id}/{k}"] = None
+        if len(pending) >= Config.RETENTION_SWEEP_BATCH:
+            inboxes_ref.update(pending)
+            _bump("trimmed", len(pending))
+            pending = {}
+    if pending:
+        inboxes_ref.update(pending)
+        _bump("trimmed", len(pending))
+
+    _bump("sweeps")
+    _bump("swept_mailboxes", len(mailboxes))
+
+
+sweeper = PeriodicTask("retention-sweeper", Config.RETENTION_SWEEP_INTERVAL, sweep_all,
+                       leader_lock=f"{Config.DB_FILE}.retention.lock")
+
+
+def start_sweeper():
+    if Config.RETENTION_SWEEP_INTERVAL > 0:
+        sweeper.start()
+
+
+def stats():
+    with _stats_lock:
+        return dict(_stats)
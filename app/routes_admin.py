@@ -0,0 +1,212 @@
+# app/routes_admin.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: ADMIN / OPS ENDPOINTS (X-Admin-Key)
+
+import os
+import time
+from flask import Blueprint, request, jsonify, Response, stream_with_context, send_file
+from app.utils import require_admin
+from app.database import pool
+from app.ratelimit import limiter
+from app.tokens import revocations
+from app.inbound import inbound_spool
+from app.inbound_bulk import bulk_ingestor
+from app import retention, sweeper
+from app.delivery import delivery
+from app.audit import audit_writer, audit_reader, AuditQueryError
+from app.ai_client import ai_client
+from app.notify import hub
+from app.smtp_bridge import bridge
+from app.resolver import resolver
+from app.passwords import hasher
+from app.assets import assets
+from app.container import container
+from app.envelope import envelope
+from app.routing import mail_router
+from app.admission import admission
+from app.profiling import profiler, sign_profile_token, render_text
+from config import Config
+
+bp_admin = Blueprint('admin', __name__)
+
+# ==============================================================================
+# ENDPOINT 1: WORKER STATS
+# ==============================================================================
+# Angka bersifat per worker gunicorn (lihat field 'pid')
+@bp_admin.route('/admin/stats', methods=['GET'])
+@require_admin
+def worker_stats():
+    return jsonify({
+        "pid": os.getpid(),
+        "db": pool.stats(),
+        "ratelimit": limiter.stats(),
+        "revocations": revocations.stats(),
+        "inbound": inbound_spool.stats(),
+        "inbound_bulk": bulk_ingestor.stats(),
+        "retention": retention.stats(),
+        "delivery": delivery.stats(),
+        "audit": audit_writer.stats(),
+        "sweeper": sweeper.stats(),
+        "ai": ai_client.stats(),
+        "stream": hub.stats(),
+        "smtp": bridge.stats(),
+        "resolver": resolver.stats(),
+        "passwords": hasher.stats(),
+        "assets": assets.stats(),
+        "container": container.stats(),
+        "envelope": envelope.stats(),
+        "routing": mail_router.stats(),
+        "admission": admission.stats(),
+        "profiling": profiler.stats(),
+    })
+
+# ==============================================================================
+# ENDPOINT 2: INBOUND DEAD LETTER REPLAY
+# ==============================================================================
+@bp_admin.route('/admin/inbound/requeue', methods=['POST'])
+@require_admin
+def requeue_inbound():
+    data = request.json or {}
+    try:
+        ids = [int(i) for i in data.get('ids', [])]
+    except (TypeError, ValueError):
+        return jsonify({"error": "ids must be a list of integers"}), 400
+    moved = inbound_spool.requeue_dead(ids or None)
+    return jsonify({"status": "REQUEUED", "count": moved})
+
+# ==============================================================================
+# ENDPOINT 3: WEBHOOK DELIVERIES (LIST FAILED & REPLAY)
+# ==============================================================================
+@bp_admin.route('/admin/deliveries', methods=['GET'])
+@require_admin
+def failed_deliveries():
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    return jsonify(delivery.failed(min(max(limit, 1), 500)))
+
+@bp_admin.route('/admin/deliveries/replay', methods=['POST'])
+@require_admin
+def replay_deliveries():
+    data = request.json or {}
+    try:
+        ids = [int(i) for i in data.get('ids', [])]
+    except (TypeError, ValueError):
+        return jsonify({"error": "ids must be a list of integers"}), 400
+    return jsonify({"status": "REPLAYED", "count": delivery.replay(ids or None)})
+
+# ==============================================================================
+# ENDPOINT 4: EXPIRY SWEEP (MANUAL TRIGGER)
+# ==============================================================================
+@bp_admin.route('/admin/sweep', methods=['POST'])
+@require_admin
+def run_sweep():
+    return jsonify(sweeper.sweep())
+
+# ==============================================================================
+# ENDPOINT 5: AUDIT LOG (QUERY, COUNTS, NDJSON EXPORT)
+# ==============================================================================
+# Filter: ?event=LOGIN_FAIL,HACK&since=<epoch>&until=<epoch> (since inklusif, until eksklusif)
+def _audit_filters():
+    events = [e for e in request.args.get('event', '').split(',') if e]
+    try:
+        since = float(request.args['since']) if request.args.get('since') else None
+        until = float(request.args['until']) if request.args.get('until') else None
+    except ValueError:
+        raise AuditQueryError("since/until must be epoch seconds")
+    return {"events": events or None, "since": since, "until": until}
+
+@bp_admin.errorhandler(AuditQueryError)
+def audit_query_error(e):
+    return jsonify({"error": str(e)}), 400
+
+@bp_admin.route('/admin/audit', methods=['GET'])
+@require_admin
+def audit_events():
+    # Keyset pagination: kirim balik next_cursor sebagai ?cursor= untuk halaman berikutnya
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        raise AuditQueryError("limit must be an integer")
+    descending = request.args.get('order', 'desc') != 'asc'
+    return jsonify(audit_reader.page(cursor=request.args.get('cursor'), limit=limit,
+                                     descending=descending, **_audit_filters()))
+
+@bp_admin.route('/admin/audit/counts', methods=['GET'])
+@require_admin
+def audit_counts():
+    try:
+        bucket = int(request.args.get('bucket', 3600))
+    except ValueError:
+        raise AuditQueryError("bucket must be an integer (seconds)")
+    if bucket < 1:
+        raise AuditQueryError("bucket must be >= 1")
+    return jsonify(audit_reader.counts(bucket, **_audit_filters()))
+
+@bp_admin.route('/admin/audit/export', methods=['GET'])
+@require_admin
+def audit_export():
+    # Streaming: row dibaca per chunk saat dikirim, tidak pernah dikumpulkan di memori
+    filters = _audit_filters()
+    descending = request.args.get('order', 'asc') == 'desc'
+    resp = Response(stream_with_context(audit_reader.export_ndjson(descending=descending, **filters)),
+                    mimetype='application/x-ndjson')
+    resp.headers['Content-Disposition'] = f'attachment; filename="audit-{int(time.time())}.ndjson"'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+# ==============================================================================
+# ENDPOINT 6: MAIL ROUTING INDEX (SYNC MANUAL)
+# ==============================================================================
+@bp_admin.route('/admin/routes/sync', methods=['POST'])
+@require_admin
+def sync_routes():
+    # ?mode=incremental untuk shallow sync saja, default full
+    return jsonify(mail_router.sync(full=request.args.get('mode', 'full') != 'incremental'))
+
+# ==============================================================================
+# ENDPOINT 7: REQUEST PROFILES (TOKEN, LIST, DOWNLOAD)
+# ==============================================================================
+@bp_admin.route('/admin/profiles/token', methods=['POST'])
+@require_admin
+def profile_token():
+    # Kirim nilai ini di header X-Profile-Request ke `path` untuk menjalankannya di bawah cProfile
+    data = request.json or {}
+    path = data.get('path', '')
+    if not path.startswith('/'):
+        return jsonify({"error": "path must start with /"}), 400
+    try:
+        ttl = int(data.get('ttl', 300))
+    except (TypeError, ValueError):
+        return jsonify({"error": "ttl must be an integer (seconds)"}), 400
+    ttl = min(max(ttl, 1), Config.PROFILE_TOKEN_MAX_TTL)
+    expires = int(time.time()) + ttl
+    return jsonify({"header": Config.PROFILE_HEADER, "value": sign_profile_token(path, expires),
+                    "path": path, "expires_at": expires})
+
+@bp_admin.route('/admin/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    kind = request.args.get('kind') # "req" (cProfile) / "slow" (sampler)
+    try:
+        limit = int(request.args.get('limit', 100))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+    limit = min(max(limit, 1), Config.PROFILE_MAX_FILES)
+    return jsonify(profiler.list(kind)[:limit])
+
+@bp_admin.route('/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def download_profile(profile_id):
+    path = profiler.path(profile_id)
+    if path is None:
+        return jsonify({"error": "Not Found"}), 404
+    if profile_id.endswith('.prof') and request.args.get('format') == 'text':
+        try:
+            limit = int(request.args.get('limit', 50))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        return Response(render_text(path, min(max(limit, 1), 500)), mimetype='text/plain')
+    mimetype = 'application/json' if profile_id.endswith('.json') else 'application/octet-stream'
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=profile_id)
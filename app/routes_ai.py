@@ -4,11 +4,12 @@ import json
 import re
 import hmac
 import hashlib
-import requests
 import os
 from flask import Blueprint, request, jsonify
 from config import Config
-from app.utils import db_exec, db_query, rate_limit, log_audit, hash_device
+from app.utils import db_exec, db_query, rate_limit, log_audit, hash_device, load_session, revoke_session
+from app.tokens import issue_token, is_signed_token
+from app.ai_client import ai_client, AIBusy
 
 bp_ai = Blueprint('ai', __name__)
 
@@ -22,6 +23,11 @@ def init_session():
     if not dev_id or len(dev_id) > 100:
         return jsonify({"error": "Invalid Device ID"}), 400
 
+    # Mode signed: semua claim ada di token, tidak perlu row SQLite
+    if Config.SESSION_TOKEN_FORMAT == "signed":
+        token, _ = issue_token(dev_id, "INTERVIEW", "INTERVIEWING", Config.SESSION_TTL_INTERVIEW)
+        return jsonify({"token": token, "status": "READY"})
+
     # 1. Generate Token
     entropy = f"{dev_id}{time.time()}{os.urandom(8)}"
     token = hmac.new(Config.SECRET_KEY.encode(), entropy.encode(), hashlib.sha256).hexdigest()
@@ -46,34 +52,38 @@ def chat_proxy():
     msg = data.get('message')
     
     # 1. Validasi Session Interview
-    session = db_query("SELECT device_id, status, created_at, expires_at, type FROM sessions WHERE token=?", (token,), one=True)
+    session = load_session(token)
     
     if not session:
         return jsonify({"error": "Session Invalid"}), 401
         
-    dev_id, status, created_at, expires_at, sess_type = session
+    dev_id, status, created_at, expires_at, sess_type = (
+        session["device_id"], session["status"], session["created_at"], session["expires_at"], session["type"])
     
     # Cek Tipe & Expiry
     if sess_type != "INTERVIEW": return jsonify({"error": "Wrong Session Type"}), 403
     if time.time() > expires_at: return jsonify({"error": "Interview Timeout"}), 401
     if status != 'INTERVIEWING': return jsonify({"error": "Interview Closed"}), 403
 
-    # 2. Logic AI (Pollinations)
+    # 2. Logic AI (Pollinations / backend lain via AI_BACKEND_URL)
     sys_prompt = """ROLE: Guardian of Eternals Node. 
     TASK: Assess user. 
     OUTPUT JSON: {"decision": "APPROVED"|"REJECTED"|"CONTINUE", "reply": "string"}
     RULES: Skeptical. Reject bots. Approve only clear security/privacy research intent."""
     
     try:
-        res = requests.post("https://text.pollinations.ai/", 
-                           json={"messages": [{"role":"system", "content": sys_prompt}, 
-                                              {"role":"user", "content": msg}], 
-                                 "model": "openai", "jsonMode": True}, timeout=10)
+        raw = ai_client.complete([{"role":"system", "content": sys_prompt}, 
+                                  {"role":"user", "content": msg}])
         
-        clean = re.sub(r'```json|```', '', res.text).strip()
+        clean = re.sub(r'```json|```', '', raw).strip()
         ai_data = json.loads(clean)
         decision = ai_data.get("decision", "CONTINUE")
         reply = ai_data.get("reply", "...")
+    except AIBusy:
+        # Bulkhead penuh / circuit terbuka: gagal cepat, worker tidak ikut tertahan
+        res = jsonify({"status": "BUSY", "reply": "Guardian is busy. Try again in a moment."})
+        res.headers['Retry-After'] = str(Config.AI_RETRY_AFTER)
+        return res, 503
     except:
         decision = "CONTINUE"
         reply = "Connection unstable. Please rephrase."
@@ -89,7 +99,11 @@ def chat_proxy():
             log_audit("VETO", "Too fast approval", request)
         else:
             # LULUS! Update status jadi APPROVED
-            db_exec("UPDATE sessions SET status='APPROVED' WHERE token=?", (token,))
+            # (Signed token tidak bisa diubah -> dicabut supaya interview tertutup)
+            if is_signed_token(token):
+                revoke_session(token)
+            else:
+                db_exec("UPDATE sessions SET status='APPROVED' WHERE token=?", (token,))
             
             # Generate SIGNATURE untuk pendaftaran
             # Ini bukti bahwa user sudah lulus AI, dipakai di endpoint /create-account
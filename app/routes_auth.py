@@ -4,14 +4,21 @@ import uuid
 import hmac
 import hashlib
 import os
-from flask import Blueprint, request, jsonify
-from werkzeug.security import generate_password_hash, check_password_hash
-from app.utils import db_exec, db_query, hash_device, log_audit, rate_limit, get_anon_ip
+from flask import Blueprint, request, jsonify, g
+from app.utils import db_exec, db_query, hash_device, log_audit, rate_limit, get_anon_ip, require_auth, revoke_session
+from app.tokens import issue_token
+from app.passwords import hasher, HasherBusy, penalty_key, penalty_remaining, penalty_fail, penalty_clear
+from app.routing import mail_router
 from app import auth_db_ref # Import Global Firebase Ref
 from config import Config
 
 bp_auth = Blueprint('auth', __name__)
 
+def busy_response():
+    resp = jsonify({"error": "Server Busy, Retry Shortly"})
+    resp.headers['Retry-After'] = str(Config.PASSWORD_RETRY_AFTER)
+    return resp, 503
+
 # --- ENDPOINT 1: CREATE ACCOUNT (WITH SIGNATURE) ---
 @bp_auth.route('/create-account', methods=['POST'])
 @rate_limit(limit=3, window=300) # Anti-Spam Registration
@@ -37,14 +44,22 @@ def create_account():
     if auth_db_ref.child(f'users/{username}').get():
         return jsonify({"error": "Username taken"}), 400
 
-    # 3. Generate Mailbox ID (The Secret Link)
+    # 3. Hash Password (di process pool, bukan di thread request)
+    if not data.get('password'):
+        return jsonify({"error": "Invalid Password"}), 400
+    try:
+        password_hash = hasher.hash(data.get('password'))
+    except HasherBusy:
+        return busy_response()
+
+    # 4. Generate Mailbox ID (The Secret Link)
     mailbox_id = str(uuid.uuid4())
 
-    # 4. Simpan Identity
+    # 5. Simpan Identity
     user_payload = {
         "username": username,
         "alias": f"{data.get('alias')}@defacer.dedyn.io",
-        "password_hash": generate_password_hash(data.get('password')),
+        "password_hash": password_hash,
         "device_bound": hash_device(dev_id), # Bind ke Hash Device
         "mailbox_id": mailbox_id,
         "created_at": {".sv": "timestamp"},
@@ -52,9 +67,10 @@ def create_account():
     }
     
     auth_db_ref.child(f'users/{username}').set(user_payload)
+    mail_router.put(username, mailbox_id) # Index routing lokal (inbound langsung kenal user ini)
     
     # Hapus sesi interview (bersih-bersih)
-    db_exec("DELETE FROM sessions WHERE token=?", (token,))
+    revoke_session(token)
     
     return jsonify({"status": "CREATED"})
 
@@ -67,28 +83,65 @@ def login():
     password = data.get('password')
     dev_id_input = data.get('device_id')
 
+    # 0. Penalty Box: masih diblokir karena gagal sebelumnya -> tolak tanpa hashing
+    # (pengganti time.sleep: worker tidak ikut tertahan)
+    p_key = penalty_key(username, get_anon_ip(request))
+    remaining, failures = penalty_remaining(p_key)
+    if remaining > 0:
+        resp = jsonify({"error": "Too Many Attempts"})
+        resp.headers['Retry-After'] = str(int(remaining) + 1)
+        return resp, 429
+
     # 1. Ambil User dari Firebase
     user_ref = auth_db_ref.child(f'users/{username}').get()
     
-    # 2. Validasi Password (Timing Attack Safe)
-    if not user_ref or not check_password_hash(user_ref.get('password_hash', ''), password):
-        time.sleep(1) # Fake delay
-        return jsonify({"error": "Invalid Credentials"}), 401
+    # 2. Validasi Password (Timing Attack Safe: user tidak ada tetap di-hash ke dummy)
+    stored_hash = user_ref.get('password_hash', '') if user_ref else None
+    try:
+        valid = hasher.verify(stored_hash, password)
+    except HasherBusy:
+        return busy_response()
+    if not valid:
+        delay = penalty_fail(p_key)
+        resp = jsonify({"error": "Invalid Credentials"})
+        resp.headers['Retry-After'] = str(int(delay))
+        return resp, 401
+    if failures:
+        penalty_clear(p_key)
+
+    # 2b. Parameter hash berubah (PASSWORD_HASH_METHOD): hash ulang di background
+    if hasher.needs_rehash(stored_hash):
+        hasher.rehash_async(password, lambda new_hash: auth_db_ref.child(f'users/{username}/password_hash').set(new_hash))
 
     # 3. Validasi Device Binding (Mencegah Login di HP Lain)
-    if user_ref.get('device_bound') != hash_device(dev_id_input):
+    device_hash = hash_device(dev_id_input)
+    if user_ref.get('device_bound') != device_hash:
         log_audit("BLOCK", f"Device Mismatch: {username}", request)
         return jsonify({"error": "Device Not Recognized"}), 403
 
     # 4. Buat Token Login (24 Jam)
+    if Config.SESSION_TOKEN_FORMAT == "signed":
+        session_token, _ = issue_token(dev_id_input, "LOGIN", "LOGGED_IN", Config.SESSION_TTL_LOGIN,
+                                       usr=username, dvh=device_hash, mbx=user_ref.get('mailbox_id'))
+        return jsonify({"status": "SUCCESS", "token": session_token, "alias": user_ref.get('alias')})
+
     entropy = f"LOGIN{username}{time.time()}{os.urandom(8)}"
     session_token = hmac.new(Config.SECRET_KEY.encode(), entropy.encode(), hashlib.sha256).hexdigest()
     
     now = time.time()
     expires_at = now + Config.SESSION_TTL_LOGIN
     
-    # Simpan Session (Type: LOGIN)
-    db_exec("INSERT INTO sessions (token, device_id, ip, status, type, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)", 
-            (session_token, dev_id_input, get_anon_ip(request), "LOGGED_IN", "LOGIN", now, expires_at))
+    # Simpan Session (Type: LOGIN) + binding user (dipakai verify_ownership tanpa Firebase)
+    db_exec("INSERT INTO sessions (token, device_id, ip, status, type, created_at, expires_at, username, device_hash, mailbox_id) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", 
+            (session_token, dev_id_input, get_anon_ip(request), "LOGGED_IN", "LOGIN", now, expires_at,
+             username, device_hash, user_ref.get('mailbox_id')))
 
     return jsonify({"status": "SUCCESS", "token": session_token, "alias": user_ref.get('alias')})
+
+# --- ENDPOINT 3: LOGOUT (REVOKE SESSION) ---
+@bp_auth.route('/logout', methods=['POST'])
+@require_auth
+def logout():
+    revoke_session(g.session_token)
+    return jsonify({"status": "LOGGED_OUT"})
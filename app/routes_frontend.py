@@ -1,17 +1,24 @@
 # app/routes_frontend.py
-from flask import Blueprint, send_from_directory
-import os
+from flask import Blueprint, abort
+from app.assets import assets
 
 # Definisikan Blueprint untuk Frontend
 bp_frontend = Blueprint('frontend', __name__)
 
+# Semua file statis dilayani dari memori (app/assets.py): sudah dikompres
+# gzip/brotli saat start, ETag kuat per encoding, URL ber-fingerprint immutable.
+
 @bp_frontend.route('/')
 def index():
-    # Saat user membuka domain utama, kirim index.html
-    # Flask otomatis mencari di folder 'app/static' karena struktur package kita
-    return send_from_directory('static', 'index.html')
+    # Saat user membuka domain utama, kirim index.html (revalidasi pendek)
+    return assets.serve('index.html') or abort(404)
+
+@bp_frontend.route('/static/<path:path>')
+def static_assets(path):
+    # CSS / JS: nama ber-fingerprint di-cache 1 tahun, nama asli no-cache
+    return assets.serve(path) or abort(404)
 
 @bp_frontend.route('/<path:path>')
 def static_files(path):
-    # Menangani permintaan file CSS, JS, Gambar, dll
-    return send_from_directory('static', path)
+    # Menangani permintaan file CSS, JS, Gambar, dll (path lama tanpa /static)
+    return assets.serve(path) or abort(404)
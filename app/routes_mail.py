@@ -2,12 +2,19 @@
 # ARCHITECT: ETERNALS DEV
 # MODULE: MAIL LOGIC (INBOX, SETTINGS, BRIDGE)
 
-import requests
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from flask import Blueprint, request, jsonify, g
-from app.utils import require_auth, is_safe_url, encrypt_content, decrypt_content, hash_device, log_audit, rate_limit
+import hashlib
+import json
+import time
+import queue
+from flask import Blueprint, request, jsonify, g, make_response, Response
+from config import Config
+from app.utils import require_auth, require_inbound_secret, is_safe_url, decrypt_content, hash_device, log_audit, rate_limit
+from app.inbound import inbound_spool, normalize_payload, push_key, PUSH_CHARS
+from app.inbound_bulk import bulk_ingestor, read_items, BulkParseError, BulkTooLarge
+from app.retention import clamp_cap, set_mailbox_cap
+from app.notify import hub
+from app.smtp_bridge import bridge, recipients
+from app.routing import mail_router
 from app import auth_db_ref, vault_db_ref # Import Global DB Refs
 
 bp_mail = Blueprint('mail', __name__)
@@ -20,7 +27,14 @@ def verify_ownership(username):
     Memastikan User A hanya bisa akses data User A.
     Menggunakan Device ID dari Token Login sebagai bukti kepemilikan.
     """
-    # Ambil user dari Firebase Identity DB
+    # Jalur cepat: session sudah di-bind ke username + device hash saat login
+    # (device hash sudah dicocokkan dengan Firebase waktu itu) -> tanpa round trip
+    if g.get('username'):
+        if username != g.username or g.device_hash != hash_device(g.device_id):
+            return None
+        return {"username": g.username, "mailbox_id": g.mailbox_id, "device_bound": g.device_hash}
+    
+    # Session lama (belum ada binding): cek manual ke Firebase Identity DB
     user_ref = auth_db_ref.child(f'users/{username}').get()
     if not user_ref:
         return None
@@ -47,26 +61,42 @@ def update_settings():
     
     # 1. Validasi Ownership
     # Mencegah Attacker mengubah webhook orang lain
-    if not verify_ownership(username):
+    user_ref = verify_ownership(username)
+    if not user_ref:
         log_audit("HACK", f"Unauthorized Settings Access: {username}", request)
         return jsonify({"error": "Access Denied"}), 403
     
+    changes = {}
+    
     # 2. SSRF Protection (Cek Utils)
-    if webhook_url and not is_safe_url(webhook_url):
-        log_audit("SSRF", "Malicious Webhook Blocked", request)
-        return jsonify({"error": "Unsafe URL Detected"}), 400
+    if 'webhook_url' in data:
+        if webhook_url and not is_safe_url(webhook_url):
+            log_audit("SSRF", "Malicious Webhook Blocked", request)
+            return jsonify({"error": "Unsafe URL Detected"}), 400
+        changes["forward_url"] = webhook_url
+    
+    # 3. Retensi Inbox (opsional, 1..MAILBOX_RETENTION_MAX)
+    if 'retention' in data:
+        changes["retention"] = clamp_cap(data.get('retention'))
+        set_mailbox_cap(user_ref.get('mailbox_id'), changes["retention"])
 
-    # 3. Update Firebase
-    auth_db_ref.child(f'users/{username}/settings').update({"forward_url": webhook_url})
+    # 4. Update Firebase
+    if changes:
+        auth_db_ref.child(f'users/{username}/settings').update(changes)
+        mail_router.update_settings(username, changes)
     return jsonify({"status": "UPDATED"})
 
 # ==============================================================================
 # ENDPOINT 2: FETCH INBOX (SECURED)
 # ==============================================================================
-@bp_mail.route('/inbox', methods=['POST'])
+@bp_mail.route('/inbox', methods=['GET', 'POST'])
 @require_auth # Wajib Login
 def get_inbox():
-    data = request.json or {}
+    # GET = mode headers (polling dashboard), POST = format lama (5 email lengkap)
+    if request.method == 'GET':
+        data = request.args
+    else:
+        data = request.json or {}
     username = data.get('username')
     
     # 1. Validasi Ownership
@@ -77,6 +107,10 @@ def get_inbox():
     
     mailbox_id = user_ref.get('mailbox_id')
     
+    mode = data.get('mode', 'headers' if request.method == 'GET' else 'full')
+    if mode == 'headers':
+        return inbox_headers(mailbox_id, data.get('since') or '')
+    
     # 2. Ambil Email dari Vault (Limit 5 Terakhir)
     raw_inbox = vault_db_ref.child(f'inboxes/{mailbox_id}').order_by_key().limit_to_last(5).get()
     
@@ -96,6 +130,121 @@ def get_inbox():
     clean_inbox.reverse()
     return jsonify(clean_inbox)
 
+def inbox_headers(mailbox_id, since):
+    """
+    List header saja (from, subject, time) untuk email yang lebih baru dari cursor `since`.
+    Key push Firebase urut waktu, jadi cursor cukup key terakhir yang sudah dilihat client.
+    """
+    mailbox_ref = vault_db_ref.child(f'inboxes/{mailbox_id}')
+    
+    # Shallow get = daftar key saja (tanpa isi email), cukup untuk ETag & cursor
+    keys = sorted((mailbox_ref.get(shallow=True) or {}).keys())
+    new_keys = [k for k in keys if k > since][-Config.MAILBOX_RETENTION_MAX:]
+    
+    # Tanpa `since`: cursor client maju tiap poll, ETag harus tetap sama selama mailbox tidak berubah
+    etag = hashlib.sha256(f"{mailbox_id}|{','.join(keys)}".encode()).hexdigest()[:32]
+    if request.if_none_match.contains(etag):
+        resp = make_response('', 304)
+        resp.set_etag(etag)
+        return resp
+    
+    headers = []
+    if new_keys:
+        # Hanya email baru yang diunduh dari Vault, body tidak didekripsi
+        raw_inbox = mailbox_ref.order_by_key().start_at(new_keys[0]).get() or {}
+        for k in new_keys:
+            v = raw_inbox.get(k)
+            if not v:
+                continue
+            headers.append({
+                "id": k,
+                "from": v.get('from'),
+                "subject": decrypt_content(v.get('subject')),
+                "time": v.get('timestamp')
+            })
+    headers.reverse()
+    
+    resp = jsonify({
+        "messages": headers,
+        "cursor": keys[-1] if keys else since,
+        "ids": keys # Client buang cache email yang sudah di-purge retensi
+    })
+    resp.set_etag(etag)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
+@bp_mail.route('/inbox/stream', methods=['GET'])
+@require_auth # Auth cukup sekali, saat stream dibuka
+def inbox_stream():
+    user_ref = verify_ownership(request.args.get('username'))
+    if not user_ref:
+        return jsonify({"error": "Access Denied"}), 403
+    
+    mailbox_id = user_ref.get('mailbox_id')
+    events = hub.subscribe(mailbox_id)
+    if events is None:
+        # Kuota stream worker ini penuh: client fallback ke polling dulu
+        resp = jsonify({"error": "Stream Busy"})
+        resp.headers['Retry-After'] = str(Config.STREAM_HEARTBEAT)
+        return resp, 503
+    
+    def generate():
+        try:
+            yield f"retry: {Config.STREAM_HEARTBEAT * 1000}\n\n"
+            deadline = time.time() + Config.STREAM_MAX_AGE
+            while time.time() < deadline:
+                try:
+                    event = events.get(timeout=Config.STREAM_HEARTBEAT)
+                except queue.Empty:
+                    # Heartbeat: jaga koneksi proxy tetap hidup + deteksi client putus
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: mail\ndata: {json.dumps({'id': event.get('id')})}\n\n"
+        finally:
+            hub.unsubscribe(mailbox_id, events)
+    
+    resp = Response(generate(), mimetype='text/event-stream')
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'
+    return resp
+
+@bp_mail.route('/inbox/<msg_id>', methods=['GET'])
+@require_auth # Wajib Login
+def get_message(msg_id):
+    user_ref = verify_ownership(request.args.get('username'))
+    if not user_ref:
+        return jsonify({"error": "Access Denied"}), 403
+    
+    # Key push Firebase hanya [-0-9A-Za-z_], tolak path aneh
+    if not msg_id or any(c not in PUSH_CHARS for c in msg_id):
+        return jsonify({"error": "Not Found"}), 404
+    
+    mail_ref = vault_db_ref.child(f"inboxes/{user_ref.get('mailbox_id')}/{msg_id}")
+    
+    # Email tidak pernah diubah setelah disimpan -> ETag = id email.
+    # Tetap cek email masih ada (shallow = key saja, tanpa isi): yang sudah dihapus harus 404
+    if request.if_none_match.contains(msg_id):
+        if not mail_ref.get(shallow=True):
+            return jsonify({"error": "Not Found"}), 404
+        resp = make_response('', 304)
+        resp.set_etag(msg_id)
+        return resp
+    
+    mail = mail_ref.get()
+    if not mail:
+        return jsonify({"error": "Not Found"}), 404
+    
+    resp = jsonify({
+        "id": msg_id,
+        "from": mail.get('from'),
+        "subject": decrypt_content(mail.get('subject')),
+        "body": decrypt_content(mail.get('body')),
+        "time": mail.get('timestamp')
+    })
+    resp.set_etag(msg_id)
+    resp.headers['Cache-Control'] = 'private, no-cache'
+    return resp
+
 # ==============================================================================
 # ENDPOINT 3: INBOUND WEBHOOK (UNIVERSAL PARSER)
 # ==============================================================================
@@ -105,115 +254,113 @@ def inbound_mail():
     # Support berbagai format (JSON / Form Data)
     data = request.json or request.form
     
-    # Debugging: Print payload masuk ke log Zeabur (Cek tab Logs jika email ga masuk)
-    print(f"DEBUG INBOUND PAYLOAD: {data}", flush=True)
-
-    # 1. Normalisasi Data (Parsing Cerdas)
-    # ForwardEmail kadang pakai 'sender', Cloudflare pakai 'from'
-    sender = data.get('from') or data.get('sender') or 'Unknown Sender'
-    recipient = data.get('to') or data.get('recipient') or ''
-    subject = data.get('subject') or '(No Subject)'
-    
-    # Ambil body (Text priority, fallback ke HTML)
-    body = data.get('text') or data.get('html') or ''
-
-    # 2. Parsing Username dari Recipient
-    # Contoh: "admin@defacer.dedyn.io" -> ambil "admin"
-    try: 
-        # Handle format ribet: "Nama User <admin@domain.com>"
-        if '<' in recipient: 
-            raw_email = recipient.split('<')[1].split('>')[0]
-            username = raw_email.split('@')[0]
-        else:
-            username = recipient.split('@')[0]
-    except: 
-        print(f"DEBUG: Bad Recipient Format: {recipient}")
+    # 1. Normalisasi + parsing username + enkripsi (murah, tanpa network)
+    msg = normalize_payload(data)
+    if not msg:
+        print(f"DEBUG: Bad Recipient Format: {data.get('to') or data.get('recipient')}")
         return jsonify({"status": "IGNORED", "reason": "Bad Recipient Format"}), 200
 
-    # 3. Cek User Exist (DB Auth)
-    # Kita hanya terima email untuk user yang terdaftar di sistem kita
-    user_ref = auth_db_ref.child(f'users/{username}').get()
-    if not user_ref: 
-        print(f"DEBUG: Rejected. User '{username}' not found.")
-        return jsonify({"status": "REJECTED"}), 200
+    # Debugging (log Zeabur): penerima saja, isi email tidak pernah ditulis ke log
+    print(f"DEBUG INBOUND: to={msg['to']}", flush=True)
 
-    mailbox_id = user_ref.get('mailbox_id')
-    
-    # 4. Enkripsi Konten (Zeabur Encrypts -> Firebase Stores)
-    enc_sub = encrypt_content(subject)
-    enc_body = encrypt_content(body)
-
-    # 5. Simpan ke Vault (Secure Storage)
-    vault_ref = vault_db_ref.child(f'inboxes/{mailbox_id}')
-    vault_ref.push({
-        "from": sender,
-        "subject": enc_sub,
-        "body": enc_body,
-        "timestamp": {".sv": "timestamp"}
-    })
-
-    # 6. Auto Purge (Jaga Inbox tetap Ephemeral > 5 Email)
-    msgs = vault_ref.order_by_key().get()
-    if msgs and len(msgs) > 5:
-        sorted_keys = sorted(msgs.keys())
-        # Hitung berapa yang harus dihapus
-        excess = len(msgs) - 5
-        for k in sorted_keys[:excess]:
-            vault_ref.child(k).delete()
-
-    # 7. Forwarding (User Webhook)
-    # Jika user punya setting webhook sendiri, kita lempar datanya (tetap terenkripsi)
-    user_settings = user_ref.get('settings', {})
-    fwd_url = user_settings.get('forward_url')
-    
-    if fwd_url:
-        try:
-            requests.post(fwd_url, json={
-                "event": "INCOMING_MAIL",
-                "to": recipient,
-                "from": sender,
-                "subject_enc": enc_sub, # Tetap kirim terenkripsi demi keamanan
-                "body_enc": enc_body,
-                "note": "Content encrypted. Use your Fernet Key to decrypt."
-            }, timeout=3)
-        except Exception as e:
-            print(f"DEBUG: Webhook Forward Failed: {e}")
+    # 2. Masuk spool (SQLite) lalu langsung ACK ke provider.
+    # Lookup user, simpan ke Vault, purge & forward dikerjakan worker background (app/inbound.py)
+    msg['key'] = push_key()
+    inbound_spool.enqueue(msg)
 
     return jsonify({"status": "RECEIVED"}), 200
 
+# Replay backlog provider: NDJSON (application/x-ndjson) atau JSON array, wajib shared secret.
+# Diproses sinkron supaya tiap email dapat hasil (STORED / TRIMMED / REJECTED / INVALID / FAILED).
+# Yang FAILED boleh dikirim ulang: key baru, tidak ada yang tertulis untuk email itu.
+@bp_mail.route('/webhook-inbound/bulk', methods=['POST'])
+@require_inbound_secret
+def inbound_bulk():
+    try:
+        items = read_items(request.stream, request.content_type, request.content_length)
+    except BulkTooLarge as e:
+        return jsonify({"error": str(e)}), 413
+    except BulkParseError as e:
+        return jsonify({"error": str(e)}), 400
+
+    results = bulk_ingestor.ingest(items)
+    counts = {}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+    return jsonify({"status": "PROCESSED", "total": len(results), "counts": counts, "results": results}), 200
+
 # ==============================================================================
 # ENDPOINT 4: SMTP BRIDGE (SECURED)
 # ==============================================================================
+def bridge_items(data):
+    """Body /send-bridge -> (daftar email, None) atau (None, pesan error 400)"""
+    # Format lama: 1 email (to, subject, message). Format batch: messages = [{to, subject, message}, ...]
+    if not isinstance(data, dict):
+        return None, "Missing SMTP Credentials or Data"
+    required_fields = ['smtp_host', 'smtp_user', 'smtp_pass']
+    items = data.get('messages')
+    if items is None and 'to' in data and 'message' in data:
+        items = [{"to": data.get('to'), "subject": data.get('subject', '(No Subject)'), "message": data.get('message')}]
+    if not all(k in data for k in required_fields) or not items or not isinstance(items, list):
+        return None, "Missing SMTP Credentials or Data"
+    if len(items) > Config.SMTP_BATCH_MAX:
+        return None, f"Batch limit is {Config.SMTP_BATCH_MAX} messages"
+    if not all(isinstance(i, dict) and isinstance(i.get('to'), (str, list)) and recipients(i) and 'message' in i
+               for i in items):
+        return None, "Each message needs 'to' and 'message'"
+    # Lebih dari jatah per menit tidak akan pernah lolos rate limit: tolak sebagai 400, bukan 429
+    if bridge_recipients(items) > Config.SMTP_RATE_LIMIT:
+        return None, f"Recipient limit is {Config.SMTP_RATE_LIMIT} per request"
+    return items, None
+
+def bridge_recipients(items):
+    """Jumlah penerima (batch + koma) = unit rate limit anti spam"""
+    return sum(len(recipients(i)) for i in items)
+
+def bridge_cost(req):
+    # Body tidak valid -> 0 (tidak dihitung), handler yang membalas 400
+    items, error = bridge_items(req.get_json(silent=True))
+    return 0 if error else bridge_recipients(items)
+
 @bp_mail.route('/send-bridge', methods=['POST'])
 @require_auth # Wajib Login
-@rate_limit(limit=3, window=60) # Rate Limit Ketat (Anti Spam)
+@rate_limit(limit=Config.SMTP_RATE_LIMIT, window=60, cost=bridge_cost)
 def send_bridge():
     data = request.json or {}
     
-    # Validasi Input Basic
-    required_fields = ['smtp_host', 'smtp_user', 'smtp_pass', 'to', 'message']
-    if not all(k in data for k in required_fields):
-        return jsonify({"error": "Missing SMTP Credentials or Data"}), 400
+    # Validasi Input Basic (sama persis dengan yang dihitung rate limit)
+    items, error = bridge_items(data)
+    if error:
+        return jsonify({"error": error}), 400
 
+    # Kirim pakai Server SMTP User Sendiri
+    # Port default 587 (TLS)
     try:
-        # Susun Email
-        msg = MIMEMultipart()
-        msg['From'] = data.get('smtp_user')
-        msg['To'] = data.get('to')
-        msg['Subject'] = data.get('subject', '(No Subject)')
-        msg.attach(MIMEText(data.get('message'), 'plain'))
-
-        # Kirim pakai Server SMTP User Sendiri
-        # Port default 587 (TLS), fallback manual jika perlu
-        port = int(data.get('smtp_port', 587))
-        
-        server = smtplib.SMTP(data.get('smtp_host'), port)
-        server.starttls()
-        server.login(data.get('smtp_user'), data.get('smtp_pass'))
-        server.sendmail(data.get('smtp_user'), data.get('to'), msg.as_string())
-        server.quit()
-        
-        log_audit("OUTBOUND", f"Bridge Used: {data.get('smtp_host')}", request)
-        return jsonify({"status": "SENT"})
+        creds = {"host": data.get('smtp_host'), "port": int(data.get('smtp_port', 587)),
+                 "user": data.get('smtp_user'), "password": data.get('smtp_pass')}
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid SMTP Port"}), 400
+    
+    log_audit("OUTBOUND", f"Bridge Used: {creds['host']} ({len(items)} msg)", request)
+    
+    # Mode async: langsung balas job id, status dicek lewat GET /send-bridge/<job_id>
+    if data.get('async'):
+        job_id = bridge.submit(hash_device(g.device_id), creds, items)
+        return jsonify({"status": "QUEUED", "job_id": job_id}), 202
+
+    try:
+        results = bridge.send_batch(creds, items)
     except Exception as e:
         return jsonify({"error": f"SMTP Error: {str(e)}"}), 500
+    
+    sent = sum(1 for r in results if r["status"] == "SENT")
+    status = "SENT" if sent == len(results) else ("PARTIAL" if sent else "FAILED")
+    return jsonify({"status": status, "sent": sent, "failed": len(results) - sent, "results": results})
+
+@bp_mail.route('/send-bridge/<job_id>', methods=['GET'])
+@require_auth # Hanya device yang membuat job
+def send_bridge_status(job_id):
+    job = bridge.job(job_id, hash_device(g.device_id))
+    if not job:
+        return jsonify({"error": "Not Found"}), 404
+    return jsonify(job)
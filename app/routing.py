@@ -0,0 +1,233 @@
+# app/routing.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: LOCAL MAIL ROUTING INDEX (USERNAME -> MAILBOX, REPLIKA DI SQLITE)
+#
+# Email masuk cukup butuh mailbox_id + settings (forward_url, retention), bukan
+# seluruh record user (password_hash dll). Field itu direplikasi ke tabel
+# mail_routes, jadi jalur inbound tidak lagi menunggu Firebase:
+# - Sync (1 worker, leader lock), selalu lewat shallow key + child read (record penuh
+#   tidak pernah diambil):
+#   - full sync tiap ROUTES_FULL_SYNC_INTERVAL (bangun ulang, hapus user yang hilang)
+#   - incremental tiap ROUTES_SYNC_INTERVAL: user baru / terhapus + refresh settings
+#     ROUTES_REFRESH_BATCH row tertua (bergiliran)
+# - Write-through dari create_account & /settings: worker yang menulis langsung benar,
+#   worker lain di instance yang sama paling lama ROUTES_CACHE_TTL detik.
+# - Perubahan settings dari instance lain (SQLite sendiri) paling lama
+#   ceil(jumlah user / ROUTES_REFRESH_BATCH) x ROUTES_SYNC_INTERVAL (dibatasi
+#   ROUTES_FULL_SYNC_INTERVAL), ditambah ROUTES_CACHE_TTL.
+# - Cache per worker di depan SQLite. Tidak ada di tabel belum tentu tidak terdaftar
+#   (akun baru dari instance lain belum ter-sync), jadi Firebase tetap ditanya
+#   (field routing saja) sebelum email ditolak. Jawaban "tidak ada" disimpan singkat
+#   (ROUTES_NEGATIVE_TTL): selama itu akun yang baru dibuat di instance lain masih ditolak.
+
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from app.database import pool
+from app.background import PeriodicTask
+from app import auth_db_ref # Import Global DB Ref
+
+_UPSERT = '''INSERT INTO mail_routes (username, mailbox_id, forward_url, retention, updated_at)
+             VALUES (?, ?, ?, ?, ?)
+             ON CONFLICT(username) DO UPDATE SET mailbox_id=excluded.mailbox_id,
+                 forward_url=excluded.forward_url, retention=excluded.retention, updated_at=excluded.updated_at
+             WHERE mail_routes.updated_at <= excluded.updated_at'''
+
+
+def route_fields(mailbox_id, settings):
+    """Field routing saja, dari record / settings user di Firebase"""
+    settings = settings if isinstance(settings, dict) else {}
+    return {"mailbox_id": mailbox_id, "forward_url": settings.get('forward_url') or "",
+            "retention": settings.get('retention')}
+
+
+class MailRouter:
+
+    def __init__(self):
+        self._cache = OrderedDict() # username -> (expires_at, route / None)
+        self._no_mailbox = set() # User tanpa mailbox_id: dicek ulang hanya saat full sync (leader)
+        self._lock = threading.Lock()
+        self._task = PeriodicTask("mail-routes-sync", Config.ROUTES_SYNC_INTERVAL, self.sync,
+                                  leader_lock=f"{Config.DB_FILE}.routes.lock")
+        self._stats = {"hits": 0, "negative_hits": 0, "db_hits": 0, "remote_rejects": 0, "remote_lookups": 0,
+                       "full_syncs": 0, "incremental_syncs": 0, "synced_users": 0, "removed_users": 0,
+                       "refreshed_users": 0}
+
+    def start(self):
+        if Config.ROUTES_ENABLED and Config.ROUTES_SYNC_INTERVAL > 0:
+            self._task.start()
+            # Sync pertama langsung (kalau worker ini leader), tidak menunggu 1 interval
+            self._task.wake()
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def _remember(self, username, route, ttl):
+        with self._lock:
+            self._cache[username] = (time.time() + ttl, route)
+            self._cache.move_to_end(username)
+            while len(self._cache) > Config.ROUTES_CACHE_MAX:
+                self._cache.popitem(last=False)
+
+    # --------------------------------------------------------------------------
+    # LOOKUP (JALUR INBOUND)
+    # --------------------------------------------------------------------------
+    def lookup(self, username):
+        """Return {mailbox_id, forward_url, retention} atau None (user tidak terdaftar)"""
+        if not Config.ROUTES_ENABLED:
+            return self._fetch_remote(username)
+
+        with self._lock:
+            entry = self._cache.get(username)
+            if entry and entry[0] > time.time():
+                self._cache.move_to_end(username)
+                self._stats["hits" if entry[1] else "negative_hits"] += 1
+                return entry[1]
+
+        row = pool.query("SELECT mailbox_id, forward_url, retention FROM mail_routes WHERE username=?",
+                         (username,), one=True)
+        if row:
+            route = {"mailbox_id": row[0], "forward_url": row[1] or "", "retention": row[2]}
+            self._remember(username, route, Config.ROUTES_CACHE_TTL)
+            self._bump("db_hits")
+            return route
+
+        # Belum ada di replika (belum sync / akun dari instance lain): tanya Firebase lalu simpan
+        route = self._fetch_remote(username)
+        if route:
+            self.put(username, **route)
+        else:
+            self._remember(username, None, Config.ROUTES_NEGATIVE_TTL)
+            self._bump("remote_rejects")
+        return route
+
+    def _fetch_remote(self, username):
+        self._bump("remote_lookups")
+        user_ref = auth_db_ref.child(f'users/{username}')
+        mailbox_id = user_ref.child('mailbox_id').get()
+        if not mailbox_id:
+            return None
+        return route_fields(mailbox_id, user_ref.child('settings').get())
+
+    # --------------------------------------------------------------------------
+    # WRITE-THROUGH (create_account, /settings)
+    # --------------------------------------------------------------------------
+    def put(self, username, mailbox_id, forward_url="", retention=None):
+        route = {"mailbox_id": mailbox_id, "forward_url": forward_url or "", "retention": retention}
+        pool.execute(_UPSERT, (username, mailbox_id, route["forward_url"], retention, time.time()))
+        self._remember(username, route, Config.ROUTES_CACHE_TTL)
+
+    def update_settings(self, username, changes):
+        """changes = subset {forward_url, retention} yang baru ditulis ke Firebase"""
+        fields = {k: v for k, v in changes.items() if k in ("forward_url", "retention")}
+        if not fields:
+            return
+        assignments = ", ".join(f"{k}=?" for k in fields)
+        pool.execute(f"UPDATE mail_routes SET {assignments}, updated_at=? WHERE username=?",
+                     tuple(fields.values()) + (time.time(), username))
+        with self._lock:
+            self._cache.pop(username, None)
+
+    # --------------------------------------------------------------------------
+    # SYNC (LEADER)
+    # --------------------------------------------------------------------------
+    def sync(self, full=None):
+        """full=None: full kalau belum pernah / sudah lewat ROUTES_FULL_SYNC_INTERVAL"""
+        if full is None:
+            row = pool.query("SELECT value FROM sync_state WHERE name='routes_full'", one=True)
+            full = not row or time.time() - row[0] >= Config.ROUTES_FULL_SYNC_INTERVAL
+        return self.full_sync() if full else self.incremental_sync()
+
+    def _remote_keys(self):
+        return set(auth_db_ref.child('users').get(shallow=True) or {})
+
+    def _fetch_many(self, usernames, settings_only=False):
+        """{username: (mailbox_id, settings)} lewat child read (paralel), tanpa password_hash dkk"""
+        def fetch(username):
+            user_ref = auth_db_ref.child(f'users/{username}')
+            mailbox_id = None if settings_only else user_ref.child('mailbox_id').get()
+            return username, mailbox_id, user_ref.child('settings').get()
+        if not usernames:
+            return {}
+        with ThreadPoolExecutor(max_workers=Config.ROUTES_SYNC_WORKERS, thread_name_prefix="routes-sync") as ex:
+            return {u: (m, st) for u, m, st in ex.map(fetch, usernames)}
+
+    def _store(self, fetched, stamp):
+        """Upsert hasil _fetch_many. User tanpa mailbox_id dicatat supaya tidak dibaca ulang tiap tick."""
+        rows = []
+        for username, (mailbox_id, settings) in fetched.items():
+            if not mailbox_id:
+                self._no_mailbox.add(username)
+                continue
+            route = route_fields(mailbox_id, settings)
+            rows.append((username, route["mailbox_id"], route["forward_url"], route["retention"], stamp))
+        for i in range(0, len(rows), Config.ROUTES_PAGE_SIZE):
+            pool.executemany(_UPSERT, rows[i:i + Config.ROUTES_PAGE_SIZE])
+        return len(rows)
+
+    def full_sync(self):
+        """
+        Bangun ulang tabel dari shallow key users + child read mailbox_id/settings per user
+        (record penuh tidak pernah diambil: password_hash tidak ikut lewat jaringan).
+        Row write-through yang lebih baru tidak ditimpa.
+        """
+        started = time.time()
+        self._no_mailbox = set()
+        synced = self._store(self._fetch_many(sorted(self._remote_keys())), started)
+
+        # Tidak tersentuh full sync ini (dan tidak ada write-through sesudahnya) = user sudah dihapus
+        removed = pool.execute("DELETE FROM mail_routes WHERE updated_at < ?", (started,)).rowcount
+        pool.execute("INSERT OR REPLACE INTO sync_state (name, value) VALUES ('routes_full', ?)", (started,))
+        with self._lock:
+            self._stats["full_syncs"] += 1
+            self._stats["synced_users"] += synced
+            self._stats["removed_users"] += removed
+        return {"mode": "full", "synced": synced, "removed": removed}
+
+    def incremental_sync(self):
+        """
+        Shallow key users: ambil user baru, hapus yang hilang. Lalu refresh settings
+        (forward_url / retention) ROUTES_REFRESH_BATCH row yang paling lama tidak dicek,
+        supaya perubahan dari instance lain (SQLite terpisah) ikut masuk bergiliran.
+        """
+        started = time.time()
+        remote = self._remote_keys()
+        local = {row[0] for row in pool.query("SELECT username FROM mail_routes")}
+        added = self._store(self._fetch_many(sorted(remote - local - self._no_mailbox)), started)
+        self._no_mailbox &= remote
+        removed = 0
+        for username in sorted(local - remote):
+            removed += pool.execute("DELETE FROM mail_routes WHERE username=? AND updated_at < ?",
+                                    (username, started)).rowcount
+
+        # Rolling refresh: row dengan updated_at tertua (write-through / sync terakhir)
+        stale = pool.query("SELECT username, mailbox_id FROM mail_routes WHERE updated_at < ? ORDER BY updated_at LIMIT ?",
+                           (started, Config.ROUTES_REFRESH_BATCH))
+        mailboxes = dict(stale)
+        fetched = self._fetch_many(sorted(u for u in mailboxes if u in remote), settings_only=True)
+        refreshed = self._store({u: (mailboxes[u], st) for u, (_, st) in fetched.items()}, started)
+        with self._lock:
+            for username in fetched:
+                self._cache.pop(username, None)
+            self._stats["incremental_syncs"] += 1
+            self._stats["synced_users"] += added
+            self._stats["removed_users"] += removed
+            self._stats["refreshed_users"] += refreshed
+        return {"mode": "incremental", "synced": added, "removed": removed, "refreshed": refreshed}
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["cached"] = len(self._cache)
+        snap["routes"] = pool.query("SELECT COUNT(*) FROM mail_routes", one=True)[0]
+        row = pool.query("SELECT value FROM sync_state WHERE name='routes_full'", one=True)
+        snap["last_full_sync"] = row[0] if row else None
+        snap["complete"] = bool(row)
+        return snap
+
+
+# Instance global per worker (sync hanya jalan di 1 worker)
+mail_router = MailRouter()
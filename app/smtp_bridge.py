@@ -0,0 +1,286 @@
+# app/smtp_bridge.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: SMTP BRIDGE ENGINE (POOLED CONNECTIONS + BATCH + ASYNC JOBS)
+#
+# - Koneksi SMTP yang sudah STARTTLS + login disimpan sebentar (idle pool) per
+#   (host, port, user), jadi kirim berikutnya tidak handshake ulang
+# - 1 request bisa kirim beberapa email lewat 1 koneksi
+# - Mode async: kirim di thread background, status job dicatat di tabel smtp_jobs
+#   (TANPA kredensial: password hanya hidup di memori selama job berjalan).
+#   Karena itu job milik worker yang mati tidak bisa dilanjutkan: worker hidup
+#   memberi heartbeat ke job-nya, job tanpa heartbeat ditandai FAILED.
+
+import os
+import hmac
+import json
+import time
+import uuid
+import hashlib
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from app.database import pool
+from app.background import PeriodicTask
+from app.metrics import timed
+
+
+def recipients(item):
+    """Field 'to' (string dipisah koma atau list) -> list penerima"""
+    rcpts = item.get('to')
+    if isinstance(rcpts, str):
+        rcpts = [r.strip() for r in rcpts.split(',') if r.strip()]
+    return rcpts
+
+
+def build_message(sender, item):
+    """item = {to, subject, message}. Return (daftar penerima, string MIME)"""
+    rcpts = recipients(item)
+    msg = MIMEMultipart()
+    msg['From'] = sender
+    msg['To'] = ", ".join(rcpts)
+    msg['Subject'] = item.get('subject', '(No Subject)')
+    msg.attach(MIMEText(item.get('message', ''), 'plain'))
+    return rcpts, msg.as_string()
+
+
+class SMTPBridge:
+
+    def __init__(self):
+        self._pid = None
+        self._worker = None # "<pid>-<acak>" pemilik job async
+        self._idle = {} # key -> [(smtp, last_used)]
+        self._executor = None
+        self._lock = threading.Lock()
+        self._reaper = PeriodicTask("smtp-reaper", Config.SMTP_POOL_IDLE / 2.0, self.reap)
+        self._jobs_task = PeriodicTask("smtp-jobs", Config.SMTP_JOB_HEARTBEAT, self.expire_orphans)
+        self._stats = {"connects": 0, "reused": 0, "stale": 0, "closed_idle": 0,
+                       "sent": 0, "failed": 0, "jobs": 0}
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # Koneksi milik parent tidak boleh dipakai bersama setelah fork
+            self._idle = {}
+            self._executor = ThreadPoolExecutor(max_workers=Config.SMTP_ASYNC_WORKERS, thread_name_prefix="smtp")
+            self._worker = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+            self._pid = os.getpid()
+        self._reaper.start()
+        self._jobs_task.start()
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    # --------------------------------------------------------------------------
+    # CONNECTION POOL
+    # --------------------------------------------------------------------------
+    @staticmethod
+    def _key(creds):
+        # Password ikut di-hash ke key: koneksi ter-login hanya dipakai ulang oleh
+        # pemanggil yang tahu password yang sama
+        secret = hmac.new(Config.SECRET_KEY.encode(), creds['password'].encode(), hashlib.sha256).hexdigest()
+        return (creds['host'], creds['port'], creds['user'], secret)
+
+    def _connect(self, creds):
+        with timed("smtp", "connect"):
+            server = smtplib.SMTP(creds['host'], creds['port'], timeout=Config.SMTP_TIMEOUT)
+            try:
+                server.ehlo()
+                if Config.SMTP_REQUIRE_TLS or server.has_extn('starttls'):
+                    server.starttls()
+                    server.ehlo()
+                server.login(creds['user'], creds['password'])
+            except Exception:
+                self._close(server)
+                raise
+        self._bump("connects")
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def _acquire(self, creds):
+        key = self._key(creds)
+        while True:
+            with self._lock:
+                entries = self._idle.get(key)
+                if not entries:
+                    break
+                server, last_used = entries.pop()
+            idle_for = time.time() - last_used
+            if idle_for > Config.SMTP_POOL_IDLE:
+                self._close(server)
+                continue
+            if idle_for > Config.SMTP_NOOP_AFTER:
+                # Server bisa memutus koneksi idle diam-diam, cek murah dulu
+                try:
+                    with timed("smtp", "noop"):
+                        code = server.noop()[0]
+                    if code != 250:
+                        raise smtplib.SMTPServerDisconnected("noop failed")
+                except Exception:
+                    self._bump("stale")
+                    self._close(server)
+                    continue
+            self._bump("reused")
+            return server
+        return self._connect(creds)
+
+    def _release(self, creds, server):
+        key = self._key(creds)
+        with self._lock:
+            entries = self._idle.setdefault(key, [])
+            if len(entries) < Config.SMTP_POOL_MAX_PER_KEY:
+                entries.append((server, time.time()))
+                return
+        self._close(server)
+
+    def reap(self):
+        """Tutup koneksi yang idle lebih lama dari SMTP_POOL_IDLE"""
+        cutoff = time.time() - Config.SMTP_POOL_IDLE
+        expired = []
+        with self._lock:
+            for key in list(self._idle):
+                keep = [e for e in self._idle[key] if e[1] >= cutoff]
+                expired.extend(e[0] for e in self._idle[key] if e[1] < cutoff)
+                if keep:
+                    self._idle[key] = keep
+                else:
+                    del self._idle[key]
+        for server in expired:
+            self._close(server)
+        if expired:
+            self._bump("closed_idle", len(expired))
+
+    # --------------------------------------------------------------------------
+    # SEND
+    # --------------------------------------------------------------------------
+    def send_batch(self, creds, items):
+        """
+        Kirim semua email lewat 1 koneksi. Return list hasil per email.
+        Gagal connect / login di awal = exception (tidak ada yang terkirim). Koneksi putus
+        di tengah batch: email itu FAILED, sisanya UNSENT, hasil yang sudah SENT tetap dilaporkan.
+        """
+        self._ensure_started()
+        server = self._acquire(creds)
+        results = []
+        try:
+            for index, item in enumerate(items):
+                rcpts, body = build_message(creds['user'], item)
+                broken = None
+                for attempt in range(2):
+                    try:
+                        if server is None:
+                            server = self._connect(creds)
+                        with timed("smtp", "send"):
+                            refused = server.sendmail(creds['user'], rcpts, body)
+                        results.append({"to": rcpts, "status": "SENT", "refused": sorted(refused)})
+                        break
+                    except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError) as e:
+                        # Error per email: koneksi masih sehat, lanjut email berikutnya
+                        results.append({"to": rcpts, "status": "FAILED", "error": str(e)})
+                        break
+                    except (smtplib.SMTPException, OSError) as e:
+                        # Koneksi mati (pool basi / server putus): sambung ulang sekali
+                        if server is not None:
+                            self._close(server)
+                            server = None
+                        if attempt or not isinstance(e, smtplib.SMTPServerDisconnected):
+                            broken = e
+                            break
+                if broken is not None:
+                    # Jangan buang hasil yang sudah SENT: client tidak boleh mengirim ulang itu
+                    results.append({"to": rcpts, "status": "FAILED", "error": str(broken)})
+                    results.extend({"to": recipients(rest), "status": "UNSENT", "error": "connection lost"}
+                                   for rest in items[index + 1:])
+                    break
+        except Exception:
+            if server is not None:
+                self._close(server)
+            raise
+        else:
+            if server is not None:
+                self._release(creds, server)
+        finally:
+            sent = sum(1 for r in results if r["status"] == "SENT")
+            self._bump("sent", sent)
+            self._bump("failed", len(results) - sent)
+        return results
+
+    # --------------------------------------------------------------------------
+    # ASYNC JOBS
+    # --------------------------------------------------------------------------
+    def submit(self, owner, creds, items):
+        """Antrekan batch di background. Return job id (status di tabel smtp_jobs)."""
+        self._ensure_started()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        pool.execute('''INSERT INTO smtp_jobs (id, owner, host, status, total, sent, failed, results, error, created_at, updated_at,
+                                              worker)
+                        VALUES (?, ?, ?, 'QUEUED', ?, 0, 0, NULL, NULL, ?, ?, ?)''',
+                     (job_id, owner, creds['host'], len(items), now, now, self._worker))
+        self._bump("jobs")
+        self._executor.submit(self._run_job, job_id, creds, items)
+        return job_id
+
+    def _run_job(self, job_id, creds, items):
+        pool.execute("UPDATE smtp_jobs SET status='RUNNING', updated_at=? WHERE id=?", (time.time(), job_id))
+        try:
+            results = self.send_batch(creds, items)
+        except Exception as e:
+            pool.execute("UPDATE smtp_jobs SET status='FAILED', failed=total, error=?, updated_at=? WHERE id=?",
+                         (str(e)[:500], time.time(), job_id))
+            return
+        sent = sum(1 for r in results if r["status"] == "SENT")
+        status = "SENT" if sent == len(results) else ("PARTIAL" if sent else "FAILED")
+        pool.execute("UPDATE smtp_jobs SET status=?, sent=?, failed=?, results=?, updated_at=? WHERE id=?",
+                     (status, sent, len(results) - sent, json.dumps(results), time.time(), job_id))
+
+    def expire_orphans(self):
+        """Heartbeat job milik worker ini, job QUEUED/RUNNING tanpa heartbeat -> FAILED"""
+        now = time.time()
+        with pool.transaction() as conn:
+            if self._pid == os.getpid():
+                conn.execute("UPDATE smtp_jobs SET updated_at=? WHERE status IN ('QUEUED', 'RUNNING') AND worker=?",
+                             (now, self._worker))
+            cur = conn.execute('''UPDATE smtp_jobs SET status='FAILED', failed=total - sent, error='worker lost', updated_at=?
+                                  WHERE status IN ('QUEUED', 'RUNNING') AND updated_at < ?''',
+                               (now, now - Config.SMTP_JOB_STALE_AFTER))
+        return cur.rowcount
+
+    def job(self, job_id, owner):
+        query = '''SELECT id, status, total, sent, failed, results, error, created_at, updated_at
+                   FROM smtp_jobs WHERE id=? AND owner=?'''
+        row = pool.query(query, (job_id, owner), one=True)
+        if not row:
+            return None
+        # Worker yang memegang job sudah mati (tidak ada heartbeat): jangan jawab RUNNING selamanya
+        if row[1] in ("QUEUED", "RUNNING") and row[8] < time.time() - Config.SMTP_JOB_STALE_AFTER:
+            self.expire_orphans()
+            row = pool.query(query, (job_id, owner), one=True)
+        return {"job_id": row[0], "status": row[1], "total": row[2], "sent": row[3], "failed": row[4],
+                "results": json.loads(row[5]) if row[5] else [], "error": row[6],
+                "created_at": row[7], "updated_at": row[8]}
+
+    def stats(self):
+        with self._lock:
+            snap = dict(self._stats)
+            snap["idle_connections"] = sum(len(v) for v in self._idle.values()) if self._pid == os.getpid() else 0
+        return snap
+
+
+# Instance global per worker
+bridge = SMTPBridge()
@@ -0,0 +1,137 @@
+# app/spool.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: DURABLE INBOUND SPOOL (SQLITE QUEUE + BACKGROUND WORKERS)
+#
+# /webhook-inbound cukup INSERT 1 row lalu balas 200. Worker background di tiap
+# proses gunicorn meng-claim batch, memprosesnya (Firebase, enkripsi, forward),
+# retry dengan backoff, dan memindahkan yang gagal terus ke inbound_dead.
+
+import os
+import json
+import time
+import uuid
+import threading
+from config import Config
+from app.database import pool
+from app.background import PeriodicTask
+
+
+class InboundSpool:
+
+    def __init__(self, handler, workers, batch_size):
+        self.handler = handler
+        self.batch_size = batch_size
+        self._tasks = [PeriodicTask(f"inbound-worker-{i}", Config.INBOUND_POLL_INTERVAL, self.drain)
+                       for i in range(workers)]
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "processed": 0, "retried": 0, "dead": 0,
+                       "latency_ms_last": 0.0, "latency_ms_max": 0.0, "latency_ms_sum": 0.0}
+
+    # --------------------------------------------------------------------------
+    # PRODUCER
+    # --------------------------------------------------------------------------
+    def enqueue(self, msg):
+        now = time.time()
+        cur = pool.execute("INSERT INTO inbound_spool (payload, enqueued_at, attempts, next_attempt_at) VALUES (?, ?, 0, ?)",
+                           (json.dumps(msg), now, now))
+        self._bump("enqueued")
+        self.start()
+        # Bangunkan 1 worker lokal, worker proses lain menyusul lewat polling
+        self._tasks[0].wake()
+        return cur.lastrowid
+
+    def start(self):
+        for task in self._tasks:
+            task.start()
+
+    # --------------------------------------------------------------------------
+    # CONSUMER
+    # --------------------------------------------------------------------------
+    def _claim(self):
+        claim_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        now = time.time()
+        stale = now - Config.INBOUND_CLAIM_TIMEOUT
+        with pool.transaction() as conn:
+            conn.execute('''UPDATE inbound_spool SET claimed_by=?, claimed_at=?
+                            WHERE id IN (SELECT id FROM inbound_spool
+                                         WHERE next_attempt_at <= ? AND (claimed_by IS NULL OR claimed_at < ?)
+                                         ORDER BY id LIMIT ?)''',
+                         (claim_id, now, now, stale, self.batch_size))
+            return conn.execute("SELECT id, payload, enqueued_at, attempts FROM inbound_spool WHERE claimed_by=? ORDER BY id",
+                                (claim_id,)).fetchall()
+
+    def drain(self):
+        """Proses batch sampai antrean (yang sudah jatuh tempo) kosong"""
+        while True:
+            batch = self._claim()
+            if not batch:
+                return
+            done, failed = [], []
+            for row_id, payload, enqueued_at, attempts in batch:
+                try:
+                    self.handler(json.loads(payload))
+                    done.append((row_id, enqueued_at))
+                except Exception as e:
+                    print(f"DEBUG: Inbound #{row_id} failed (attempt {attempts + 1}): {e}", flush=True)
+                    failed.append((row_id, attempts + 1, str(e)))
+            self._finish(done, failed)
+
+    def _finish(self, done, failed):
+        now = time.time()
+        with pool.transaction() as conn:
+            conn.executemany("DELETE FROM inbound_spool WHERE id=?", [(row_id,) for row_id, _ in done])
+            for row_id, attempts, error in failed:
+                if attempts >= Config.INBOUND_MAX_ATTEMPTS:
+                    conn.execute('''INSERT INTO inbound_dead (id, payload, enqueued_at, failed_at, attempts, last_error)
+                                    SELECT id, payload, enqueued_at, ?, ?, ? FROM inbound_spool WHERE id=?''',
+                                 (now, attempts, error, row_id))
+                    conn.execute("DELETE FROM inbound_spool WHERE id=?", (row_id,))
+                    self._bump("dead")
+                else:
+                    # Exponential backoff: 2, 4, 8, ... detik (dibatasi)
+                    delay = min(Config.INBOUND_RETRY_BASE * (2 ** (attempts - 1)), Config.INBOUND_RETRY_MAX)
+                    conn.execute('''UPDATE inbound_spool SET attempts=?, next_attempt_at=?, last_error=?,
+                                    claimed_by=NULL, claimed_at=NULL WHERE id=?''',
+                                 (attempts, now + delay, error, row_id))
+                    self._bump("retried")
+
+        with self._lock:
+            for _, enqueued_at in done:
+                latency = (now - enqueued_at) * 1000.0
+                self._stats["processed"] += 1
+                self._stats["latency_ms_last"] = latency
+                self._stats["latency_ms_sum"] += latency
+                self._stats["latency_ms_max"] = max(self._stats["latency_ms_max"], latency)
+
+    # --------------------------------------------------------------------------
+    # DEAD LETTER & STATS
+    # --------------------------------------------------------------------------
+    def requeue_dead(self, ids=None):
+        """Kembalikan dead letter ke spool (semua, atau id tertentu)"""
+        now = time.time()
+        where, args = ("", ()) if not ids else (f"WHERE id IN ({','.join('?' * len(ids))})", tuple(ids))
+        with pool.transaction() as conn:
+            conn.execute(f'''INSERT INTO inbound_spool (payload, enqueued_at, attempts, next_attempt_at)
+                             SELECT payload, enqueued_at, 0, ? FROM inbound_dead {where}''', (now,) + args)
+            moved = conn.execute(f"DELETE FROM inbound_dead {where}", args).rowcount
+        self.start()
+        self._tasks[0].wake()
+        return moved
+
+    def _bump(self, key, n=1):
+        with self._lock:
+            self._stats[key] += n
+
+    def stats(self):
+        depth, oldest = pool.query("SELECT COUNT(*), MIN(enqueued_at) FROM inbound_spool", one=True)
+        dead = pool.query("SELECT COUNT(*) FROM inbound_dead", one=True)[0]
+        with self._lock:
+            snap = dict(self._stats)
+        latency_sum = snap.pop("latency_ms_sum")
+        snap["latency_ms_avg"] = round(latency_sum / snap["processed"], 3) if snap["processed"] else 0.0
+        snap["latency_ms_last"] = round(snap["latency_ms_last"], 3)
+        snap["latency_ms_max"] = round(snap["latency_ms_max"], 3)
+        snap["depth"] = depth
+        snap["oldest_age_s"] = round(time.time() - oldest, 3) if oldest else 0.0
+        snap["dead_letters"] = dead
+        return snap
@@ -12,6 +12,13 @@ let SESSION_TOKEN = null;
 let CURRENT_USER = null;
 let DEVICE_ID = localStorage.getItem("eternals_did");
 
+// Inbox Cache (header saja, body diambil saat dibuka)
+let INBOX_CACHE = [];
+let INBOX_CURSOR = "";
+let INBOX_ETAG = null;
+let INBOX_OWNER = null;
+let INBOX_STREAM = null; // AbortController stream push email baru
+
 // Generate Persistent Device ID (Browser Fingerprint)
 if (!DEVICE_ID) {
     DEVICE_ID = 'dev-' + Math.random().toString(36).substr(2, 9) + Date.now().toString(36);
@@ -25,7 +32,7 @@ const cmdInput = document.getElementById('cmd-input');
 const promptSpan = document.getElementById('prompt');
 
 // App State Machine
-let APP_STATE = "BOOT"; // BOOT, LANDING, INTERVIEW, LOGIN, REGISTER, DASHBOARD
+let APP_STATE = "BOOT"; // BOOT, LANDING, INTERVIEW, LOGIN, REGISTER, DASHBOARD, COMPOSE, SETTINGS
 
 // =============================================================================
 // 2. UTILITY FUNCTIONS (UI)
@@ -285,6 +292,7 @@ function showDashboard(alias) {
     
     // Auto load inbox
     setTimeout(fetchInbox, 500);
+    startInboxStream();
 }
 
 // --- FEATURE 1: INBOX ---
@@ -293,14 +301,21 @@ async function fetchInbox() {
     const old = document.getElementById("mail-list");
     if(old) old.remove();
 
+    // Ganti user = buang cache inbox
+    if (INBOX_OWNER !== CURRENT_USER) {
+        INBOX_CACHE = []; INBOX_CURSOR = ""; INBOX_ETAG = null;
+        INBOX_OWNER = CURRENT_USER;
+    }
+
     print("Fetching encrypted packets...", "log-entry");
     
     try {
         // [IMPORTANT] Pakai Header Authorization
-        const res = await fetch(API_URL + "/inbox", {
-            method: "POST", headers: getAuthHeaders(),
-            body: JSON.stringify({ username: CURRENT_USER })
-        });
+        // Mode headers + cursor: server hanya kirim header email yang lebih baru
+        const headers = getAuthHeaders();
+        if (INBOX_ETAG) headers["If-None-Match"] = INBOX_ETAG;
+        const query = new URLSearchParams({ username: CURRENT_USER, since: INBOX_CURSOR });
+        const res = await fetch(API_URL + "/inbox?" + query, { method: "GET", headers: headers });
         
         // Handle Session Expired
         if (res.status === 401) {
@@ -309,7 +324,15 @@ async function fetchInbox() {
             return;
         }
 
-        const mails = await res.json();
+        // 304 = tidak ada perubahan, pakai cache
+        if (res.status !== 304) {
+            const data = await res.json();
+            const alive = new Set(data.ids);
+            INBOX_CACHE = data.messages.concat(INBOX_CACHE).filter(m => alive.has(m.id));
+            INBOX_CURSOR = data.cursor;
+            INBOX_ETAG = res.headers.get("ETag");
+        }
+        const mails = INBOX_CACHE;
         
         const listContainer = document.createElement("div");
         listContainer.id = "mail-list";
@@ -348,14 +371,76 @@ async function fetchInbox() {
     }
 }
 
-function readMail(mail) {
+// --- INBOX PUSH (SSE) ---
+// Pakai fetch streaming (bukan EventSource) supaya bisa kirim header Authorization
+async function startInboxStream() {
+    if (INBOX_STREAM) return;
+    const ctrl = new AbortController();
+    const owner = CURRENT_USER;
+    INBOX_STREAM = ctrl;
+    let delay = 1000;
+
+    try {
+        const query = new URLSearchParams({ username: owner });
+        const res = await fetch(API_URL + "/inbox/stream?" + query, {
+            method: "GET", headers: getAuthHeaders(), signal: ctrl.signal
+        });
+        // Session habis / bukan pemilik: berhenti, login ulang yang akan membuka stream lagi
+        if (res.status === 401 || res.status === 403) {
+            INBOX_STREAM = null;
+            return;
+        }
+        if (!res.ok) throw new Error("retry-after:" + (res.headers.get("Retry-After") || 15));
+
+        const reader = res.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = "";
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let idx;
+            while ((idx = buffer.indexOf("\n\n")) >= 0) {
+                const block = buffer.slice(0, idx);
+                buffer = buffer.slice(idx + 2);
+                // Refresh list hanya kalau dashboard sedang tampil (cursor + ETag = murah)
+                if (block.split("\n").includes("event: mail") && APP_STATE === "DASHBOARD") {
+                    fetchInbox();
+                }
+            }
+        }
+    } catch (e) {
+        if (ctrl.signal.aborted) return;
+        const wait = String(e.message || "").match(/^retry-after:(\d+)/);
+        delay = wait ? parseInt(wait[1]) * 1000 : 5000;
+    }
+
+    // Stream ditutup server (max age) / error jaringan: sambung lagi
+    if (INBOX_STREAM === ctrl) {
+        INBOX_STREAM = null;
+        if (owner === CURRENT_USER) setTimeout(startInboxStream, delay);
+    }
+}
+
+async function readMail(mail) {
     clearScreen();
     print(":: DECRYPTED MESSAGE ::", "system-msg");
     print(`FROM: ${mail.from}`);
     print(`TIME: ${new Date(mail.time).toLocaleString()}`);
     print(`SUBJ: ${mail.subject}`);
     print("---------------------------------------------------");
-    print(mail.body, "ai-msg"); 
+    
+    // Body baru diambil (dan didekripsi server) saat email dibuka
+    if (mail.body === undefined) {
+        try {
+            const query = new URLSearchParams({ username: CURRENT_USER });
+            const res = await fetch(API_URL + "/inbox/" + encodeURIComponent(mail.id) + "?" + query, {
+                method: "GET", headers: getAuthHeaders()
+            });
+            if (res.ok) mail.body = (await res.json()).body;
+        } catch (e) {}
+    }
+    print(mail.body === undefined ? ">> Packet lost (purged or unreachable)." : mail.body, "ai-msg"); 
     print("---------------------------------------------------");
     
     const btn = document.createElement("button");
@@ -368,6 +453,7 @@ function readMail(mail) {
 // --- FEATURE 2: COMPOSE (SMTP) ---
 function showCompose() {
     clearScreen();
+    APP_STATE = "COMPOSE";
     print(":: SMTP BRIDGE (OUTBOUND) ::", "system-msg");
     print("Note: Uses your own SMTP credentials. We do not log them.", "log-entry");
     
@@ -414,7 +500,7 @@ function showCompose() {
                 print(">> STATUS: DELIVERY CONFIRMED.", "system-msg");
                 setTimeout(() => showDashboard(CURRENT_USER), 2000);
             } else {
-                print(">> ERROR: " + data.error, "error-msg");
+                print(">> ERROR: " + (data.error || data.status), "error-msg");
                 btn.disabled = false;
                 btn.innerText = "RETRY";
             }
@@ -428,6 +514,7 @@ function showCompose() {
 // --- FEATURE 3: SETTINGS (WEBHOOK) ---
 function showSettings() {
     clearScreen();
+    APP_STATE = "SETTINGS";
     print(":: NODE CONFIGURATION ::", "system-msg");
     print("Configure Auto-Forwarding Webhook (JSON POST).");
     
@@ -0,0 +1,86 @@
+# app/sweeper.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: BACKGROUND EXPIRY SWEEPER (SESSIONS, RATELIMIT, AUDIT LOG, DLL)
+#
+# Hapus row basi dalam batch kecil (transaksi pendek, writer lain tidak lama
+# menunggu), lalu kembalikan halaman kosong ke OS dengan incremental_vacuum.
+# Hanya 1 worker gunicorn yang menyapu (leader lock).
+
+import time
+import threading
+from config import Config
+from app.database import pool
+from app.background import PeriodicTask
+
+_last_report = {}
+_totals = {"runs": 0, "rows_deleted": 0, "pages_reclaimed": 0}
+_lock = threading.Lock()
+
+
+def _targets(now):
+    """(nama, tabel, kondisi WHERE, args) - semua kolom kondisi sudah ber-index"""
+    return [
+        ("sessions", "sessions", "expires_at < ?", (now,)),
+        ("ratelimit", "ratelimit", "window_start < ?", (now - Config.SWEEP_RATELIMIT_STALE,)),
+        ("audit_log", "audit_log", "timestamp < ?", (now - Config.AUDIT_RETENTION_DAYS * 86400,)),
+        ("revoked_tokens", "revoked_tokens", "expires_at < ?", (now,)),
+        ("deliveries", "deliveries", "status='DELIVERED' AND updated_at < ?", (now - Config.SWEEP_DELIVERIES_AFTER,)),
+        ("smtp_jobs", "smtp_jobs", "updated_at < ?", (now - Config.SMTP_JOB_RETENTION,)),
+        ("login_penalty", "login_penalty", "updated_at < ?", (now - Config.LOGIN_PENALTY_RESET,)),
+    ]
+
+
+def _delete_batched(table, where, args):
+    deleted = 0
+    while True:
+        cur = pool.execute(f"DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)",
+                           args + (Config.SWEEP_BATCH_SIZE,))
+        deleted += cur.rowcount
+        if cur.rowcount < Config.SWEEP_BATCH_SIZE:
+            return deleted
+        # Jeda singkat antar batch: beri kesempatan writer lain ambil lock
+        time.sleep(Config.SWEEP_BATCH_PAUSE)
+
+
+def sweep():
+    started = time.time()
+    report = {"deleted": {}}
+    for name, table, where, args in _targets(started):
+        report["deleted"][name] = _delete_batched(table, where, args)
+
+    page_size = pool.query("PRAGMA page_size", one=True)[0]
+    free_before = pool.query("PRAGMA freelist_count", one=True)[0]
+    # executescript: sqlite3 biasa hanya menjalankan 1 step (= 1 halaman) untuk pragma ini
+    pool.connection().executescript(f"PRAGMA incremental_vacuum({int(Config.SWEEP_VACUUM_PAGES)});")
+    free_after = pool.query("PRAGMA freelist_count", one=True)[0]
+
+    reclaimed = max(0, free_before - free_after)
+    report["pages_reclaimed"] = reclaimed
+    report["bytes_reclaimed"] = reclaimed * page_size
+    report["free_pages_left"] = free_after
+    report["duration_ms"] = round((time.time() - started) * 1000.0, 3)
+    report["at"] = started
+
+    total_rows = sum(report["deleted"].values())
+    with _lock:
+        _last_report.clear()
+        _last_report.update(report)
+        _totals["runs"] += 1
+        _totals["rows_deleted"] += total_rows
+        _totals["pages_reclaimed"] += reclaimed
+    if total_rows or reclaimed:
+        print(f"🧹 Sweeper: {total_rows} rows deleted, {report['bytes_reclaimed']} bytes reclaimed", flush=True)
+    return report
+
+
+sweeper = PeriodicTask("expiry-sweeper", Config.SWEEP_INTERVAL, sweep, leader_lock=f"{Config.DB_FILE}.sweeper.lock")
+
+
+def start_sweeper():
+    if Config.SWEEP_INTERVAL > 0:
+        sweeper.start()
+
+
+def stats():
+    with _lock:
+        return {"totals": dict(_totals), "last": dict(_last_report)}
@@ -0,0 +1,144 @@
+# app/tokens.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: STATELESS SIGNED SESSION TOKENS + REVOCATION SET
+#
+# Format: v1.<base64url(json claims)>.<base64url(hmac-sha256)>
+# Validasi cukup HMAC di CPU. Token yang dicabut (logout / register) masuk ke
+# tabel revoked_tokens; tiap worker menyimpan salinan ringkas berupa Bloom filter
+# yang disinkron berkala, jadi hot path tidak menyentuh SQLite.
+
+import os
+import json
+import hmac
+import time
+import base64
+import hashlib
+import threading
+from config import Config
+from app.database import pool
+from app.background import PeriodicTask
+
+TOKEN_PREFIX = "v1."
+
+# Key turunan, supaya HMAC token tidak bisa ditukar dengan HMAC lain (device hash, signature)
+_TOKEN_KEY = hmac.new(Config.SECRET_KEY.encode(), b"dface-session-token-v1", hashlib.sha256).digest()
+
+
+def _b64e(raw):
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+def _b64d(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+def is_signed_token(token):
+    return isinstance(token, str) and token.startswith(TOKEN_PREFIX)
+
+def issue_token(dev_id, sess_type, status, ttl, **extra):
+    """Buat token bertanda tangan. Claims: jti, dev, typ, st, iat, exp (+ extra)."""
+    now = time.time()
+    claims = {"jti": os.urandom(12).hex(), "dev": dev_id, "typ": sess_type,
+              "st": status, "iat": now, "exp": now + ttl}
+    claims.update(extra)
+    body = _b64e(json.dumps(claims, separators=(",", ":")).encode())
+    sig = _b64e(hmac.new(_TOKEN_KEY, body.encode(), hashlib.sha256).digest())
+    return f"{TOKEN_PREFIX}{body}.{sig}", claims
+
+def verify_token(token):
+    """Return claims kalau signature valid (expiry dicek oleh pemanggil), selain itu None."""
+    if not is_signed_token(token):
+        return None
+    try:
+        body, sig = token[len(TOKEN_PREFIX):].split(".")
+        expected = hmac.new(_TOKEN_KEY, body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64d(sig)):
+            return None
+        return json.loads(_b64d(body))
+    except Exception:
+        return None
+
+
+# ==============================================================================
+# REVOCATION SET (Bloom filter per worker, SQLite sebagai sumber kebenaran)
+# ==============================================================================
+class RevocationSet:
+
+    def __init__(self, bits, hashes, sync_interval):
+        self.bits = bits
+        self.hashes = hashes
+        self._bloom = bytearray(bits // 8)
+        self._last_rowid = 0
+        self._count = 0
+        self._primed_pid = None
+        self._lock = threading.Lock()
+        self._sync = PeriodicTask("revocation-sync", sync_interval, self.sync)
+        self._stats = {"checks": 0, "bloom_hits": 0, "confirmed": 0, "synced": 0}
+
+    def _positions(self, jti):
+        digest = hashlib.blake2b(jti.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def _set_bits(self, jti):
+        for pos in self._positions(jti):
+            self._bloom[pos >> 3] |= 1 << (pos & 7)
+
+    def _maybe_contains(self, jti):
+        return all(self._bloom[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(jti))
+
+    def sync(self):
+        """Tarik pencabutan baru (dari worker lain) sejak rowid terakhir."""
+        rows = pool.query("SELECT rowid, jti FROM revoked_tokens WHERE rowid > ? ORDER BY rowid", (self._last_rowid,))
+        with self._lock:
+            # Dihitung per rowid di sini saja (revoke() lokal hanya set bit), jadi tidak dobel
+            for rowid, jti in rows:
+                self._set_bits(jti)
+                self._last_rowid = rowid
+            self._count += len(rows)
+            self._stats["synced"] += len(rows)
+            # Terlalu penuh -> false positive naik, bangun ulang dari entri yang masih hidup
+            if self._count > Config.REVOCATION_BLOOM_CAPACITY:
+                self._rebuild()
+
+    def _rebuild(self):
+        live = pool.query("SELECT rowid, jti FROM revoked_tokens WHERE expires_at > ?", (time.time(),))
+        self._bloom = bytearray(self.bits // 8)
+        self._count = len(live)
+        for rowid, jti in live:
+            self._set_bits(jti)
+            self._last_rowid = max(self._last_rowid, rowid)
+
+    def revoke(self, jti, expires_at):
+        pool.execute("INSERT OR IGNORE INTO revoked_tokens (jti, expires_at) VALUES (?, ?)", (jti, expires_at))
+        # Langsung berlaku di worker ini; entri dihitung saat sync() menarik rowid-nya
+        with self._lock:
+            self._set_bits(jti)
+
+    def _ensure_primed(self):
+        # Worker baru: sinkron penuh sekali, selanjutnya periodik di background
+        if self._primed_pid != os.getpid():
+            self._primed_pid = os.getpid()
+            self.sync()
+            self._sync.start()
+
+    def is_revoked(self, jti):
+        self._ensure_primed()
+        self._stats["checks"] += 1
+        with self._lock:
+            if not self._maybe_contains(jti):
+                return False
+        # Bloom bilang "mungkin" -> konfirmasi exact (jarang terjadi)
+        self._stats["bloom_hits"] += 1
+        row = pool.query("SELECT 1 FROM revoked_tokens WHERE jti=?", (jti,), one=True)
+        if row:
+            self._stats["confirmed"] += 1
+        return bool(row)
+
+    def stats(self):
+        snap = dict(self._stats)
+        snap["entries"] = self._count
+        return snap
+
+
+revocations = RevocationSet(Config.REVOCATION_BLOOM_BITS, Config.REVOCATION_BLOOM_HASHES,
+                            Config.REVOCATION_SYNC_INTERVAL)
@@ -1,31 +1,62 @@
 import time
 import hmac
 import hashlib
-import sqlite3
-import socket
 import datetime
 import re
 from functools import wraps
-from urllib.parse import urlparse
 from flask import request, jsonify, g
-from cryptography.fernet import Fernet
 from config import Config
-
-cipher_suite = Fernet(Config.ENCRYPTION_KEY.encode())
+from app.database import pool
+from app.ratelimit import limiter
+from app.audit import audit_writer
+from app.tokens import is_signed_token, verify_token, revocations
+from app.resolver import resolver, SAFE
+from app.metrics import timed
+from app.envelope import envelope, cipher_suite
 
 # ==============================================================================
 # DATABASE HELPERS
 # ==============================================================================
+# Koneksi dikelola oleh app.database (1 koneksi per thread, pragma sekali jalan)
 def db_exec(query, args=()):
-    with sqlite3.connect(Config.DB_FILE) as conn:
-        conn.execute(query, args)
-        conn.commit()
+    pool.execute(query, args)
 
 def db_query(query, args=(), one=False):
-    with sqlite3.connect(Config.DB_FILE) as conn:
-        cur = conn.execute(query, args)
-        rv = cur.fetchall()
-        return (rv[0] if rv else None) if one else rv
+    return pool.query(query, args, one=one)
+
+def db_transaction():
+    """Context manager: beberapa statement dalam 1 transaksi (BEGIN IMMEDIATE)"""
+    return pool.transaction()
+
+# ==============================================================================
+# SESSION STORE (Opaque token di SQLite / Signed token tanpa DB)
+# ==============================================================================
+SESSION_FIELDS = ("device_id", "status", "type", "created_at", "expires_at",
+                  "username", "device_hash", "mailbox_id")
+
+def load_session(token):
+    """Return dict session atau None. Signed token: cukup HMAC + revocation set."""
+    if not token:
+        return None
+    if is_signed_token(token):
+        claims = verify_token(token)
+        if not claims or revocations.is_revoked(claims["jti"]):
+            return None
+        return {"device_id": claims["dev"], "status": claims["st"], "type": claims["typ"],
+                "created_at": claims["iat"], "expires_at": claims["exp"], "jti": claims["jti"],
+                "username": claims.get("usr"), "device_hash": claims.get("dvh"), "mailbox_id": claims.get("mbx")}
+    
+    row = db_query(f"SELECT {', '.join(SESSION_FIELDS)} FROM sessions WHERE token=?", (token,), one=True)
+    return dict(zip(SESSION_FIELDS, row)) if row else None
+
+def revoke_session(token):
+    """Cabut session: opaque -> DELETE row, signed -> masuk revocation set"""
+    if is_signed_token(token):
+        claims = verify_token(token)
+        if claims:
+            revocations.revoke(claims["jti"], claims["exp"])
+    else:
+        db_exec("DELETE FROM sessions WHERE token=?", (token,))
 
 # ==============================================================================
 # [FIX 1, 2, 3, 5] THE AUTH DECORATOR (MANDATORY FOR SENSITIVE ROUTES)
@@ -40,60 +71,127 @@ def require_auth(f):
         
         token = auth_header.split(" ")[1]
         
-        # 2. Cek Token di Database + Cek Expiry (TTL)
-        session = db_query("SELECT device_id, type, expires_at, status FROM sessions WHERE token=?", (token,), one=True)
+        # 2. Cek Token (SQLite / Signature) + Cek Expiry (TTL)
+        session = load_session(token)
         
         if not session:
             return jsonify({"error": "Unauthorized: Invalid Token"}), 401
         
-        dev_id, sess_type, expires_at, status = session
+        dev_id = session["device_id"]
         
         # 3. Cek Status & Tipe
-        if status != "LOGGED_IN" or sess_type != "LOGIN":
+        if session["status"] != "LOGGED_IN" or session["type"] != "LOGIN":
             return jsonify({"error": "Unauthorized: Bad Session Type"}), 403
             
-        # 4. Cek Expiry (Auto Revoke)
-        if time.time() > expires_at:
-            db_exec("DELETE FROM sessions WHERE token=?", (token,))
+        # 4. Cek Expiry (Auto Revoke, signed token cukup ditolak)
+        if time.time() > session["expires_at"]:
+            if not is_signed_token(token):
+                db_exec("DELETE FROM sessions WHERE token=?", (token,))
             return jsonify({"error": "Session Expired. Please Login Again."}), 401
             
         # 5. Simpan info user di global context 'g' biar bisa dipake di route
-        # Kita butuh username. Username biasanya tersimpan di Firebase, 
-        # tapi untuk efisiensi kita bisa simpan username di tabel session SQLite juga ke depannya.
-        # Untuk sekarang, kita asumsi username dikirim di body, TAPI kita validasi apakah token ini milik username tsb.
-        # (Nanti di routes_auth.py kita perbaiki mapping token->username).
+        # Username, device hash & mailbox_id di-bind saat login, jadi route tidak perlu
+        # bolak-balik ke Firebase. Session lama (sebelum migrasi) isinya None.
         
         g.session_token = token
         g.device_id = dev_id
+        g.username = session["username"]
+        g.device_hash = session["device_hash"]
+        g.mailbox_id = session["mailbox_id"]
         
         return f(*args, **kwargs)
     return decorated_function
 
 # ==============================================================================
-# [FIX 6] RATE LIMITER (TOKEN BUCKET ALGORITHM)
+# ADMIN GUARD (Internal Ops Endpoints)
+# ==============================================================================
+def require_admin(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Kalau ADMIN_KEY tidak di-set, endpoint admin dianggap tidak ada
+        if not Config.ADMIN_KEY:
+            return jsonify({"error": "Not Found"}), 404
+        
+        supplied = request.headers.get('X-Admin-Key', '')
+        if not hmac.compare_digest(supplied.encode(), Config.ADMIN_KEY.encode()):
+            log_audit("HACK", "Bad Admin Key", request)
+            return jsonify({"error": "Forbidden"}), 403
+        
+        return f(*args, **kwargs)
+    return decorated_function
+
+# ==============================================================================
+# INBOUND GUARD (Provider email, endpoint bulk)
+# ==============================================================================
+def require_inbound_secret(f):
+    """Shared secret provider email: header X-Inbound-Secret atau Authorization: Bearer"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        # Sama seperti admin: tanpa INBOUND_SECRET endpoint dianggap tidak ada
+        if not Config.INBOUND_SECRET:
+            return jsonify({"error": "Not Found"}), 404
+
+        supplied = request.headers.get('X-Inbound-Secret', '')
+        auth = request.headers.get('Authorization', '')
+        if not supplied and auth.startswith('Bearer '):
+            supplied = auth[7:]
+        if not hmac.compare_digest(supplied.encode(), Config.INBOUND_SECRET.encode()):
+            log_audit("HACK", "Bad Inbound Secret", request)
+            return jsonify({"error": "Forbidden"}), 403
+
+        return f(*args, **kwargs)
+    return decorated_function
+
+# ==============================================================================
+# [FIX 6] RATE LIMITER (SLIDING WINDOW, PER ROUTE)
 # ==============================================================================
-def rate_limit(limit=10, window=60):
+# Backend default: shared-memory (app.ratelimit), key = (route, client_hash).
+# Backend "sqlite" = perilaku lama (1 counter per IP di tabel ratelimit).
+def _sqlite_hit(ip_hash, limit, window, cost=1):
+    now = time.time()
+    # Read-then-update dalam 1 transaksi (tidak ada race antar worker)
+    with db_transaction():
+        row = db_query("SELECT hits, window_start FROM ratelimit WHERE client_hash=?", (ip_hash,), one=True)
+        
+        if row:
+            hits, start = row
+            if now - start > window:
+                # Reset window
+                if cost > limit:
+                    return False, f"Exceeded {limit}/{window}s"
+                db_exec("UPDATE ratelimit SET hits=?, window_start=? WHERE client_hash=?", (cost, now, ip_hash))
+            elif hits + cost > limit:
+                return False, f"Exceeded {limit}/{window}s"
+            else:
+                db_exec("UPDATE ratelimit SET hits=hits+? WHERE client_hash=?", (cost, ip_hash))
+        elif cost > limit:
+            return False, f"Exceeded {limit}/{window}s"
+        else:
+            db_exec("INSERT INTO ratelimit VALUES (?, ?, ?)", (ip_hash, cost, now))
+    return True, None
+
+def rate_limit(limit=10, window=60, cost=None):
+    """cost: opsional fungsi(request) -> jumlah unit yang dihitung (default 1 per request, 0 = tidak dihitung)"""
     def decorator(f):
+        route = f.__name__
+        
         @wraps(f)
         def wrapped(*args, **kwargs):
             ip_hash = get_anon_ip(request)
-            now = time.time()
+            units = cost(request) if cost else 1
+            if units <= 0:
+                return f(*args, **kwargs)
             
-            # Cek db
-            row = db_query("SELECT hits, window_start FROM ratelimit WHERE client_hash=?", (ip_hash,), one=True)
-            
-            if row:
-                hits, start = row
-                if now - start > window:
-                    # Reset window
-                    db_exec("UPDATE ratelimit SET hits=1, window_start=? WHERE client_hash=?", (now, ip_hash))
-                else:
-                    if hits >= limit:
-                        log_audit("RATE_LIMIT", f"Exceeded {limit}/{window}s", request)
-                        return jsonify({"error": "Too Many Requests. Chill."}), 429
-                    db_exec("UPDATE ratelimit SET hits=hits+1 WHERE client_hash=?", (ip_hash,))
+            if Config.RATE_LIMIT_BACKEND == "sqlite":
+                allowed, note = _sqlite_hit(ip_hash, limit, window, units)
             else:
-                db_exec("INSERT INTO ratelimit VALUES (?, 1, ?)", (ip_hash, now))
+                allowed, note = limiter.hit(route, ip_hash, limit, window, units)
+            
+            # Audit hanya saat ada catatan (penolakan pertama / ringkasan), bukan tiap 429
+            if note:
+                log_audit("RATE_LIMIT", f"{route}: {note}", request)
+            if not allowed:
+                return jsonify({"error": "Too Many Requests. Chill."}), 429
             
             return f(*args, **kwargs)
         return wrapped
@@ -103,40 +201,38 @@ def rate_limit(limit=10, window=60):
 # [FIX 7] SSRF PROTECTION (DNS REBINDING PROOF)
 # ==============================================================================
 def is_safe_url(url):
-    try:
-        parsed = urlparse(url)
-        if parsed.scheme not in ('http', 'https'): return False
-        if not parsed.hostname: return False
-        
-        # Resolve IP
-        ip = socket.gethostbyname(parsed.hostname)
-        
-        # BLOKIR PRIVATE RANGES (CIDR check manual simple)
-        # 127.0.0.0/8, 10.0.0.0/8, 172.16.0.0/12, 192.168.0.0/16
-        if ip.startswith("127."): return False
-        if ip.startswith("10."): return False
-        if ip.startswith("192.168."): return False
-        if ip.startswith("0."): return False
-        
-        # Cek range 172.16 - 172.31
-        if ip.startswith("172."):
-            second_octet = int(ip.split('.')[1])
-            if 16 <= second_octet <= 31: return False
-            
-        return True
-    except:
-        return False
+    # Resolve SEMUA record A/AAAA (cached) lalu cek ke tabel network terlarang
+    # (private, loopback, link-local, CGNAT, IPv6 ULA, dll) -> lihat app.resolver
+    verdict, _ = resolver.check_url(url)
+    return verdict == SAFE
 
 # ==============================================================================
 # CRYPTO & LOGGING UTILS
 # ==============================================================================
 def encrypt_content(text):
     if not text: return ""
-    return cipher_suite.encrypt(text.encode()).decode()
+    # Default envelope v2 (kompres + AES-GCM, lihat app/envelope.py), "fernet" = format lama
+    if Config.ENVELOPE_FORMAT == "fernet":
+        with timed("fernet", "encrypt"):
+            return cipher_suite.encrypt(text.encode()).decode()
+    with timed("envelope", "encrypt"):
+        return envelope.seal(text.encode())
+
+def to_fernet(enc_text):
+    """Token konten (v2 / Fernet) -> Fernet. Untuk webhook user: penerima hanya punya Fernet key."""
+    if not enc_text or not enc_text.startswith("E2."):
+        return enc_text
+    with timed("envelope", "decrypt"):
+        data = envelope.open(enc_text)
+    with timed("fernet", "encrypt"):
+        return cipher_suite.encrypt(data).decode()
 
 def decrypt_content(enc_text):
     if not enc_text: return ""
-    try: return cipher_suite.decrypt(enc_text.encode()).decode()
+    try:
+        # Record Fernet lama dikenali otomatis (tanpa prefix "E2.")
+        with timed("envelope", "decrypt"):
+            return envelope.open(enc_text).decode()
     except: return "[CORRUPT DATA]"
 
 def get_anon_ip(req):
@@ -151,5 +247,9 @@ def hash_device(device_id):
 
 def log_audit(event, detail, req):
     anon_ip = get_anon_ip(req)
-    db_exec("INSERT INTO audit_log (timestamp, event, detail, anon_ip) VALUES (?, ?, ?, ?)",
-            (time.time(), event, detail, anon_ip))
+    row = (time.time(), event, detail, anon_ip)
+    # Default: masuk buffer, ditulis batch oleh app.audit (tidak menahan request)
+    if Config.AUDIT_BUFFERED:
+        audit_writer.write(row)
+    else:
+        db_exec("INSERT INTO audit_log (timestamp, event, detail, anon_ip) VALUES (?, ?, ?, ?)", row)
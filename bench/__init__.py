@@ -0,0 +1,3 @@
+# bench/__init__.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: LOAD BENCHMARK SUITE (jalankan: python -m bench.run --help)
@@ -0,0 +1,109 @@
+# bench/coldstart.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: COLD START BENCHMARK (SPAWN -> READY -> REQUEST PERTAMA)
+#
+# Contoh:
+#   python -m bench.coldstart                          # lazy vs eager, 5 ronde
+#   python -m bench.coldstart --rounds 10 --firebase-latency 0.05
+#
+# Tiap ronde gunicorn di-start ulang (1 worker) terhadap stub yang sama, lalu diukur:
+# - ready_ms: spawn sampai GET / pertama 200 (worker siap menerima request)
+# - first_login_ms: latency POST /api/login pertama (butuh Firebase + hashing)
+# - boot: angka dari worker sendiri (import, create_app, warm, request pertama)
+
+import os
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime, timezone
+import requests
+from bench.run import BenchEnvironment, parse_args as parse_bench_args, git_info, fresh_ip, PASSWORD, REPO
+
+VARIANTS = {
+    "lazy": ["LAZY_INIT=1", "WARM_ON_FORK=1"],
+    "lazy_nowarm": ["LAZY_INIT=1", "WARM_ON_FORK=0"],
+    "eager": ["LAZY_INIT=0", "WARM_ON_FORK=0"],
+}
+
+
+def wait_ready(env, timeout):
+    started = time.perf_counter()
+    deadline = started + timeout
+    while time.perf_counter() < deadline:
+        if env.proc.poll() is not None:
+            break
+        try:
+            if requests.get(env.base_url + "/", timeout=1).status_code == 200:
+                return (time.perf_counter() - started) * 1000.0
+        except requests.RequestException:
+            pass
+        time.sleep(0.01)
+    raise SystemExit("gunicorn did not become ready")
+
+
+def one_round(env, boot_timeout):
+    spawned = time.perf_counter()
+    env.spawn_server()
+    try:
+        wait_ready(env, boot_timeout)
+        ready_ms = (time.perf_counter() - spawned) * 1000.0
+        started = time.perf_counter()
+        res = requests.post(env.base_url + "/api/login", headers={"X-Forwarded-For": fresh_ip()},
+                            json={"username": "bench0", "password": PASSWORD, "device_id": "device-0"}, timeout=30)
+        first_login_ms = (time.perf_counter() - started) * 1000.0
+        stats = env.admin_stats() or {}
+        return {"ready_ms": round(ready_ms, 3), "first_login_ms": round(first_login_ms, 3),
+                "first_login_status": res.status_code, "boot": stats.get("container", {}).get("boot", {})}
+    finally:
+        env.stop_server()
+
+
+def summarize(rounds):
+    out = {}
+    for key in ("ready_ms", "first_login_ms"):
+        values = [r[key] for r in rounds]
+        out[key] = {"median": round(statistics.median(values), 3), "min": round(min(values), 3), "max": round(max(values), 3)}
+    phases = sorted({p for r in rounds for p in r["boot"]})
+    out["boot_median"] = {p: round(statistics.median([r["boot"][p] for r in rounds if p in r["boot"]]), 3) for p in phases}
+    return out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Cold start benchmark (lazy vs eager dependency init)")
+    p.add_argument("--variants", default=",".join(VARIANTS), help="comma separated: " + ",".join(VARIANTS))
+    p.add_argument("--rounds", type=int, default=5)
+    p.add_argument("--firebase-latency", type=float, default=0.01)
+    p.add_argument("--out", help="result JSON path (default bench/results/coldstart-<time>-<commit>.json)")
+    args = p.parse_args(argv)
+
+    bench_args = parse_bench_args(["--workers", "1", "--threads", "4",
+                                   "--firebase-latency", str(args.firebase_latency)])
+    env = BenchEnvironment(bench_args)
+    report = {"meta": {"started_at": datetime.now(timezone.utc).isoformat(), "git": git_info(),
+                       "params": vars(args)}, "variants": {}}
+    try:
+        env.seed(1, 1)
+        for name in [v.strip() for v in args.variants.split(",") if v.strip()]:
+            env.args.env = VARIANTS[name]
+            rounds = [one_round(env, bench_args.boot_timeout) for _ in range(args.rounds)]
+            summary = summarize(rounds)
+            report["variants"][name] = {"summary": summary, "rounds": rounds}
+            print(f"▶ {name:<12} ready {summary['ready_ms']['median']} ms  "
+                  f"first login {summary['first_login_ms']['median']} ms  boot {summary['boot_median']}", flush=True)
+    finally:
+        env.stop()
+
+    out = args.out
+    if not out:
+        commit = (report["meta"]["git"].get("commit") or "nogit")[:10]
+        out = os.path.join(REPO, "bench", "results", f"coldstart-{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"✅ Results: {out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# bench/compare.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: BANDINGKAN 2 HASIL BENCHMARK (REGRESSION CHECK)
+#
+#   python -m bench.compare base.json candidate.json [--threshold 0.10]
+# Exit code 1 kalau throughput turun / p95 naik lebih dari threshold.
+
+import sys
+import json
+import argparse
+
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def delta(old, new):
+    if not old or new is None:
+        return None
+    return (new - old) / old
+
+
+def fmt(value):
+    return "   n/a" if value is None else f"{value * 100:+6.1f}%"
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Compare two bench result files")
+    p.add_argument("base")
+    p.add_argument("candidate")
+    p.add_argument("--threshold", type=float, default=0.10, help="allowed relative regression (default 0.10)")
+    args = p.parse_args(argv)
+
+    base, cand = load(args.base), load(args.candidate)
+    print(f"base:      {base['meta']['git'].get('commit')}  {base['meta']['git'].get('subject')}")
+    print(f"candidate: {cand['meta']['git'].get('commit')}  {cand['meta']['git'].get('subject')}")
+    print(f"{'scenario':<18}{'req/s':>10}{'Δ':>9}{'p50':>10}{'Δ':>9}{'p95':>10}{'Δ':>9}{'p99':>10}{'Δ':>9}")
+
+    regressions = []
+    for name in sorted(set(base["scenarios"]) & set(cand["scenarios"])):
+        b, c = base["scenarios"][name], cand["scenarios"][name]
+        d_rps = delta(b["throughput_rps"], c["throughput_rps"])
+        d = {k: delta(b["latency_ms"][k], c["latency_ms"][k]) for k in ("p50", "p95", "p99")}
+        print(f"{name:<18}{c['throughput_rps']:>10}{fmt(d_rps):>9}"
+              + "".join(f"{str(c['latency_ms'][k]):>10}{fmt(d[k]):>9}" for k in ("p50", "p95", "p99")))
+        if (d_rps is not None and d_rps < -args.threshold) or (d["p95"] is not None and d["p95"] > args.threshold):
+            regressions.append(name)
+
+    if regressions:
+        print(f"❌ Regression beyond {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("✅ No regression beyond threshold")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
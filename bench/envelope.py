@@ -0,0 +1,84 @@
+# bench/envelope.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: MICRO-BENCHMARK ENKRIPSI KONTEN (FERNET VS ENVELOPE V2)
+#
+# Contoh:
+#   python -m bench.envelope
+#   python -m bench.envelope --seconds 2 --out /tmp/envelope.json
+#
+# Tanpa server / Firebase: langsung memanggil Fernet dan app.envelope.Envelope
+# dengan payload contoh (subject, body teks, body HTML newsletter). Diukur ukuran
+# string yang disimpan ke Vault dan ops/detik untuk enkripsi & dekripsi.
+
+import os
+import json
+import time
+import argparse
+import platform
+from cryptography.fernet import Fernet
+from app.envelope import Envelope, derive_key, zstandard
+
+SAMPLES = {
+    "subject": "Your verification code is 481920".encode(),
+    "body_text": ("Hi there,\n\nThanks for signing up. Please confirm your address by clicking "
+                  "the link below. If you did not request this, ignore this email.\n\n"
+                  "https://example.com/confirm?token=" + os.urandom(16).hex() + "\n\n"
+                  "Regards,\nThe Team\n").encode() * 4,
+    "body_html": ("<table width='100%' cellpadding='0' cellspacing='0' style='font-family:Arial,sans-serif'>"
+                  + "".join(f"<tr><td style='padding:12px;border-bottom:1px solid #eee'><a href='https://shop.example.com/p/{i}'>"
+                            f"Product {i}</a><br><span style='color:#888'>Limited offer, only today</span></td></tr>"
+                            for i in range(120))
+                  + "</table>").encode(),
+}
+
+
+def ops_per_sec(fn, arg, seconds):
+    done, started = 0, time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for _ in range(50):
+            fn(arg)
+        done += 50
+    return round(done / (time.perf_counter() - started), 1)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description="Fernet vs envelope v2 (size + ops/sec)")
+    p.add_argument("--seconds", type=float, default=1.0, help="measured seconds per format/sample/operation")
+    p.add_argument("--out", help="optional result JSON path")
+    args = p.parse_args(argv)
+
+    secret = Fernet.generate_key().decode()
+    fernet = Fernet(secret.encode())
+    formats = {
+        "fernet": (lambda data: fernet.encrypt(data).decode(), lambda token: fernet.decrypt(token.encode())),
+    }
+    for compression in ("none", "zlib") + (("zstd",) if zstandard is not None else ()):
+        env = Envelope({1: derive_key(secret, 1)}, 1, legacy=fernet, compression=compression)
+        formats[f"v2_{compression}"] = (env.seal, env.open)
+
+    report = {"meta": {"python": platform.python_version(), "platform": platform.platform(),
+                       "seconds": args.seconds}, "samples": {}}
+    for sample, data in SAMPLES.items():
+        rows = {}
+        print(f"▶ {sample} ({len(data)} bytes plaintext)")
+        for name, (seal, open_) in formats.items():
+            token = seal(data)
+            assert open_(token) == data
+            rows[name] = {"stored_bytes": len(token), "ratio": round(len(token) / len(data), 3),
+                          "encrypt_ops": ops_per_sec(seal, data, args.seconds),
+                          "decrypt_ops": ops_per_sec(open_, token, args.seconds)}
+            r = rows[name]
+            print(f"  {name:<10} {r['stored_bytes']:>7} B  x{r['ratio']:<6} "
+                  f"enc {r['encrypt_ops']:>10}/s  dec {r['decrypt_ops']:>10}/s", flush=True)
+        report["samples"][sample] = {"plain_bytes": len(data), "formats": rows}
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"✅ Results: {args.out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
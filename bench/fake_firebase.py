@@ -0,0 +1,300 @@
+# bench/fake_firebase.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: IN-MEMORY FIREBASE REALTIME DATABASE (UNTUK BENCHMARK)
+#
+# FakeDatabase = pohon JSON di memori dengan semantik RTDB yang dipakai app
+# (set / update multi-path / delete / push / shallow get / order_by_key query).
+# Dua cara pakai:
+# - FakeReference: pengganti langsung db.reference('/') di proses yang sama
+# - FakeRTDBServer: REST API ala emulator RTDB, supaya SEMUA worker gunicorn
+#   melihat data yang sama (app cukup diberi FIREBASE_*_URL = http://host:port/?ns=...)
+
+import json
+import copy
+import time
+import random
+import string
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler
+from bench.stubs import QuietHTTPServer
+
+PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+
+
+def _split(path):
+    return tuple(p for p in path.strip('/').split('/') if p)
+
+
+def _resolve_server_values(value):
+    if isinstance(value, dict):
+        if value == {".sv": "timestamp"}:
+            return int(time.time() * 1000)
+        return {k: _resolve_server_values(v) for k, v in value.items()}
+    return value
+
+
+def _prune(value):
+    """RTDB tidak menyimpan null / object kosong"""
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        pruned = {k: v for k, v in pruned.items() if v is not None}
+        return pruned or None
+    return value
+
+
+class FakeDatabase:
+
+    def __init__(self, latency=0.0):
+        self.latency = latency # Detik per operasi (simulasi round trip jaringan)
+        self.root = {}
+        self.ops = 0
+        self._lock = threading.Lock()
+
+    def _delay(self):
+        self.ops += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _parent(self, parts, create):
+        node = self.root
+        for p in parts[:-1]:
+            child = node.get(p)
+            if not isinstance(child, dict):
+                if not create:
+                    return None
+                child = node[p] = {}
+            node = child
+        return node
+
+    def _get_node(self, parts):
+        if not parts:
+            return self.root
+        parent = self._parent(parts, create=False)
+        return parent.get(parts[-1]) if parent else None
+
+    def _set_node(self, parts, value):
+        value = _prune(_resolve_server_values(copy.deepcopy(value)))
+        if not parts:
+            self.root = value or {}
+            return
+        if value is None:
+            parent = self._parent(parts, create=False)
+            if parent is not None:
+                parent.pop(parts[-1], None)
+            return
+        self._parent(parts, create=True)[parts[-1]] = value
+
+    # --------------------------------------------------------------------------
+    # OPERASI (path = string "a/b/c")
+    # --------------------------------------------------------------------------
+    def get(self, path, shallow=False, order_by_key=False, start_at=None, limit_to_last=None):
+        self._delay()
+        with self._lock:
+            node = self._get_node(_split(path))
+            if shallow and isinstance(node, dict):
+                return {k: True for k in node}
+            if order_by_key and isinstance(node, dict):
+                keys = sorted(node)
+                if start_at is not None:
+                    keys = [k for k in keys if k >= start_at]
+                if limit_to_last is not None:
+                    keys = keys[-limit_to_last:]
+                return copy.deepcopy({k: node[k] for k in keys})
+            return copy.deepcopy(node)
+
+    def set(self, path, value):
+        self._delay()
+        with self._lock:
+            self._set_node(_split(path), value)
+
+    def update(self, path, values):
+        self._delay()
+        base = _split(path)
+        with self._lock:
+            for sub, value in values.items():
+                self._set_node(base + _split(sub), value)
+
+    def delete(self, path):
+        self.set(path, None)
+
+    def push(self, path, value):
+        key = push_id()
+        self.set(f"{path}/{key}", value)
+        return key
+
+
+def push_id():
+    now = int(time.time() * 1000)
+    ts = ""
+    for _ in range(8):
+        ts = PUSH_CHARS[now % 64] + ts
+        now //= 64
+    return ts + "".join(random.choice(PUSH_CHARS) for _ in range(12))
+
+
+# ==============================================================================
+# IN-PROCESS: pengganti firebase_admin.db.Reference
+# ==============================================================================
+class FakeReference:
+
+    def __init__(self, database, path=""):
+        self._db = database
+        self.path = "/" + "/".join(_split(path))
+
+    @property
+    def key(self):
+        parts = _split(self.path)
+        return parts[-1] if parts else None
+
+    def child(self, path):
+        return FakeReference(self._db, f"{self.path}/{path}")
+
+    def get(self, etag=False, shallow=False):
+        return self._db.get(self.path, shallow=shallow)
+
+    def set(self, value):
+        self._db.set(self.path, value)
+
+    def update(self, value):
+        self._db.update(self.path, value)
+
+    def delete(self):
+        self._db.delete(self.path)
+
+    def push(self, value=''):
+        return self.child(self._db.push(self.path, value))
+
+    def order_by_key(self):
+        return FakeQuery(self)
+
+
+class FakeQuery:
+
+    def __init__(self, ref):
+        self._ref = ref
+        self._start = None
+        self._last = None
+
+    def start_at(self, start):
+        self._start = start
+        return self
+
+    def limit_to_last(self, limit):
+        self._last = limit
+        return self
+
+    def get(self):
+        return self._ref._db.get(self._ref.path, order_by_key=True, start_at=self._start, limit_to_last=self._last)
+
+
+# ==============================================================================
+# REST (emulator-compatible): dipakai firebase_admin di worker gunicorn
+# ==============================================================================
+class FakeRTDBServer:
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0):
+        self.databases = {} # namespace -> FakeDatabase
+        self.latency = latency
+        self._lock = threading.Lock()
+        self.httpd = QuietHTTPServer((host, port), self._handler())
+
+    @property
+    def address(self):
+        return f"{self.httpd.server_address[0]}:{self.httpd.server_address[1]}"
+
+    def url(self, namespace):
+        """Nilai FIREBASE_*_URL untuk app (mode emulator firebase_admin)"""
+        return f"http://{self.address}/?ns={namespace}"
+
+    def database(self, namespace):
+        with self._lock:
+            if namespace not in self.databases:
+                self.databases[namespace] = FakeDatabase(self.latency)
+            return self.databases[namespace]
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="fake-rtdb", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def _target(self):
+                parsed = urlparse(self.path)
+                params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                path = parsed.path[:-5] if parsed.path.endswith(".json") else parsed.path
+                return server.database(params.get("ns", "default")), path, params
+
+            def _body(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"null")
+
+            def _reply(self, value, status=200):
+                data = json.dumps(value).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                database, path, params = self._target()
+                order_by_key = params.get("orderBy") == '"$key"'
+                self._reply(database.get(
+                    path,
+                    shallow=params.get("shallow") == "true",
+                    order_by_key=order_by_key,
+                    start_at=json.loads(params["startAt"]) if "startAt" in params else None,
+                    limit_to_last=int(params["limitToLast"]) if "limitToLast" in params else None))
+
+            def do_PUT(self):
+                database, path, _ = self._target()
+                value = self._body()
+                database.set(path, value)
+                self._reply(value)
+
+            def do_PATCH(self):
+                database, path, _ = self._target()
+                value = self._body()
+                database.update(path, value)
+                self._reply(value)
+
+            def do_POST(self):
+                database, path, _ = self._target()
+                self._reply({"name": database.push(path, self._body())})
+
+            def do_DELETE(self):
+                database, path, _ = self._target()
+                database.delete(path)
+                self._reply(None)
+
+        return Handler
+
+
+def fake_service_account(project_id="dface-bench"):
+    """Service account palsu (kunci RSA asli) supaya credentials.Certificate() mau menerima"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                            serialization.NoEncryption()).decode()
+    return json.dumps({
+        "type": "service_account",
+        "project_id": project_id,
+        "private_key_id": "".join(random.choice(string.hexdigits.lower()) for _ in range(40)),
+        "private_key": pem,
+        "client_email": f"bench@{project_id}.iam.gserviceaccount.com",
+        "client_id": "1",
+        "token_uri": "https://oauth2.googleapis.com/token",
+    })
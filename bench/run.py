@@ -0,0 +1,425 @@
+# bench/run.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: LOAD BENCHMARK DRIVER (GUNICORN + STUB LOKAL)
+#
+# Contoh:
+#   python -m bench.run                                  # semua skenario, default
+#   python -m bench.run --scenarios login,inbox --concurrency 16 --duration 20
+#   python -m bench.run --env SESSION_TOKEN_FORMAT=signed --out signed.json
+#   python -m bench.compare bench/results/A.json bench/results/B.json
+#
+# Alur: jalankan fake Firebase (REST ala emulator) + stub AI / webhook / SMTP,
+# seed user & inbox, start gunicorn dari repo ini di direktori kerja sementara,
+# lalu tiap skenario ditembak dengan concurrency tetap selama durasi tetap.
+# Hasil (throughput, p50/p95/p99, status code) ditulis sebagai JSON.
+
+import os
+import sys
+import hmac
+import json
+import time
+import shutil
+import socket
+import hashlib
+import argparse
+import platform
+import itertools
+import tempfile
+import threading
+import subprocess
+from datetime import datetime, timezone
+import requests
+from cryptography.fernet import Fernet
+from werkzeug.security import generate_password_hash
+from bench.fake_firebase import FakeRTDBServer, FakeReference, fake_service_account, push_id
+from bench.stubs import ai_stub, webhook_stub, SMTPSink
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "bench-password"
+ALIAS_DOMAIN = "defacer.dedyn.io"
+
+
+# ==============================================================================
+# HELPER
+# ==============================================================================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+_ip_seq = itertools.count(1)
+
+
+def fresh_ip():
+    """IP client unik per request (X-Forwarded-For) supaya rate limit per IP tidak ikut terukur"""
+    n = next(_ip_seq)
+    return f"10.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100.0 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def git_info():
+    def run(*args):
+        try:
+            return subprocess.run(["git", *args], cwd=REPO, capture_output=True, text=True, timeout=10).stdout.strip()
+        except Exception:
+            return None
+    return {"commit": run("rev-parse", "HEAD"), "subject": run("log", "-1", "--format=%s"),
+            "dirty": bool(run("status", "--porcelain", "--untracked-files=no"))}
+
+
+# ==============================================================================
+# ENVIRONMENT (stub + fake Firebase + gunicorn)
+# ==============================================================================
+class BenchEnvironment:
+
+    def __init__(self, args):
+        self.args = args
+        self.workdir = tempfile.mkdtemp(prefix="dface-bench-")
+        self.secret = os.urandom(16).hex()
+        self.fernet_key = Fernet.generate_key().decode()
+        self.admin_key = os.urandom(8).hex()
+        self.firebase = FakeRTDBServer(latency=args.firebase_latency).start()
+        self.ai = ai_stub(latency=args.ai_latency).start()
+        self.webhook = webhook_stub(latency=args.webhook_latency).start()
+        self.smtp = SMTPSink(latency=args.smtp_latency).start()
+        self.port = free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.proc = None
+        self.log_path = os.path.join(self.workdir, "gunicorn.log")
+
+    def app_env(self):
+        service_account = fake_service_account()
+        env = dict(os.environ)
+        env.update({
+            "SECRET_KEY": self.secret,
+            "DATA_ENCRYPTION_KEY": self.fernet_key,
+            "ADMIN_KEY": self.admin_key,
+            "FIREBASE_AUTH_JSON": service_account,
+            "FIREBASE_VAULT_JSON": service_account,
+            "FIREBASE_AUTH_URL": self.firebase.url("dface-auth"),
+            "FIREBASE_VAULT_URL": self.firebase.url("dface-vault"),
+            "AI_BACKEND_URL": self.ai.url,
+            "SSRF_ALLOW_PRIVATE": "1", # Stub webhook ada di 127.0.0.1
+            "SMTP_REQUIRE_TLS": "0", # SMTP sink tanpa TLS
+            "RATE_LIMIT_SHM_PATH": os.path.join(self.workdir, "ratelimit.bin"),
+            "STREAM_SOCKET_DIR": os.path.join(self.workdir, "notify"),
+            "PROMETHEUS_MULTIPROC_DIR": os.path.join(self.workdir, "metrics"),
+            "PYTHONUNBUFFERED": "1",
+        })
+        for item in self.args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+        return env
+
+    # --------------------------------------------------------------------------
+    # SEED DATA (langsung ke fake Firebase, bukan lewat API)
+    # --------------------------------------------------------------------------
+    def seed(self, users, inbox_size):
+        auth = FakeReference(self.firebase.database("dface-auth"))
+        vault = FakeReference(self.firebase.database("dface-vault"))
+        cipher = Fernet(self.fernet_key.encode())
+        password_hash = generate_password_hash(PASSWORD)
+        forward_url = self.webhook.url + "hook" if self.args.forward else ""
+        for i in range(users):
+            username = f"bench{i}"
+            mailbox_id = f"mailbox-{i}"
+            auth.child(f"users/{username}").set({
+                "username": username,
+                "alias": f"{username}@{ALIAS_DOMAIN}",
+                "password_hash": password_hash,
+                # Sama dengan app.utils.hash_device
+                "device_bound": hmac.new(self.secret.encode(), f"device-{i}".encode(), hashlib.sha256).hexdigest(),
+                "mailbox_id": mailbox_id,
+                "settings": {"forward_url": forward_url},
+            })
+            for n in range(inbox_size):
+                vault.child(f"inboxes/{mailbox_id}/{push_id()}").set({
+                    "from": f"sender{n}@example.com",
+                    "subject": cipher.encrypt(f"Seed message {n}".encode()).decode(),
+                    "body": cipher.encrypt(("Lorem ipsum dolor sit amet. " * 40).encode()).decode(),
+                    "timestamp": int(time.time() * 1000),
+                })
+
+    # --------------------------------------------------------------------------
+    # GUNICORN
+    # --------------------------------------------------------------------------
+    def server_command(self):
+        return [sys.executable, "-m", "gunicorn", "run:app",
+                "-c", os.path.join(REPO, "gunicorn.conf.py"),
+                "--pythonpath", REPO, "--chdir", self.workdir,
+                "--bind", f"127.0.0.1:{self.port}",
+                "--workers", str(self.args.workers),
+                "--worker-class", self.args.worker_class,
+                "--threads", str(self.args.threads),
+                "--timeout", "120"]
+
+    def spawn_server(self):
+        self.log = open(self.log_path, "w")
+        self.proc = subprocess.Popen(self.server_command(), cwd=self.workdir, env=self.app_env(), stdout=self.log, stderr=subprocess.STDOUT)
+
+    def start_server(self):
+        self.spawn_server()
+        deadline = time.time() + self.args.boot_timeout
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                break
+            try:
+                if requests.get(self.base_url + "/", timeout=1).status_code == 200:
+                    return
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.stop()
+        with open(self.log_path) as f:
+            sys.stderr.write(f.read()[-4000:])
+        raise SystemExit("gunicorn did not become ready")
+
+    def stop_server(self):
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            try:
+                self.proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+        self.proc = None
+
+    def stop(self):
+        self.stop_server()
+        for stub in (self.ai, self.webhook, self.smtp, self.firebase):
+            stub.stop()
+        if not self.args.keep_workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+
+    def admin_stats(self):
+        try:
+            return requests.get(self.base_url + "/api/admin/stats", headers={"X-Admin-Key": self.admin_key}, timeout=5).json()
+        except Exception:
+            return None
+
+
+# ==============================================================================
+# SCENARIOS
+# ==============================================================================
+class Scenarios:
+    """Tiap skenario: fungsi (client_index, state) -> (method, path, kwargs)"""
+
+    def __init__(self, env, users):
+        self.env = env
+        self.users = users
+        self.login_tokens = {}
+        self.interview_tokens = {}
+
+    def prepare(self, names):
+        """Login & init-session sekali per virtual client (tidak ikut diukur)"""
+        with requests.Session() as s:
+            for i in range(self.users):
+                if names & {"inbox", "inbox_poll", "inbox_full", "send_bridge"}:
+                    res = s.post(self.env.base_url + "/api/login", headers={"X-Forwarded-For": fresh_ip()},
+                                 json={"username": f"bench{i}", "password": PASSWORD, "device_id": f"device-{i}"})
+                    res.raise_for_status()
+                    self.login_tokens[i] = res.json()["token"]
+                if "chat_proxy" in names:
+                    res = s.post(self.env.base_url + "/api/init-session", headers={"X-Forwarded-For": fresh_ip()},
+                                 json={"device_id": f"device-{i}"})
+                    res.raise_for_status()
+                    self.interview_tokens[i] = res.json()["token"]
+
+    def _auth(self, i):
+        return {"Authorization": "Bearer " + self.login_tokens[i], "X-Forwarded-For": fresh_ip()}
+
+    def login(self, i, state):
+        return "POST", "/api/login", {"headers": {"X-Forwarded-For": fresh_ip()},
+                                      "json": {"username": f"bench{i}", "password": PASSWORD, "device_id": f"device-{i}"}}
+
+    def inbox(self, i, state):
+        # Mode headers, tanpa cursor/ETag (list penuh tiap kali)
+        return "GET", f"/api/inbox?username=bench{i}", {"headers": self._auth(i)}
+
+    def inbox_poll(self, i, state):
+        # Polling steady-state dashboard: cursor + If-None-Match
+        headers = self._auth(i)
+        if state.get("etag"):
+            headers["If-None-Match"] = state["etag"]
+        path = f"/api/inbox?username=bench{i}&since={state.get('cursor', '')}"
+
+        def remember(res):
+            if res.status_code == 200:
+                state["etag"] = res.headers.get("ETag")
+                state["cursor"] = res.json().get("cursor", "")
+        return "GET", path, {"headers": headers, "_after": remember}
+
+    def inbox_full(self, i, state):
+        # Format lama: 5 email lengkap + dekripsi body
+        return "POST", "/api/inbox", {"headers": self._auth(i), "json": {"username": f"bench{i}"}}
+
+    def webhook_inbound(self, i, state):
+        return "POST", "/api/webhook-inbound", {"json": {
+            "from": "Load Generator <load@example.com>",
+            "to": f"bench{i}@{ALIAS_DOMAIN}",
+            "subject": "Benchmark message",
+            "text": "Hello from the benchmark. " * 20}}
+
+    def chat_proxy(self, i, state):
+        return "POST", "/api/chat-proxy", {"headers": {"X-Forwarded-For": fresh_ip()},
+                                           "json": {"token": self.interview_tokens[i], "message": "I research mail privacy."}}
+
+    def send_bridge(self, i, state):
+        host, port = self.env.smtp.address
+        return "POST", "/api/send-bridge", {"headers": self._auth(i), "json": {
+            "smtp_host": host, "smtp_port": port, "smtp_user": f"bench{i}@example.com", "smtp_pass": "x",
+            "to": "sink@example.com", "subject": "Benchmark", "message": "Hello over the bridge."}}
+
+
+ALL_SCENARIOS = ["login", "inbox", "inbox_poll", "inbox_full", "webhook_inbound", "chat_proxy", "send_bridge"]
+
+
+def run_scenario(base_url, builder, concurrency, duration, warmup):
+    """Concurrency tetap: `concurrency` thread, masing-masing kirim request berurutan sampai waktu habis"""
+    results = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+
+    def client(i):
+        state = {}
+        local = []
+        with requests.Session() as s:
+            while True:
+                t0 = time.perf_counter()
+                if t0 >= stop_at:
+                    break
+                method, path, kwargs = builder(i, state)
+                after = kwargs.pop("_after", None)
+                try:
+                    res = s.request(method, base_url + path, timeout=60, **kwargs)
+                    status = res.status_code
+                    if after:
+                        after(res)
+                except requests.RequestException:
+                    status = "ERR"
+                t1 = time.perf_counter()
+                if t0 >= measure_from:
+                    local.append((t1 - t0, status))
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = max(1e-9, time.perf_counter() - measure_from)
+    return summarize(results, elapsed)
+
+
+def summarize(results, elapsed):
+    latencies = sorted(r[0] * 1000.0 for r in results)
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    errors = sum(n for s, n in statuses.items() if s == "ERR" or int(s) >= 500)
+    ms = lambda v: round(v, 3) if v is not None else None
+    return {
+        "requests": len(results),
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(results) / elapsed, 2),
+        "errors": errors,
+        "status_counts": statuses,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(latencies[-1]) if latencies else None,
+        },
+    }
+
+
+# ==============================================================================
+# MAIN
+# ==============================================================================
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Load benchmark for the dface API against local stand-ins")
+    p.add_argument("--scenarios", default=",".join(ALL_SCENARIOS), help="comma separated: " + ",".join(ALL_SCENARIOS))
+    p.add_argument("--concurrency", type=int, default=8)
+    p.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    p.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    p.add_argument("--workers", type=int, default=4)
+    p.add_argument("--threads", type=int, default=16)
+    p.add_argument("--worker-class", default="gthread")
+    p.add_argument("--inbox-size", type=int, default=5, help="seeded messages per mailbox")
+    p.add_argument("--firebase-latency", type=float, default=0.01)
+    p.add_argument("--ai-latency", type=float, default=0.3)
+    p.add_argument("--webhook-latency", type=float, default=0.05)
+    p.add_argument("--smtp-latency", type=float, default=0.02)
+    p.add_argument("--no-forward", dest="forward", action="store_false", help="seed users without forward_url")
+    p.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra env for gunicorn")
+    p.add_argument("--boot-timeout", type=float, default=60.0)
+    p.add_argument("--keep-workdir", action="store_true")
+    p.add_argument("--out", help="result JSON path (default bench/results/<time>-<commit>.json)")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    names = [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = set(names) - set(ALL_SCENARIOS)
+    if unknown:
+        raise SystemExit(f"unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    env = BenchEnvironment(args)
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git": git_info(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {k: v for k, v in vars(args).items() if k != "out"},
+        },
+        "scenarios": {},
+    }
+    try:
+        env.seed(args.concurrency, args.inbox_size)
+        env.start_server()
+        scenarios = Scenarios(env, args.concurrency)
+        scenarios.prepare(set(names))
+        for name in names:
+            print(f"▶ {name}: {args.concurrency} clients x {args.duration}s", flush=True)
+            result = run_scenario(env.base_url, getattr(scenarios, name), args.concurrency, args.duration, args.warmup)
+            report["scenarios"][name] = result
+            lat = result["latency_ms"]
+            print(f"  {result['throughput_rps']:>9} req/s  p50 {lat['p50']} ms  p95 {lat['p95']} ms  "
+                  f"p99 {lat['p99']} ms  errors {result['errors']}  {result['status_counts']}", flush=True)
+        report["meta"]["stubs"] = {
+            "ai_requests": env.ai.requests.count,
+            "webhook_requests": env.webhook.requests.count,
+            "smtp_connections": env.smtp.connections.count,
+            "smtp_messages": env.smtp.messages.count,
+            "firebase_ops": {ns: d.ops for ns, d in env.firebase.databases.items()},
+        }
+        report["meta"]["server_stats_sample"] = env.admin_stats()
+    finally:
+        env.stop()
+
+    out = args.out
+    if not out:
+        commit = (report["meta"]["git"].get("commit") or "nogit")[:10]
+        out = os.path.join(REPO, "bench", "results", f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"✅ Results: {out}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# bench/stubs.py
+# ARCHITECT: ETERNALS DEV
+# MODULE: STUB SERVER LOKAL (AI BACKEND, WEBHOOK FORWARD, SMTP SINK)
+#
+# Semua stub jalan di thread proses benchmark, latency bisa diatur supaya
+# hasil bisa dibandingkan antar commit tanpa layanan eksternal.
+
+import sys
+import json
+import time
+import base64
+import threading
+import socketserver
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class QuietHTTPServer(ThreadingHTTPServer):
+    """Client benchmark memutus keep-alive saat selesai: jangan cetak traceback untuk itu"""
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Counter:
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def bump(self):
+        with self._lock:
+            self.count += 1
+
+
+class StubHTTPServer:
+    """Server HTTP kecil: tiap request ditahan `latency` detik lalu dijawab `reply(path, body)`"""
+
+    def __init__(self, reply, latency=0.0, host="127.0.0.1", port=0):
+        self.reply = reply
+        self.latency = latency
+        self.requests = _Counter()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True # Header + body terpisah: tanpa ini kena delayed ACK ~40ms
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length)
+                stub.requests.bump()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                status, content_type, data = stub.reply(self.path, body)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = QuietHTTPServer((host, port), Handler)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name="stub-http", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+
+def ai_stub(latency=0.3, decision="CONTINUE"):
+    """Pengganti pollinations.ai: jawab JSON {decision, reply} seperti yang diminta system prompt"""
+    answer = json.dumps({"decision": decision, "reply": "Explain your intent in more detail."}).encode()
+    return StubHTTPServer(lambda path, body: (200, "text/plain", answer), latency)
+
+
+def webhook_stub(latency=0.05, status=200):
+    """Tujuan settings.forward_url: terima semua POST"""
+    return StubHTTPServer(lambda path, body: (status, "application/json", b'{"ok":true}'), latency)
+
+
+class SMTPSink:
+    """
+    SMTP minimal (EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, NOOP, RSET, QUIT) tanpa TLS.
+    App perlu SMTP_REQUIRE_TLS=0. Pesan tidak disimpan, hanya dihitung.
+    """
+
+    def __init__(self, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.connections = _Counter()
+        self.messages = _Counter()
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            disable_nagle_algorithm = True
+
+            def _send(self, line):
+                self.wfile.write((line + "\r\n").encode())
+
+            def handle(self):
+                sink.connections.bump()
+                self._send("220 dface-bench ESMTP")
+                while True:
+                    raw = self.rfile.readline()
+                    if not raw:
+                        return
+                    line = raw.decode(errors="replace").strip()
+                    verb = line.split(" ", 1)[0].upper()
+                    if verb in ("EHLO", "HELO"):
+                        self._send("250-dface-bench")
+                        self._send("250 AUTH PLAIN LOGIN")
+                    elif verb == "AUTH":
+                        parts = line.split()
+                        if parts[1].upper() == "LOGIN":
+                            # AUTH LOGIN [user]: minta sisa kredensial satu per satu
+                            if len(parts) < 3:
+                                self._send("334 " + base64.b64encode(b"Username:").decode())
+                                self.rfile.readline()
+                            self._send("334 " + base64.b64encode(b"Password:").decode())
+                            self.rfile.readline()
+                        self._send("235 2.7.0 Authentication successful")
+                    elif verb == "DATA":
+                        self._send("354 End data with <CR><LF>.<CR><LF>")
+                        while self.rfile.readline().rstrip(b"\r\n") != b".":
+                            pass
+                        if sink.latency:
+                            time.sleep(sink.latency)
+                        sink.messages.bump()
+                        self._send("250 2.0.0 Queued")
+                    elif verb in ("MAIL", "RCPT", "NOOP", "RSET"):
+                        self._send("250 OK")
+                    elif verb == "QUIT":
+                        self._send("221 Bye")
+                        return
+                    else:
+                        self._send("502 Command not implemented")
+
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, name="smtp-sink", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
@@ -6,6 +6,7 @@ class Config:
     # 1. BASIC SECURITY
     SECRET_KEY = os.environ.get("SECRET_KEY")
     ENCRYPTION_KEY = os.environ.get("DATA_ENCRYPTION_KEY")
+    ADMIN_KEY = os.environ.get("ADMIN_KEY") # Opsional. Kosong = endpoint /api/admin/* mati
     
     # 2. FIREBASE CONFIG (ENV JSON & URL)
     AUTH_JSON = os.environ.get("FIREBASE_AUTH_JSON")
@@ -18,9 +19,206 @@ class Config:
     SESSION_TTL_LOGIN = 86400  # 24 Jam
     SESSION_TTL_INTERVIEW = 900 # 15 Menit
 
+    # "opaque" = token acak + row di tabel sessions (default)
+    # "signed" = token v1.<claims>.<hmac>, validasi tanpa SQLite (lihat app/tokens.py)
+    SESSION_TOKEN_FORMAT = os.environ.get("SESSION_TOKEN_FORMAT", "opaque")
+    REVOCATION_BLOOM_BITS = 1 << 20 # 128 KB per worker
+    REVOCATION_BLOOM_HASHES = 7
+    REVOCATION_BLOOM_CAPACITY = 50000 # Lewat dari ini Bloom dibangun ulang
+    REVOCATION_SYNC_INTERVAL = 2 # Detik, jeda maksimal sinkron antar worker
+
     # 4. DATABASE FILE
     DB_FILE = "dguard.db"
 
+    # 5. SQLITE TUNING (Connection Manager per worker)
+    DB_BUSY_TIMEOUT_MS = int(os.environ.get("DB_BUSY_TIMEOUT_MS", 5000))
+    DB_MMAP_SIZE = int(os.environ.get("DB_MMAP_SIZE", 64 * 1024 * 1024)) # 64 MB
+    DB_STATEMENT_CACHE = 256
+    DB_LOCK_WAIT_THRESHOLD_MS = 1.0 # BEGIN lebih lama dari ini = dihitung lock wait
+
+    # 6. RATE LIMITER
+    # "shm" = counter di shared memory (semua worker), "sqlite" = tabel ratelimit (legacy)
+    RATE_LIMIT_BACKEND = os.environ.get("RATE_LIMIT_BACKEND", "shm")
+    RATE_LIMIT_SHM_PATH = os.environ.get("RATE_LIMIT_SHM_PATH") # Default: /dev/shm/dface-ratelimit.bin
+    RATE_LIMIT_SLOTS = 65536
+    RATE_LIMIT_STRIPES = 64
+    RATE_LIMIT_PERSIST = os.environ.get("RATE_LIMIT_PERSIST", "0") == "1" # Snapshot ke SQLite (opsional)
+    RATE_LIMIT_PERSIST_INTERVAL = 30
+    RATE_LIMIT_RESTORE_HORIZON = 600 # Snapshot lebih tua dari ini tidak di-restore
+
+    # 7. INBOUND SPOOL (/webhook-inbound diproses async)
+    INBOUND_WORKERS = int(os.environ.get("INBOUND_WORKERS", 2)) # Thread per worker gunicorn
+    INBOUND_BATCH_SIZE = 20
+    INBOUND_POLL_INTERVAL = 1.0 # Detik, polling untuk email yang masuk lewat worker lain
+    INBOUND_CLAIM_TIMEOUT = 120 # Claim lebih tua dari ini dianggap worker mati -> diambil ulang
+    INBOUND_MAX_ATTEMPTS = 6 # Lewat dari ini -> inbound_dead
+    INBOUND_RETRY_BASE = 2
+    INBOUND_RETRY_MAX = 300
+
+    # 8. MAILBOX RETENTION
+    MAILBOX_RETENTION_DEFAULT = 5 # Email tersimpan per inbox (settings.retention bisa override)
+    MAILBOX_RETENTION_MAX = 50
+    RETENTION_INLINE = os.environ.get("RETENTION_INLINE", "1") == "1" # Trim setiap email masuk
+    RETENTION_SWEEP_INTERVAL = int(os.environ.get("RETENTION_SWEEP_INTERVAL", 0)) # Detik, 0 = sweeper mati
+    RETENTION_SWEEP_BATCH = 500 # Path per multi-path update
+
+    # 9. WEBHOOK FORWARDING (settings.forward_url)
+    FORWARD_TIMEOUT = 3
+    FORWARD_CONCURRENCY = int(os.environ.get("FORWARD_CONCURRENCY", 8)) # Thread pengirim per worker
+    FORWARD_PER_HOST_CONCURRENCY = 2 # 1 tujuan lambat tidak boleh makan semua thread
+    FORWARD_MAX_ATTEMPTS = 5
+    FORWARD_BACKOFF_BASE = 1
+    FORWARD_BACKOFF_MAX = 300
+    FORWARD_BREAKER_THRESHOLD = 5 # Gagal beruntun sebelum circuit OPEN
+    FORWARD_BREAKER_RESET = 30 # Detik OPEN sebelum dicoba lagi
+    FORWARD_RETRY_POLL = 1.0
+    FORWARD_STALE_AFTER = 60 # INFLIGHT tanpa heartbeat pemiliknya selama ini dianggap worker mati
+
+    # 10. AUDIT LOG WRITER
+    AUDIT_BUFFERED = os.environ.get("AUDIT_BUFFERED", "1") == "1" # 0 = INSERT langsung (legacy)
+    AUDIT_BUFFER_MAX = 10000 # Event di memori per worker, lebih dari ini di-drop (dihitung)
+    AUDIT_FLUSH_SIZE = 200 # Flush segera kalau buffer mencapai ini
+    AUDIT_FLUSH_INTERVAL = 1.0 # Detik
+    AUDIT_BATCH_MAX = 1000 # Row per transaksi
+
+    # 11. EXPIRY SWEEPER (hapus row basi + incremental vacuum)
+    SWEEP_INTERVAL = int(os.environ.get("SWEEP_INTERVAL", 300)) # Detik, 0 = mati
+    SWEEP_BATCH_SIZE = 500 # Row per DELETE
+    SWEEP_BATCH_PAUSE = 0.01 # Jeda antar batch (detik)
+    SWEEP_VACUUM_PAGES = 1000 # Halaman dikembalikan ke OS per run
+    SWEEP_RATELIMIT_STALE = 3600 # Window rate limit lebih tua dari ini = mati
+    SWEEP_DELIVERIES_AFTER = 7 * 86400 # Delivery sukses disimpan 7 hari
+    AUDIT_RETENTION_DAYS = int(os.environ.get("AUDIT_RETENTION_DAYS", 30))
+
+    # 12. AI INTERVIEW BACKEND (/chat-proxy)
+    AI_BACKEND_URL = os.environ.get("AI_BACKEND_URL", "https://text.pollinations.ai/") # Bisa diarahkan ke stub lokal
+    AI_MODEL = os.environ.get("AI_MODEL", "openai")
+    AI_TIMEOUT = float(os.environ.get("AI_TIMEOUT", 10))
+    AI_CONNECT_TIMEOUT = 3
+    AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", 2)) # Total lintas semua worker
+    AI_BREAKER_THRESHOLD = 5
+    AI_BREAKER_RESET = 30
+    AI_RETRY_AFTER = 5 # Header Retry-After saat bulkhead penuh
+
+    # 13. INBOX PUSH STREAM (SSE /inbox/stream)
+    STREAM_SOCKET_DIR = os.environ.get("STREAM_SOCKET_DIR", "/tmp/dface-notify") # 1 unix datagram socket per worker
+    STREAM_MAX_PER_WORKER = int(os.environ.get("STREAM_MAX_PER_WORKER", 8)) # Harus < jumlah thread gunicorn
+    STREAM_HEARTBEAT = 15 # Detik antar komentar keep-alive
+    STREAM_MAX_AGE = 300 # Detik, lalu client reconnect (auth dicek ulang)
+    STREAM_QUEUE_SIZE = 32 # Event tertunda per stream, lebih dari ini di-drop
+
+    # 14. SMTP BRIDGE (/send-bridge)
+    SMTP_TIMEOUT = 15
+    SMTP_REQUIRE_TLS = os.environ.get("SMTP_REQUIRE_TLS", "1") == "1" # 0 = STARTTLS hanya jika server menawarkan
+    SMTP_POOL_IDLE = 60 # Detik koneksi idle disimpan sebelum ditutup
+    SMTP_POOL_MAX_PER_KEY = 2 # Koneksi idle per (host, port, user)
+    SMTP_NOOP_AFTER = 10 # Idle lebih dari ini dicek NOOP dulu sebelum dipakai
+    SMTP_BATCH_MAX = 20 # Email per request
+    SMTP_RATE_LIMIT = 40 # Penerima per menit per IP (per penerima, bukan per request), juga batas per request. Harus >= SMTP_BATCH_MAX
+    SMTP_ASYNC_WORKERS = int(os.environ.get("SMTP_ASYNC_WORKERS", 2)) # Thread job async per worker
+    SMTP_JOB_RETENTION = 86400 # Status job disimpan 1 hari
+    SMTP_JOB_HEARTBEAT = 15 # Detik antar heartbeat job QUEUED/RUNNING milik worker
+    SMTP_JOB_STALE_AFTER = 60 # Job tanpa heartbeat selama ini = worker mati -> FAILED
+
+    # 15. SSRF RESOLVER (is_safe_url + pin IP saat forward)
+    RESOLVER_TTL = int(os.environ.get("RESOLVER_TTL", 60)) # Detik maksimal hasil resolve disimpan (TTL record DNS kalau lebih pendek, butuh dnspython)
+    RESOLVER_NEGATIVE_TTL = 15 # Detik gagal resolve disimpan
+    RESOLVER_CACHE_MAX = 1024 # Hostname per worker
+    SSRF_ALLOW_PRIVATE = os.environ.get("SSRF_ALLOW_PRIVATE", "0") == "1" # HANYA untuk dev/bench (stub lokal)
+
+    # 16. PASSWORD HASHING (process pool) + LOGIN PENALTY BOX
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1") # Format werkzeug; berubah = rehash saat login
+    PASSWORD_HASH_WORKERS = int(os.environ.get("PASSWORD_HASH_WORKERS", 1)) # Proses hashing per worker gunicorn
+    PASSWORD_QUEUE_MAX = 8 # Hash berjalan + antre per worker, lebih dari ini langsung 503
+    PASSWORD_HASH_TIMEOUT = 5 # Detik menunggu hasil hash
+    PASSWORD_RETRY_AFTER = 2 # Header Retry-After saat pool penuh
+    LOGIN_PENALTY_BASE = 1 # Detik blokir setelah gagal pertama, x2 tiap gagal berikutnya
+    LOGIN_PENALTY_MAX = 300
+    LOGIN_PENALTY_RESET = 900 # Tanpa gagal selama ini = hitungan gagal direset
+
+    # 17. METRICS (Prometheus, /metrics)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+    METRICS_PUBLIC = os.environ.get("METRICS_PUBLIC", "0") == "1" # 0 = wajib X-Admin-Key / Bearer ADMIN_KEY
+
+    # 18. STATIC ASSETS (precompressed + fingerprint, di memori)
+    ASSET_INDEX_MAX_AGE = int(os.environ.get("ASSET_INDEX_MAX_AGE", 0)) # index.html: revalidasi (ETag) tiap load
+    ASSET_IMMUTABLE_MAX_AGE = 31536000 # URL ber-fingerprint tidak pernah berubah isinya
+    ASSET_MIN_COMPRESS = 256 # Byte, file lebih kecil dikirim apa adanya
+
+    # 19. COLD START (lihat app/container.py)
+    LAZY_INIT = os.environ.get("LAZY_INIT", "1") == "1" # 0 = connect Firebase di create_app (perilaku lama)
+    WARM_ON_FORK = os.environ.get("WARM_ON_FORK", "1") == "1" # gunicorn post_worker_init: panaskan dependency di background
+
+    # 20. AUDIT LOG QUERY / EXPORT (admin, koneksi read-only)
+    AUDIT_QUERY_MAX_LIMIT = 1000 # Row per halaman /admin/audit
+    AUDIT_EXPORT_CHUNK = 1000 # Row per transaksi baca saat export NDJSON (snapshot WAL pendek)
+    AUDIT_COUNTS_MAX_ROWS = 10000 # Batas (bucket x event) di /admin/audit/counts
+    AUDIT_COUNTS_DEFAULT_RANGE = 86400 # Detik ke belakang kalau 'since' kosong
+
+    # 21. BULK INBOUND (/webhook-inbound/bulk)
+    INBOUND_SECRET = os.environ.get("INBOUND_SECRET") # Kosong = endpoint bulk mati (404)
+    INBOUND_BULK_MAX = int(os.environ.get("INBOUND_BULK_MAX", 1000)) # Email per request
+    INBOUND_BULK_ITEM_MAX = 1024 * 1024 # Byte per email (JSON)
+    INBOUND_BULK_BODY_MAX = int(os.environ.get("INBOUND_BULK_BODY_MAX", 32 * 1024 * 1024)) # Byte per request (semua item di memori)
+    INBOUND_BULK_WORKERS = 8 # Thread per worker gunicorn: user/mailbox diproses paralel
+
+    # 22. ENCRYPTION ENVELOPE (lihat app/envelope.py)
+    ENVELOPE_FORMAT = os.environ.get("ENVELOPE_FORMAT", "v2") # "v2" atau "fernet" (tulis format lama)
+    ENVELOPE_KEY_ID = int(os.environ.get("ENVELOPE_KEY_ID", 1)) # 0-255, key untuk enkripsi baru
+    ENVELOPE_KEYS = os.environ.get("ENVELOPE_KEYS") # Opsional JSON {"<id>": "<base64 32 byte>"} (rotasi)
+    ENVELOPE_COMPRESSION = os.environ.get("ENVELOPE_COMPRESSION", "zlib") # "zlib" / "zstd" / "none"
+    ENVELOPE_COMPRESS_MIN = 128 # Byte, plaintext lebih kecil tidak dikompres
+
+    # 23. MAIL ROUTING INDEX (username -> mailbox di SQLite, lihat app/routing.py)
+    ROUTES_ENABLED = os.environ.get("ROUTES_ENABLED", "1") == "1" # 0 = tanya Firebase tiap email (field routing saja)
+    ROUTES_SYNC_INTERVAL = int(os.environ.get("ROUTES_SYNC_INTERVAL", 60)) # Detik, incremental sync (shallow)
+    ROUTES_FULL_SYNC_INTERVAL = int(os.environ.get("ROUTES_FULL_SYNC_INTERVAL", 3600)) # Detik, full sync per halaman
+    ROUTES_PAGE_SIZE = 500 # Row per transaksi tulis saat sync
+    ROUTES_SYNC_WORKERS = 8 # Child read paralel saat sync (leader saja)
+    ROUTES_REFRESH_BATCH = int(os.environ.get("ROUTES_REFRESH_BATCH", 200)) # Row yang settings-nya dicek ulang per incremental sync
+    ROUTES_CACHE_TTL = 30 # Detik, cache per worker (perubahan dari worker lain terlihat setelah ini)
+    ROUTES_NEGATIVE_TTL = 10 # Detik, penerima yang dipastikan tidak ada di Firebase. Akun baru dari instance lain ditolak paling lama selama ini
+    ROUTES_CACHE_MAX = 10000
+
+    # 24. ADMISSION CONTROL / LOAD SHEDDING (per worker, lihat app/admission.py)
+    ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1") == "1"
+    ADMISSION_CAPACITY = int(os.environ.get("ADMISSION_CAPACITY", 16)) # = --threads gunicorn
+    # Urut prioritas. share = porsi kapasitas yang boleh terisi saat request kelas ini masuk,
+    # max_wait = detik antre maksimal sebelum 503, target = latency (detik) acuan AIMD
+    ADMISSION_CLASSES = {
+        "critical": {"share": 1.0, "max_wait": 1.0, "target": 2.5},
+        "default": {"share": 0.8, "max_wait": 0.25, "target": 1.0},
+        "low": {"share": 0.5, "max_wait": 0.0, "target": 8.0},
+    }
+    # Prefix path -> kelas (match pertama). None = tidak dibatasi. /api/* lain = ADMISSION_DEFAULT_CLASS,
+    # di luar /api (frontend) tidak dibatasi.
+    ADMISSION_ROUTES = [
+        ("/api/admin", None),
+        ("/api/inbox/stream", None), # Punya kuota sendiri (STREAM_MAX_PER_WORKER)
+        ("/api/webhook-inbound", "critical"),
+        ("/api/login", "critical"),
+        ("/api/chat-proxy", "low"),
+        ("/api/send-bridge", "low"),
+    ]
+    ADMISSION_DEFAULT_CLASS = "default"
+    ADMISSION_MIN_LIMIT = 1.0
+    ADMISSION_DECREASE = 0.7 # Faktor limit saat latency lewat target
+    ADMISSION_DECREASE_INTERVAL = 1.0 # Detik, jeda minimal antar penurunan limit
+    ADMISSION_RETRY_AFTER_MAX = 30
+    ADMISSION_QUEUE_HEADER = os.environ.get("ADMISSION_QUEUE_HEADER") # Mis. "X-Request-Start" (t=<epoch>) dari proxy
+
+    # 25. REQUEST PROFILING (lihat app/profiling.py)
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/dface-profiles") # Dipakai bareng semua worker
+    PROFILE_HEADER = "X-Profile-Request" # Token dari POST /api/admin/profiles/token
+    PROFILE_TOKEN_MAX_TTL = 3600 # Detik, token profiling paling lama berlaku
+    PROFILE_SLOW_ENABLED = os.environ.get("PROFILE_SLOW_ENABLED", "1") == "1"
+    PROFILE_SLOW_THRESHOLD = float(os.environ.get("PROFILE_SLOW_THRESHOLD", 2.0)) # Detik, lebih lama = disimpan
+    PROFILE_SAMPLE_INTERVAL = 0.05 # Detik antar sample stack (20 Hz)
+    PROFILE_SLOW_MAX_PER_MINUTE = 6 # Capture slow per worker per menit, sisanya hanya dihitung
+    PROFILE_STACK_DEPTH = 48 # Frame per sample
+    PROFILE_STACKS_MAX = 50 # Stack unik per capture (terbanyak)
+    PROFILE_MAX_FILES = 200 # Total file di PROFILE_DIR, terlama dihapus
+
     @staticmethod
     def check_health():
         required = [
@@ -33,5 +231,4 @@ class Config:
             print(f"FATAL: Missing ENV Variables: {', '.join(missing)}")
             sys.exit(1)
 
-# Auto check saat import
-Config.check_health()
+# Tidak dicek saat import lagi: create_app() memanggil Config.check_health()
@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+# Dibaca otomatis oleh gunicorn dari working directory (opsi CLI di Dockerfile tetap berlaku)
+
+import os
+import shutil
+
+# Prometheus multiprocess mode: harus sudah di-set sebelum worker meng-import prometheus_client.
+# Tiap worker menulis file metrik di sini, /metrics menggabungkan semuanya.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/dface-metrics")
+
+
+def on_starting(server):
+    # Buang file metrik dari run sebelumnya (pid lama)
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def worker_exit(server, worker):
+    # Pastikan audit event yang masih di buffer tertulis sebelum worker mati
+    from app.audit import audit_writer
+    audit_writer.flush()
+
+
+def child_exit(server, worker):
+    # Gauge "live" milik worker yang mati tidak ikut dihitung lagi
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_worker_init(worker):
+    # Worker sudah import app (create_app cepat, Firebase/Fernet masih lazy):
+    # panaskan dependency di thread background sambil worker mulai menerima request.
+    # Bukan post_fork: di sana app belum di-import, import paralel dari thread lain rawan.
+    from config import Config
+    if Config.WARM_ON_FORK:
+        from app.container import container
+        container.warm_async()
@@ -0,0 +1,30 @@
+# tests/conftest.py
+# ENV minimal supaya modul app bisa di-import (Firebase tetap lazy, tidak pernah connect)
+
+import os
+import sys
+import sqlite3
+import pytest
+from cryptography.fernet import Fernet
+
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("DATA_ENCRYPTION_KEY", Fernet.generate_key().decode())
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """pool diarahkan ke DB SQLite baru (schema lewat migrasi) untuk 1 test"""
+    from app.database import pool
+    from app.migrations import migrate
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL;")
+        migrate(conn)
+    finally:
+        conn.close()
+    pool.close()
+    monkeypatch.setattr(pool, "path", path)
+    yield pool
+    pool.close()
@@ -0,0 +1,118 @@
+# tests/test_admission.py
+# AIMD per kelas route: naik +1/limit saat sehat, turun x ADMISSION_DECREASE (maks 1x per
+# interval) saat lewat target, shed saat penuh, klasifikasi prefix path
+
+import time
+import types
+import pytest
+from config import Config
+from app import admission as admission_mod
+from app.admission import AdmissionController, EXEMPT, parse_request_start
+
+CLASSES = {
+    "critical": {"share": 1.0, "max_wait": 0.0, "target": 1.0},
+    "low": {"share": 0.5, "max_wait": 0.0, "target": 1.0},
+}
+ROUTES = [("/api/admin", None), ("/api/login", "critical"), ("/api/chat-proxy", "low")]
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission_mod, "time", types.SimpleNamespace(time=lambda: now[0], perf_counter=time.perf_counter))
+    monkeypatch.setattr(admission_mod.hub, "active", lambda: 0)
+    monkeypatch.setattr(Config, "ADMISSION_DECREASE", 0.5)
+    monkeypatch.setattr(Config, "ADMISSION_DECREASE_INTERVAL", 1.0)
+    monkeypatch.setattr(Config, "ADMISSION_MIN_LIMIT", 1.0)
+    return now
+
+
+def controller(capacity=8):
+    return AdmissionController(capacity, CLASSES, ROUTES)
+
+
+def run(ctl, rc, latency):
+    assert ctl.acquire(rc)
+    ctl.release(rc, latency)
+
+
+def test_decrease_is_multiplicative_and_rate_limited(clock):
+    ctl = controller()
+    rc = ctl.classes["critical"]
+    assert rc.limit == 8.0
+    run(ctl, rc, 5.0)
+    assert rc.limit == 4.0
+    # Lonjakan yang sama (masih dalam interval) tidak menurunkan lagi
+    run(ctl, rc, 5.0)
+    assert rc.limit == 4.0
+    clock[0] += 1.0
+    run(ctl, rc, 5.0)
+    assert rc.limit == 2.0
+    for _ in range(3):
+        clock[0] += 1.0
+        run(ctl, rc, 5.0)
+    assert rc.limit == Config.ADMISSION_MIN_LIMIT
+    assert rc.stats["decreases"] == 5
+
+
+def test_increase_is_additive_and_capped(clock):
+    ctl = controller()
+    rc = ctl.classes["critical"]
+    run(ctl, rc, 5.0)
+    assert rc.limit == 4.0
+    # +1/limit per request sehat -> +1 per ~limit request
+    for _ in range(4):
+        run(ctl, rc, 0.1)
+    assert 4.9 < rc.limit < 5.0
+    for _ in range(100):
+        run(ctl, rc, 0.1)
+    assert rc.limit == rc.max_limit == 8.0
+
+
+def test_sheds_when_class_limit_reached(clock):
+    ctl = controller()
+    rc = ctl.classes["critical"]
+    rc.limit = 2.0
+    assert ctl.acquire(rc) and ctl.acquire(rc)
+    assert not ctl.acquire(rc)
+    assert rc.stats["shed_limit"] == 1
+    ctl.release(rc, 0.1)
+    assert ctl.acquire(rc)
+
+
+def test_low_class_keeps_reserve_for_critical(clock):
+    ctl = controller(capacity=4)
+    low, critical = ctl.classes["low"], ctl.classes["critical"]
+    assert ctl.acquire(critical) and ctl.acquire(critical)
+    # share 0.5: total in-flight 2 dari kapasitas 4 -> kelas low ditolak, critical masih boleh
+    assert not ctl.acquire(low)
+    assert low.stats["shed_capacity"] == 1
+    assert ctl.acquire(critical) and ctl.acquire(critical)
+    assert not ctl.acquire(critical)
+
+
+def test_sse_streams_reduce_capacity(clock, monkeypatch):
+    ctl = controller(capacity=4)
+    monkeypatch.setattr(admission_mod.hub, "active", lambda: 2)
+    low = ctl.classes["low"]
+    assert ctl.acquire(low)
+    assert not ctl.acquire(low)
+
+
+def test_classify():
+    ctl = controller()
+    assert ctl.classify("/api/login") == "critical"
+    assert ctl.classify("/api/chat-proxy/v1") == "low"
+    assert ctl.classify("/api/admin/stats") is EXEMPT
+    assert ctl.classify("/api/loginx") == Config.ADMISSION_DEFAULT_CLASS
+    assert ctl.classify("/index.html") is EXEMPT
+
+
+def test_parse_request_start_units():
+    now = 1_700_000_000.0
+    assert parse_request_start("t=1699999999.5", now) == pytest.approx(0.5)
+    assert parse_request_start("t=1699999999500", now) == pytest.approx(0.5)
+    assert parse_request_start("1699999999500000", now) == pytest.approx(0.5)
+    assert parse_request_start("t=1700000005", now) == 0.0
+    assert parse_request_start("garbage", now) is None
+    assert parse_request_start(None, now) is None
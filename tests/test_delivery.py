@@ -0,0 +1,113 @@
+# tests/test_delivery.py
+# Delivery engine forward_url terhadap stub HTTP lokal (bench/stubs.py): sukses,
+# retry + backoff sampai FAILED, replay, reclaim INFLIGHT milik worker mati
+
+import json
+import time
+import pytest
+from config import Config
+from app.delivery import DeliveryEngine
+from bench.stubs import StubHTTPServer
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+@pytest.fixture
+def stub():
+    state = {"status": 200, "bodies": []}
+
+    def reply(path, body):
+        state["bodies"].append(json.loads(body))
+        return state["status"], "application/json", b'{"ok":true}'
+
+    server = StubHTTPServer(reply).start()
+    server.state = state
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def engine(db, monkeypatch):
+    monkeypatch.setattr(Config, "SSRF_ALLOW_PRIVATE", True) # Stub di 127.0.0.1
+    monkeypatch.setattr(Config, "FORWARD_RETRY_POLL", 0.05)
+    monkeypatch.setattr(Config, "FORWARD_BACKOFF_BASE", 0.05)
+    monkeypatch.setattr(Config, "FORWARD_BACKOFF_MAX", 0.1)
+    monkeypatch.setattr(Config, "FORWARD_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(Config, "FORWARD_BREAKER_THRESHOLD", 100)
+    eng = DeliveryEngine()
+    yield eng
+    eng._pump.stop()
+
+
+def status_of(db, delivery_id):
+    return db.query("SELECT status, attempts, last_error FROM deliveries WHERE id=?", (delivery_id,), one=True)
+
+
+def test_delivers_payload(engine, stub, db):
+    delivery_id = engine.submit(stub.url, {"to": "bob@x", "subject_enc": "s"})
+    assert wait_for(lambda: status_of(db, delivery_id)[0] == "DELIVERED")
+    assert stub.state["bodies"] == [{"to": "bob@x", "subject_enc": "s"}]
+    assert engine.stats()["delivered"] == 1
+
+
+def test_retries_with_backoff_then_fails(engine, stub, db):
+    stub.state["status"] = 500
+    delivery_id = engine.submit(stub.url, {"n": 1})
+    assert wait_for(lambda: status_of(db, delivery_id)[0] == "FAILED")
+    status, attempts, error = status_of(db, delivery_id)
+    assert attempts == Config.FORWARD_MAX_ATTEMPTS and error == "HTTP 500"
+    assert len(stub.state["bodies"]) == Config.FORWARD_MAX_ATTEMPTS
+    assert engine.stats()["retried"] == Config.FORWARD_MAX_ATTEMPTS - 1
+
+
+def test_retry_scheduled_within_backoff_cap(engine, stub, db, monkeypatch):
+    monkeypatch.setattr(Config, "FORWARD_BACKOFF_BASE", 30)
+    monkeypatch.setattr(Config, "FORWARD_BACKOFF_MAX", 30)
+    stub.state["status"] = 503
+    before = time.time()
+    delivery_id = engine.submit(stub.url, {"n": 1})
+    assert wait_for(lambda: status_of(db, delivery_id)[0] == "RETRY")
+    next_at = db.query("SELECT next_attempt_at FROM deliveries WHERE id=?", (delivery_id,), one=True)[0]
+    assert before <= next_at <= time.time() + 30
+
+
+def test_replay_failed_delivery(engine, stub, db):
+    stub.state["status"] = 500
+    delivery_id = engine.submit(stub.url, {"n": 1})
+    assert wait_for(lambda: status_of(db, delivery_id)[0] == "FAILED")
+    assert [d["id"] for d in engine.failed()] == [delivery_id]
+    stub.state["status"] = 200
+    assert engine.replay([delivery_id]) == 1
+    assert wait_for(lambda: status_of(db, delivery_id)[0] == "DELIVERED")
+
+
+def test_reclaims_only_rows_of_dead_workers(engine, stub, db):
+    engine.start()
+    engine._pump.stop() # pump dipanggil manual
+    old = time.time() - Config.FORWARD_STALE_AFTER - 10
+    insert = '''INSERT INTO deliveries (url, payload, status, attempts, next_attempt_at, created_at, updated_at, claimed_by)
+                VALUES (?, ?, 'INFLIGHT', 0, ?, ?, ?, ?)'''
+    db.execute(insert, (stub.url, json.dumps({"owner": "dead"}), old, old, old, "1-deadbeef"))
+    db.execute(insert, (stub.url, json.dumps({"owner": "self"}), old, old, old, engine._owner))
+    engine.pump()
+    assert wait_for(lambda: len(stub.state["bodies"]) == 1)
+    time.sleep(0.1)
+    assert stub.state["bodies"] == [{"owner": "dead"}]
+    # Row milik worker ini mendapat heartbeat, bukan di-dispatch ulang
+    assert db.query("SELECT updated_at > ? FROM deliveries WHERE claimed_by=? AND status='INFLIGHT'",
+                    (old, engine._owner), one=True) == (1,)
+
+
+def test_blocks_private_destination(engine, stub, db, monkeypatch):
+    monkeypatch.setattr(Config, "SSRF_ALLOW_PRIVATE", False)
+    delivery_id = engine.submit(stub.url, {"n": 1})
+    assert wait_for(lambda: status_of(db, delivery_id)[0] == "FAILED")
+    assert status_of(db, delivery_id)[2].startswith("blocked")
+    assert stub.state["bodies"] == []
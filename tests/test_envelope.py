@@ -0,0 +1,109 @@
+# tests/test_envelope.py
+# Envelope v2 (kompres + AES-GCM, key id) dan kompatibilitas record Fernet lama
+
+import os
+import base64
+import pytest
+from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag
+from config import Config
+from app.envelope import Envelope, EnvelopeError, PREFIX, derive_key, _b64decode
+from app.utils import encrypt_content, decrypt_content, to_fernet
+
+SECRET = Fernet.generate_key().decode()
+
+
+def make(key_id=1, **kwargs):
+    kwargs.setdefault("legacy", Fernet(SECRET.encode()))
+    return Envelope({}, key_id, secret=SECRET, **kwargs)
+
+
+@pytest.mark.parametrize("data", [b"", b"hi", "subjek ✉ ümlaut".encode(), b"<p>newsletter</p>" * 500, os.urandom(4096)])
+def test_seal_open_roundtrip(data):
+    env = make()
+    token = env.seal(data)
+    assert token.startswith(PREFIX)
+    assert env.open(token) == data
+
+
+def test_compresses_large_text_only():
+    env = make()
+    html = b"<td>newsletter row</td>" * 400
+    assert len(env.seal(html)) < len(html) // 4
+    random_blob = os.urandom(2000) # Tidak bisa dikompres: disimpan apa adanya
+    assert env.open(env.seal(random_blob)) == random_blob
+    assert env.stats()["compressed"] == 1
+
+
+def test_nonce_is_random():
+    env = make()
+    assert env.seal(b"same") != env.seal(b"same")
+
+
+def test_opens_legacy_fernet_records():
+    env = make()
+    legacy = Fernet(SECRET.encode()).encrypt(b"old mail").decode()
+    assert env.open(legacy) == b"old mail"
+    assert env.stats()["opened_legacy"] == 1
+
+
+def test_legacy_record_without_fernet_key():
+    env = make(legacy=None)
+    with pytest.raises(EnvelopeError):
+        env.open(Fernet(SECRET.encode()).encrypt(b"x").decode())
+
+
+def test_old_key_id_still_opens_after_rotation():
+    old = make(key_id=1).seal(b"sealed before rotation")
+    assert make(key_id=2).open(old) == b"sealed before rotation"
+
+
+def test_explicit_keys_do_not_need_secret():
+    key = os.urandom(32)
+    env = Envelope({7: key}, 7)
+    assert Envelope({7: key}, 7).open(env.seal(b"x")) == b"x"
+    with pytest.raises(EnvelopeError):
+        Envelope({7: key}, 7).open(make(key_id=1).seal(b"x")) # key id 1 tidak dikenal
+    with pytest.raises(EnvelopeError):
+        Envelope({}, 3)
+
+
+def test_tampered_token_rejected():
+    env = make()
+    token = env.seal(b"secret body")
+    raw = bytearray(_b64decode(token[len(PREFIX):]))
+    raw[-1] ^= 1
+    forged = PREFIX + base64.urlsafe_b64encode(bytes(raw)).rstrip(b"=").decode()
+    with pytest.raises(InvalidTag):
+        env.open(forged)
+    # Header (flag kompresi / key id) ikut diautentikasi
+    raw = bytearray(_b64decode(token[len(PREFIX):]))
+    raw[0] ^= 1
+    with pytest.raises((InvalidTag, EnvelopeError)):
+        env.open(PREFIX + base64.urlsafe_b64encode(bytes(raw)).rstrip(b"=").decode())
+
+
+def test_short_or_garbage_token_rejected():
+    env = make()
+    for token in (PREFIX + "AAAA", PREFIX + "!!!"):
+        with pytest.raises(EnvelopeError):
+            env.open(token)
+
+
+def test_key_derivation_is_per_key_id():
+    assert derive_key(SECRET, 1) != derive_key(SECRET, 2)
+    assert derive_key(SECRET, 1) == derive_key(SECRET, 1)
+
+
+def test_content_helpers_read_both_formats(monkeypatch):
+    sealed = encrypt_content("hello")
+    assert sealed.startswith(PREFIX) and decrypt_content(sealed) == "hello"
+    monkeypatch.setattr(Config, "ENVELOPE_FORMAT", "fernet")
+    legacy = encrypt_content("hello")
+    assert not legacy.startswith(PREFIX) and decrypt_content(legacy) == "hello"
+    assert decrypt_content("garbage") == "[CORRUPT DATA]"
+
+
+def test_to_fernet_reseals_for_forwarding():
+    fernet = Fernet(Config.ENCRYPTION_KEY.encode())
+    assert fernet.decrypt(to_fernet(encrypt_content("fwd")).encode()) == b"fwd"
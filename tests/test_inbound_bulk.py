@@ -0,0 +1,88 @@
+# tests/test_inbound_bulk.py
+# Parser body /webhook-inbound/bulk: batas chunk, NDJSON, batas ukuran
+
+import io
+import json
+import pytest
+from config import Config
+from app import inbound_bulk
+from app.inbound_bulk import iter_json_array, iter_ndjson, read_items, BulkParseError, BulkTooLarge
+
+CHUNK = inbound_bulk._READ_CHUNK
+
+
+class TrickleStream(io.BytesIO):
+    """read() paling banyak `step` byte sekali panggil, seperti socket yang lambat"""
+
+    def __init__(self, data, step):
+        super().__init__(data)
+        self.step = step
+
+    def read(self, size=-1):
+        return super().read(self.step if size < 0 else min(size, self.step))
+
+
+def test_array_scalar_straddling_chunk_boundary():
+    # Geser body sehingga angka 12345678 terpotong tepat di batas chunk 64 KiB
+    prefix = '[' + json.dumps("x" * (CHUNK - 8)) + ','
+    body = (prefix + '12345678, {"to": "a@b"}]').encode()
+    assert body.index(b"1234") < CHUNK < body.index(b"5678") + 4
+    assert list(iter_json_array(io.BytesIO(body), 1 << 20)) == ["x" * (CHUNK - 8), 12345678, {"to": "a@b"}]
+
+
+@pytest.mark.parametrize("step", [1, 7, 4096])
+def test_array_small_reads_and_whitespace(step):
+    items = [{"to": "u%d@x" % i, "body": "é" * i} for i in range(20)] + [3.5, None, "s"]
+    body = (" [ " + " ,\n ".join(json.dumps(i) for i in items) + " ] ").encode()
+    assert list(iter_json_array(TrickleStream(body, step), 1 << 20)) == items
+
+
+def test_array_empty_and_malformed():
+    assert list(iter_json_array(io.BytesIO(b" [ ] "), 1024)) == []
+    with pytest.raises(BulkParseError):
+        list(iter_json_array(io.BytesIO(b'{"to": "a"}'), 1024))
+    with pytest.raises(BulkParseError):
+        list(iter_json_array(io.BytesIO(b'[{"to": "a"} {"to": "b"}]'), 1024))
+    with pytest.raises(BulkParseError):
+        list(iter_json_array(io.BytesIO(b'[{"to": "a"}, {"to": '), 1024))
+
+
+def test_array_item_too_large():
+    body = ('[' + json.dumps("x" * 5000) + ']').encode()
+    with pytest.raises(BulkTooLarge):
+        list(iter_json_array(TrickleStream(body, 1000), 1024))
+
+
+def test_ndjson_lines_and_invalid_lines():
+    body = b'{"to": "a"}\n\nnot json\n{"to": "b"}'
+    assert list(iter_ndjson(io.BytesIO(body), 1024)) == [{"to": "a"}, None, {"to": "b"}]
+
+
+def test_ndjson_line_too_large():
+    body = b'{"to": "a"}\n' + b'{"x": "' + b"y" * 2000 + b'"}\n'
+    with pytest.raises(BulkTooLarge):
+        list(iter_ndjson(io.BytesIO(body), 1024))
+
+
+def test_read_items_ndjson_content_type():
+    body = b'{"to": "a"}\n{"to": "b"}\n'
+    assert read_items(io.BytesIO(body), "application/x-ndjson") == [{"to": "a"}, {"to": "b"}]
+
+
+def test_read_items_batch_limit(monkeypatch):
+    monkeypatch.setattr(Config, "INBOUND_BULK_MAX", 2)
+    with pytest.raises(BulkTooLarge):
+        read_items(io.BytesIO(b'[1, 2, 3]'), "application/json")
+
+
+def test_read_items_body_limit(monkeypatch):
+    monkeypatch.setattr(Config, "INBOUND_BULK_BODY_MAX", 100)
+    body = ('[' + ", ".join(['{"to": "a"}'] * 20) + ']').encode()
+    # Content-Length ditolak di depan, body chunked (tanpa Content-Length) ditolak saat dibaca
+    with pytest.raises(BulkTooLarge):
+        read_items(io.BytesIO(body), "application/json", len(body))
+    with pytest.raises(BulkTooLarge):
+        read_items(io.BytesIO(body), "application/json")
+    lines = b"".join(b'{"to": "a"}\n' for _ in range(20))
+    with pytest.raises(BulkTooLarge):
+        read_items(io.BytesIO(lines), "application/x-ndjson")
@@ -0,0 +1,88 @@
+# tests/test_migrations.py
+# PRAGMA user_version naik 1 per migrasi, idempotent, migrasi gagal di-rollback
+
+import sqlite3
+import pytest
+from app import migrations
+from app.migrations import migrate, MIGRATIONS
+
+
+def connect(path):
+    return sqlite3.connect(str(path), isolation_level=None)
+
+
+def version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def test_versions_are_sequential():
+    assert [v for v, _ in MIGRATIONS] == list(range(1, len(MIGRATIONS) + 1))
+
+
+def test_fresh_db_reaches_latest_version(tmp_path):
+    conn = connect(tmp_path / "a.db")
+    assert migrate(conn) == MIGRATIONS[-1][0] == version(conn)
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    assert {"sessions", "deliveries", "smtp_jobs", "mail_routes", "revoked_tokens"} <= tables
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+
+def test_rerun_applies_nothing(tmp_path, monkeypatch):
+    conn = connect(tmp_path / "a.db")
+    migrate(conn)
+    called = []
+    monkeypatch.setattr(migrations, "MIGRATIONS", [(v, lambda c, v=v: called.append(v)) for v, _ in MIGRATIONS])
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    assert called == []
+
+
+def test_steps_only_pending_versions(tmp_path, monkeypatch):
+    conn = connect(tmp_path / "a.db")
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS[:3])
+    assert migrate(conn) == 3
+    applied = []
+
+    def step(v):
+        def fn(c):
+            applied.append((v, version(c)))
+        return fn
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS[:3] + [(4, step(4)), (5, step(5))])
+    assert migrate(conn) == 5
+    # Tiap migrasi melihat versi sebelumnya (jalan urut, 1 transaksi per versi)
+    assert applied == [(4, 3), (5, 4)]
+
+
+def test_failed_migration_rolls_back_and_keeps_version(tmp_path, monkeypatch):
+    conn = connect(tmp_path / "a.db")
+
+    def broken(c):
+        c.execute("CREATE TABLE half_done (x)")
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", MIGRATIONS[:2] + [(3, broken)])
+    with pytest.raises(RuntimeError):
+        migrate(conn)
+    assert version(conn) == 2
+    assert not conn.execute("SELECT 1 FROM sqlite_master WHERE name='half_done'").fetchone()
+
+
+def test_legacy_db_without_version_is_adopted(tmp_path):
+    # DB lama (sebelum versioning): tabel sudah ada, user_version 0, ratelimit tanpa PRIMARY KEY
+    conn = connect(tmp_path / "a.db")
+    conn.execute("CREATE TABLE sessions (token TEXT PRIMARY KEY, device_id TEXT, ip TEXT, status TEXT, "
+                 "type TEXT, created_at REAL, expires_at REAL)")
+    conn.execute("CREATE TABLE ratelimit (client_hash TEXT, hits INTEGER, window_start REAL)")
+    conn.execute("INSERT INTO ratelimit VALUES ('c', 1, 10), ('c', 2, 20)")
+    conn.execute("INSERT INTO sessions (token, status) VALUES ('t', 'LOGGED_IN')")
+    assert migrate(conn) == MIGRATIONS[-1][0]
+    assert conn.execute("SELECT status FROM sessions WHERE token='t'").fetchone() == ("LOGGED_IN",)
+    assert conn.execute("SELECT COUNT(*) FROM ratelimit").fetchone() == (1,)
+
+
+def test_ensure_columns_is_idempotent(tmp_path):
+    conn = connect(tmp_path / "a.db")
+    conn.execute("CREATE TABLE t (a TEXT)")
+    migrations.ensure_columns(conn, "t", {"b": "TEXT", "c": "REAL"})
+    migrations.ensure_columns(conn, "t", {"b": "TEXT", "c": "REAL"})
+    assert [r[1] for r in conn.execute("PRAGMA table_info(t)")] == ["a", "b", "c"]
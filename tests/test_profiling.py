@@ -0,0 +1,60 @@
+# tests/test_profiling.py
+# Token header profiling: HMAC ADMIN_KEY, terikat path, kedaluwarsa, input client sembarang
+
+import pytest
+from config import Config
+from app.profiling import sign_profile_token, verify_profile_token
+
+NOW = 1_700_000_000
+
+
+@pytest.fixture(autouse=True)
+def admin_key(monkeypatch):
+    monkeypatch.setattr(Config, "ADMIN_KEY", "admin-secret")
+
+
+def test_valid_token():
+    token = sign_profile_token("/api/inbox", NOW + 60)
+    assert verify_profile_token(token, "/api/inbox", now=NOW)
+    assert verify_profile_token(token, "/api/inbox", now=NOW + 60)
+
+
+def test_bound_to_path():
+    token = sign_profile_token("/api/inbox", NOW + 60)
+    assert not verify_profile_token(token, "/api/inbox/1", now=NOW)
+    assert not verify_profile_token(token, "/api/login", now=NOW)
+
+
+def test_expired_token():
+    token = sign_profile_token("/api/inbox", NOW + 60)
+    assert not verify_profile_token(token, "/api/inbox", now=NOW + 61)
+
+
+def test_expiry_beyond_max_ttl_rejected():
+    # Ditandatangani dengan benar, tapi berlaku lebih lama dari yang pernah diterbitkan endpoint token
+    token = sign_profile_token("/api/inbox", NOW + Config.PROFILE_TOKEN_MAX_TTL + 1)
+    assert not verify_profile_token(token, "/api/inbox", now=NOW)
+
+
+def test_tampered_token():
+    expires, sig = sign_profile_token("/api/inbox", NOW + 60).split(".")
+    assert not verify_profile_token(f"{int(expires) + 1}.{sig}", "/api/inbox", now=NOW)
+    flipped = ("0" if sig[0] != "0" else "1") + sig[1:]
+    assert not verify_profile_token(f"{expires}.{flipped}", "/api/inbox", now=NOW)
+
+
+def test_signed_with_other_key(monkeypatch):
+    token = sign_profile_token("/api/inbox", NOW + 60)
+    monkeypatch.setattr(Config, "ADMIN_KEY", "rotated")
+    assert not verify_profile_token(token, "/api/inbox", now=NOW)
+
+
+@pytest.mark.parametrize("token", [None, "", "nodot", "abc.def", "-5.def", f"{NOW + 60}.ünïcode", f"{NOW + 60}."])
+def test_malformed_tokens(token):
+    assert not verify_profile_token(token, "/api/inbox", now=NOW)
+
+
+def test_disabled_without_admin_key(monkeypatch):
+    token = sign_profile_token("/api/inbox", NOW + 60)
+    monkeypatch.setattr(Config, "ADMIN_KEY", None)
+    assert not verify_profile_token(token, "/api/inbox", now=NOW)
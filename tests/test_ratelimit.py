@@ -0,0 +1,66 @@
+# tests/test_ratelimit.py
+# Sliding window shared-memory: pergantian window, estimasi prev + curr, cost per hit
+
+import types
+import pytest
+from app import ratelimit
+from app.ratelimit import SharedLimiter
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1_000_040.0) # 20 detik setelah awal window 60 detik (1_000_020)
+    monkeypatch.setattr(ratelimit, "time", types.SimpleNamespace(time=lambda: now.value))
+    return now
+
+
+@pytest.fixture
+def limiter(tmp_path):
+    return SharedLimiter(str(tmp_path / "rl.bin"), slots=64, stripes=4)
+
+
+def test_rejects_over_limit_and_notes_first_rejection_only(limiter, clock):
+    assert [limiter.hit("login", "c1", 3, 60)[0] for _ in range(3)] == [True] * 3
+    allowed, note = limiter.hit("login", "c1", 3, 60)
+    assert not allowed and note.startswith("Exceeded")
+    assert limiter.hit("login", "c1", 3, 60) == (False, None)
+
+
+def test_keys_are_per_route_and_client(limiter, clock):
+    for _ in range(2):
+        limiter.hit("login", "c1", 2, 60)
+    assert not limiter.hit("login", "c1", 2, 60)[0]
+    assert limiter.hit("login", "c2", 2, 60)[0]
+    assert limiter.hit("register", "c1", 2, 60)[0]
+
+
+def test_window_rollover_weights_previous_window(limiter, clock):
+    for _ in range(10):
+        assert limiter.hit("r", "c", 10, 60)[0]
+    # Window berikutnya, baru lewat 25%: estimasi = 10 x 0.75 + curr
+    clock.value = 1_000_095.0
+    assert [limiter.hit("r", "c", 10, 60)[0] for _ in range(3)] == [True, True, False]
+    # 2 window kemudian: prev dibuang seluruhnya
+    clock.value = 1_000_210.0
+    assert [limiter.hit("r", "c", 10, 60)[0] for _ in range(10)] == [True] * 10
+
+
+def test_rollover_summarises_coalesced_rejections(limiter, clock):
+    for _ in range(5):
+        limiter.hit("r", "c", 1, 60)
+    clock.value += 60
+    allowed, note = limiter.hit("r", "c", 100, 60)
+    assert allowed and note.startswith("Coalesced 4 rejections")
+
+
+def test_cost_counts_units_not_requests(limiter, clock):
+    assert limiter.hit("send", "c", 10, 60, cost=6)[0]
+    # 6 + 5 > 10: ditolak utuh, tidak ada unit yang dipakai
+    assert not limiter.hit("send", "c", 10, 60, cost=5)[0]
+    assert limiter.hit("send", "c", 10, 60, cost=4)[0]
+    assert not limiter.hit("send", "c", 10, 60, cost=1)[0]
+
+
+def test_cost_above_limit_never_allowed(limiter, clock):
+    assert not limiter.hit("send", "c", 10, 60, cost=11)[0]
+    assert limiter.hit("send", "c", 10, 60, cost=10)[0]
@@ -0,0 +1,157 @@
+# tests/test_resolver.py
+# Tabel network terlarang (IPv4, IPv6, CGNAT, ULA, IPv4 terbungkus) + cache TTL resolver
+
+import types
+import socket
+import pytest
+from app import resolver as resolver_mod
+from app.resolver import is_public_ip, CachedResolver, SAFE, UNSAFE, UNRESOLVED, pin_url
+
+
+@pytest.mark.parametrize("ip", [
+    "8.8.8.8", "1.1.1.1", "100.63.255.255", "100.128.0.1", "172.32.0.1",
+    "2606:4700:4700::1111", "2a00:1450:4001:800::200e",
+    "::ffff:8.8.8.8", "64:ff9b::808:808", "2002:808:808::1",
+])
+def test_public(ip):
+    assert is_public_ip(ip)
+
+
+@pytest.mark.parametrize("ip", [
+    # IPv4 private / loopback / link-local / reserved
+    "10.0.0.1", "172.16.5.4", "192.168.1.1", "127.0.0.1", "169.254.169.254", "0.0.0.0",
+    "192.0.2.10", "198.18.0.1", "224.0.0.1", "255.255.255.255",
+    # CGNAT
+    "100.64.0.1", "100.127.255.254",
+    # IPv6 loopback / unspecified / link-local (dengan zone) / multicast / dokumentasi
+    "::1", "::", "fe80::1", "fe80::1%eth0", "ff02::1", "2001:db8::1",
+    # ULA
+    "fc00::1", "fd12:3456:789a::1",
+    # IPv4 internal dibungkus IPv6: mapped, NAT64, 6to4, teredo
+    "::ffff:127.0.0.1", "::ffff:10.0.0.1", "::ffff:169.254.169.254",
+    "64:ff9b::a00:1", "2002:a00:1::1", "2001:0:4136:e378:8000:63bf:f5ff:fffe",
+])
+def test_blocked(ip):
+    assert not is_public_ip(ip)
+
+
+@pytest.fixture
+def no_dnspython(monkeypatch):
+    monkeypatch.setattr(resolver_mod, "dns", None)
+
+
+def fake_getaddrinfo(answers, calls):
+    def getaddrinfo(host, port, proto=0):
+        calls.append(host)
+        if host not in answers:
+            raise socket.gaierror("not found")
+        return [(socket.AF_INET6 if ":" in ip else socket.AF_INET, socket.SOCK_STREAM, proto, "", (ip, 0))
+                for ip in answers[host]]
+    return getaddrinfo
+
+
+def test_lookup_classifies_all_addresses(no_dnspython, monkeypatch):
+    calls = []
+    monkeypatch.setattr(socket, "getaddrinfo", fake_getaddrinfo(
+        {"ok.test": ["93.184.216.34", "2606:2800:220:1::1"], "mixed.test": ["93.184.216.34", "10.0.0.5"]}, calls))
+    r = CachedResolver(60, 5, 10)
+    assert r.lookup("ok.test") == (SAFE, ["93.184.216.34", "2606:2800:220:1::1"])
+    # 1 alamat internal sudah cukup untuk menolak hostname
+    assert r.lookup("mixed.test")[0] == UNSAFE
+    assert r.lookup("missing.test") == (UNRESOLVED, [])
+    assert r.lookup("OK.test.")[0] == SAFE
+    assert calls == ["ok.test", "mixed.test", "missing.test"]
+    assert r.stats()["hits"] == 1
+
+
+def test_ip_literal_skips_dns(no_dnspython, monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo", None)
+    r = CachedResolver(60, 5, 10)
+    assert r.lookup("[::1]") == (UNSAFE, ["::1"])
+    assert r.check_url("http://8.8.8.8:8080/x") == (SAFE, ["8.8.8.8"])
+
+
+def test_check_url_rejects_bad_urls(no_dnspython):
+    r = CachedResolver(60, 5, 10)
+    for url in ("ftp://example.com/", "http:///nohost", "http://example.com:99999/", "javascript:alert(1)"):
+        assert r.check_url(url) == (UNSAFE, [])
+
+
+def test_ttl_without_dnspython_is_fixed(no_dnspython, monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo", fake_getaddrinfo({"ok.test": ["93.184.216.34"]}, []))
+    monkeypatch.setattr(resolver_mod, "time", types.SimpleNamespace(time=lambda: 1000.0, perf_counter=lambda: 0.0))
+    r = CachedResolver(60, 5, 10)
+    r.lookup("ok.test")
+    r.lookup("missing.test")
+    assert r._cache["ok.test"][0] == 1060.0
+    assert r._cache["missing.test"][0] == 1005.0
+
+
+class FakeDNS:
+    """Pengganti modul dnspython: {(host, rdtype): (ttl, [ip])}"""
+
+    class DNSException(Exception):
+        pass
+
+    def __init__(self, records):
+        self.records = records
+        self.resolver = types.SimpleNamespace(resolve=self.resolve)
+        self.exception = types.SimpleNamespace(DNSException=self.DNSException)
+
+    def resolve(self, host, rdtype, raise_on_no_answer=True):
+        if (host, rdtype) not in self.records:
+            if not any(h == host for h, _ in self.records):
+                raise self.DNSException("NXDOMAIN")
+            return types.SimpleNamespace(rrset=None)
+        ttl, ips = self.records[(host, rdtype)]
+        return types.SimpleNamespace(rrset=_RRSet(ttl, ips))
+
+
+class _RRSet(list):
+
+    def __init__(self, ttl, ips):
+        super().__init__(types.SimpleNamespace(address=ip) for ip in ips)
+        self.ttl = ttl
+
+
+@pytest.fixture
+def frozen(monkeypatch):
+    monkeypatch.setattr(resolver_mod, "time", types.SimpleNamespace(time=lambda: 1000.0, perf_counter=lambda: 0.0))
+
+
+def test_ttl_follows_dns_record(frozen, monkeypatch):
+    monkeypatch.setattr(resolver_mod, "dns", FakeDNS({
+        ("short.test", "A"): (7, ["93.184.216.34"]),
+        ("short.test", "AAAA"): (20, ["2606:2800:220:1::1"]),
+        ("long.test", "A"): (86400, ["93.184.216.35"]),
+    }))
+    r = CachedResolver(60, 5, 10)
+    assert r.lookup("short.test") == (SAFE, ["93.184.216.34", "2606:2800:220:1::1"])
+    assert r._cache["short.test"][0] == 1007.0 # TTL terpendek dari semua record
+    r.lookup("long.test")
+    assert r._cache["long.test"][0] == 1060.0 # Dibatasi RESOLVER_TTL
+
+
+def test_dns_miss_falls_back_to_getaddrinfo(frozen, monkeypatch):
+    monkeypatch.setattr(resolver_mod, "dns", FakeDNS({}))
+    monkeypatch.setattr(socket, "getaddrinfo", fake_getaddrinfo({"localname": ["127.0.0.1"]}, []))
+    r = CachedResolver(60, 5, 10)
+    assert r.lookup("localname") == (UNSAFE, ["127.0.0.1"])
+    assert r._cache["localname"][0] == 1060.0
+    assert r.lookup("nowhere.test") == (UNRESOLVED, [])
+    assert r._cache["nowhere.test"][0] == 1005.0
+
+
+def test_cache_is_bounded(no_dnspython, monkeypatch):
+    monkeypatch.setattr(socket, "getaddrinfo", fake_getaddrinfo({f"h{i}.test": ["93.184.216.34"] for i in range(5)}, []))
+    r = CachedResolver(60, 5, 3)
+    for i in range(5):
+        r.lookup(f"h{i}.test")
+    assert list(r._cache) == ["h2.test", "h3.test", "h4.test"]
+
+
+def test_pin_url_keeps_host_header():
+    assert pin_url("https://user@example.com:8443/hook?x=1", "93.184.216.34") == \
+        ("https://93.184.216.34:8443/hook?x=1", "example.com:8443")
+    assert pin_url("http://example.com/hook", "2606:2800:220:1::1") == \
+        ("http://[2606:2800:220:1::1]/hook", "example.com")
@@ -0,0 +1,153 @@
+# tests/test_smtp_bridge.py
+# SMTP bridge terhadap SMTP sink lokal (bench/stubs.py): batch 1 koneksi, pool idle,
+# reconnect, job async + job yatim, validasi body /send-bridge
+
+import time
+import socket
+import pytest
+from config import Config
+from app.smtp_bridge import SMTPBridge, recipients
+from app.routes_mail import bridge_items, bridge_recipients
+from bench.stubs import SMTPSink
+
+
+@pytest.fixture
+def sink():
+    server = SMTPSink().start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def bridge(monkeypatch):
+    monkeypatch.setattr(Config, "SMTP_REQUIRE_TLS", False) # Sink tanpa TLS
+    eng = SMTPBridge()
+    yield eng
+    eng._reaper.stop()
+    eng._jobs_task.stop()
+
+
+@pytest.fixture
+def creds(sink):
+    host, port = sink.address
+    return {"host": host, "port": port, "user": "u@x", "password": "pw"}
+
+
+def message(to, text="hi"):
+    return {"to": to, "subject": "s", "message": text}
+
+
+def test_batch_uses_one_connection(bridge, sink, creds):
+    results = bridge.send_batch(creds, [message("a@x"), message("b@x, c@x"), message(["d@x"])])
+    assert [r["status"] for r in results] == ["SENT"] * 3
+    assert results[1]["to"] == ["b@x", "c@x"]
+    assert sink.connections.count == 1 and sink.messages.count == 3
+
+
+def test_idle_connection_reused_then_reaped(bridge, sink, creds, monkeypatch):
+    bridge.send_batch(creds, [message("a@x")])
+    bridge.send_batch(creds, [message("b@x")])
+    assert sink.connections.count == 1 and bridge.stats()["reused"] == 1
+    assert bridge.stats()["idle_connections"] == 1
+    monkeypatch.setattr(Config, "SMTP_POOL_IDLE", -1)
+    bridge.reap()
+    assert bridge.stats()["idle_connections"] == 0
+
+
+def test_pool_key_includes_password(bridge, sink, creds):
+    bridge.send_batch(creds, [message("a@x")])
+    bridge.send_batch({**creds, "password": "other"}, [message("b@x")])
+    assert sink.connections.count == 2
+
+
+def test_reconnects_when_pooled_connection_dropped(bridge, sink, creds):
+    bridge.send_batch(creds, [message("a@x")])
+    (server, _), = list(bridge._idle.values())[0]
+    server.sock.shutdown(socket.SHUT_RDWR)
+    results = bridge.send_batch(creds, [message("b@x")])
+    assert [r["status"] for r in results] == ["SENT"]
+    assert sink.connections.count == 2
+
+
+def test_connect_failure_raises(bridge):
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1] # Port tertutup
+    with pytest.raises(OSError):
+        bridge.send_batch({"host": "127.0.0.1", "port": port, "user": "u", "password": "p"}, [message("a@x")])
+
+
+def wait_job(bridge, job_id, owner, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = bridge.job(job_id, owner)
+        if job["status"] not in ("QUEUED", "RUNNING"):
+            return job
+        time.sleep(0.02)
+    return job
+
+
+def test_async_job_status(bridge, sink, creds, db):
+    job_id = bridge.submit("dev-hash", creds, [message("a@x"), message("b@x")])
+    job = wait_job(bridge, job_id, "dev-hash")
+    assert (job["status"], job["sent"], job["failed"]) == ("SENT", 2, 0)
+    # Hanya device pembuat job yang bisa melihat statusnya
+    assert bridge.job(job_id, "other-device") is None
+    assert "pw" not in str(db.query("SELECT * FROM smtp_jobs"))
+
+
+def test_orphaned_job_marked_failed(bridge, db):
+    bridge._ensure_started()
+    old = time.time() - Config.SMTP_JOB_STALE_AFTER - 10
+    insert = '''INSERT INTO smtp_jobs (id, owner, host, status, total, sent, failed, created_at, updated_at, worker)
+                VALUES (?, 'o', 'h', ?, 3, 1, 0, ?, ?, ?)'''
+    db.execute(insert, ("dead", "RUNNING", old, old, "1-deadbeef"))
+    db.execute(insert, ("mine", "QUEUED", old, old, bridge._worker))
+    dead = bridge.job("dead", "o")
+    assert (dead["status"], dead["failed"], dead["error"]) == ("FAILED", 2, "worker lost")
+    assert bridge.job("mine", "o")["status"] == "QUEUED"
+
+
+# ==============================================================================
+# VALIDASI BODY /send-bridge (dipakai handler & rate limit)
+# ==============================================================================
+CREDS = {"smtp_host": "h", "smtp_user": "u", "smtp_pass": "p"}
+
+
+def test_recipients_split_and_trimmed():
+    assert recipients({"to": " a@x , b@x,,"}) == ["a@x", "b@x"]
+    assert recipients({"to": ["a@x", "b@x"]}) == ["a@x", "b@x"]
+
+
+def test_bridge_recipients_counts_across_batch():
+    items, error = bridge_items({**CREDS, "messages": [message("a@x, b@x"), message(["c@x"]), message("d@x")]})
+    assert error is None and bridge_recipients(items) == 4
+
+
+def test_bridge_items_legacy_single_message():
+    items, error = bridge_items({**CREDS, "to": "a@x", "message": "m"})
+    assert error is None
+    assert items == [{"to": "a@x", "subject": "(No Subject)", "message": "m"}]
+
+
+@pytest.mark.parametrize("body", [
+    None,
+    [],
+    {"messages": [message("a@x")]}, # tanpa kredensial SMTP
+    {**CREDS},
+    {**CREDS, "messages": "a@x"},
+    {**CREDS, "messages": [{"to": "a@x"}]},
+    {**CREDS, "messages": [message(",")]},
+    {**CREDS, "messages": [message(42)]},
+])
+def test_bridge_items_rejects_invalid(body):
+    items, error = bridge_items(body)
+    assert items is None and error
+
+
+def test_bridge_items_limits(monkeypatch):
+    monkeypatch.setattr(Config, "SMTP_BATCH_MAX", 3)
+    monkeypatch.setattr(Config, "SMTP_RATE_LIMIT", 5)
+    assert "Batch limit" in bridge_items({**CREDS, "messages": [message("a@x")] * 4})[1]
+    assert "Recipient limit" in bridge_items({**CREDS, "messages": [message("a@x, b@x")] * 3})[1]
+    assert bridge_items({**CREDS, "messages": [message("a@x, b@x"), message("c@x, d@x, e@x")]})[1] is None
@@ -0,0 +1,116 @@
+# tests/test_tokens.py
+# Signed session token (HMAC) + revocation set (Bloom filter per worker, SQLite)
+
+import time
+import pytest
+from flask import Flask, jsonify
+from app import tokens
+from app.tokens import issue_token, verify_token, is_signed_token, RevocationSet, _b64d, _b64e
+from app.utils import require_auth, revoke_session
+
+
+def _flip(text):
+    # Karakter pertama: karakter terakhir base64 bisa membawa bit padding yang diabaikan
+    return ("B" if text[0] == "A" else "A") + text[1:]
+
+
+def test_issue_and_verify_roundtrip():
+    token, claims = issue_token("dev1", "LOGIN", "LOGGED_IN", 60, usr="bob")
+    assert is_signed_token(token)
+    assert verify_token(token) == claims
+    assert claims["usr"] == "bob" and claims["exp"] - claims["iat"] == 60
+
+
+def test_tampered_body_or_signature_rejected():
+    token, _ = issue_token("dev1", "LOGIN", "LOGGED_IN", 60)
+    body, sig = token[len(tokens.TOKEN_PREFIX):].split(".")
+    claims = _b64d(body).replace(b'"LOGGED_IN"', b'"ADMIN_XXX"')
+    assert verify_token(f"{tokens.TOKEN_PREFIX}{_b64e(claims)}.{sig}") is None
+    assert verify_token(f"{tokens.TOKEN_PREFIX}{body}.{_flip(sig)}") is None
+    assert verify_token(token + ".extra") is None
+
+
+def test_non_signed_and_garbage_tokens():
+    assert verify_token("opaque-session-token") is None
+    assert verify_token("v1.%%%.%%%") is None
+    assert verify_token(None) is None
+
+
+@pytest.fixture
+def revocations(db, monkeypatch):
+    rs = RevocationSet(bits=1 << 14, hashes=4, sync_interval=3600)
+    monkeypatch.setattr(rs._sync, "start", lambda: None) # Sync manual di test
+    monkeypatch.setattr(tokens, "revocations", rs)
+    monkeypatch.setattr("app.utils.revocations", rs)
+    return rs
+
+
+def test_revocation_set_local_and_synced(revocations, db):
+    revocations.revoke("local", time.time() + 60)
+    assert revocations.is_revoked("local")
+    # Dicabut worker lain: terlihat setelah sync
+    db.execute("INSERT INTO revoked_tokens (jti, expires_at) VALUES ('remote', ?)", (time.time() + 60,))
+    assert not revocations.is_revoked("remote")
+    revocations.sync()
+    assert revocations.is_revoked("remote")
+    assert not revocations.is_revoked("never")
+
+
+def test_revocation_entries_counted_once(revocations):
+    for i in range(5):
+        revocations.revoke(f"j{i}", time.time() + 60)
+    revocations.revoke("j0", time.time() + 60) # INSERT OR IGNORE: tidak ada row baru
+    revocations.sync()
+    revocations.sync()
+    assert revocations.stats()["entries"] == 5
+
+
+def test_rebuild_drops_expired_entries(revocations, db, monkeypatch):
+    monkeypatch.setattr(tokens.Config, "REVOCATION_BLOOM_CAPACITY", 3)
+    db.executemany("INSERT INTO revoked_tokens (jti, expires_at) VALUES (?, ?)",
+                   [("old1", time.time() - 1), ("old2", time.time() - 1), ("live1", time.time() + 60),
+                    ("live2", time.time() + 60)])
+    revocations.sync()
+    assert revocations.stats()["entries"] == 2
+    assert revocations.is_revoked("live1") and not revocations.is_revoked("old1")
+
+
+@pytest.fixture
+def client(revocations):
+    app = Flask(__name__)
+
+    @app.route("/me")
+    @require_auth
+    def me():
+        return jsonify({"ok": True})
+
+    return app.test_client()
+
+
+def _auth(token):
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_require_auth_accepts_valid_token(client):
+    token, _ = issue_token("dev1", "LOGIN", "LOGGED_IN", 60)
+    assert client.get("/me", headers=_auth(token)).status_code == 200
+
+
+def test_require_auth_rejects_expired_token(client):
+    token, _ = issue_token("dev1", "LOGIN", "LOGGED_IN", -1)
+    res = client.get("/me", headers=_auth(token))
+    assert res.status_code == 401 and "Expired" in res.json["error"]
+
+
+def test_require_auth_rejects_revoked_and_tampered(client):
+    token, _ = issue_token("dev1", "LOGIN", "LOGGED_IN", 60)
+    revoke_session(token)
+    assert client.get("/me", headers=_auth(token)).status_code == 401
+    other, _ = issue_token("dev1", "LOGIN", "LOGGED_IN", 60)
+    body, sig = other.rsplit(".", 1)
+    assert client.get("/me", headers=_auth(f"{body}.{_flip(sig)}")).status_code == 401
+
+
+def test_require_auth_rejects_wrong_session_type(client):
+    token, _ = issue_token("dev1", "INTERVIEW", "PENDING", 60)
+    assert client.get("/me", headers=_auth(token)).status_code == 403